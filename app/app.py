@@ -1,64 +1,35 @@
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
+import json
 import logging
 import os
-
-# Custom Formatter mit Farben
-class ColoredFormatter(logging.Formatter):
-    """Custom Formatter mit Farben für verschiedene Log-Level"""
-    
-    # ANSI Color Codes
-    COLORS = {
-        'DEBUG': '\033[36m',      # Cyan
-        'INFO': '\033[32m',       # Grün
-        'WARNING': '\033[33m',    # Orange/Gelb
-        'ERROR': '\033[31m',      # Rot
-        'CRITICAL': '\033[35m',   # Magenta
-    }
-    RESET = '\033[0m'
-    
-    def format(self, record):
-        # Farbe für das Log-Level
-        log_color = self.COLORS.get(record.levelname, self.RESET)
-        record.levelname = f"{log_color}{record.levelname}{self.RESET}"
-        
-        # Formatiere die Nachricht
-        return super().format(record)
-
-# Set up logging to stdout/stderr so Azure can capture it
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-# Handler für stdout
-handler = logging.StreamHandler(sys.stdout)
-handler.setLevel(logging.INFO)
-
-# Colored Formatter verwenden (nur wenn TTY, sonst einfacher Formatter)
-# In Azure Container Instances ist stdout kein TTY, daher einfacher Formatter
-if sys.stdout.isatty():
-    formatter = ColoredFormatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-else:
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+import time
 
 # Set up project path before importing config
 _project_root = Path(__file__).parent.parent.resolve()
 if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
-logger.info(f"Project root: {_project_root}")
+# Logging nach stdout (Azure liest es dort), aber über eine Queue: geschrieben wird im Listener-Thread,
+# nicht im Request. JSON-Zeilen außerhalb eines TTY, siehe app/logging_config.py
+from app.logging_config import sample_result, setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+logger.info("Project root: %s", _project_root)
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
+from model.metrics import MetricsMiddleware, enable_tracing, render_prometheus
+from model.online_learning import start_online_learning, stop_online_learning
+from model.timing import StageTimer
+
 load_dotenv()
 logger.info("Environment loaded")
 
@@ -93,11 +64,14 @@ if connection_string:
             
             # add span processor to the tracer provider
             tracer_provider.add_span_processor(span_processor)
+
+            # Pipeline-Stages (embed, classifier, faiss, fallback) als Child Spans des Request-Spans
+            enable_tracing(tracer_provider)
             
             logger.info("OpenTelemetry configured for Application Insights")
             connection_string_valid = True
         except Exception as e:
-            logger.warning(f"OpenTelemetry/Application Insights setup failed: {e}")
+            logger.warning("OpenTelemetry/Application Insights setup failed: %s", e)
             logger.warning("Continuing without Application Insights monitoring...")
             connection_string = None
             connection_string_valid = False
@@ -108,18 +82,67 @@ if connection_string:
 else:
     logger.warning("APP_INSIGHTS_CONN_STR not set, skipping Application Insights")
 
+# Stage-Spans auch ohne Application Insights, z.B. mit opentelemetry-instrument und OTLP Exporter
+if not connection_string_valid and os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes"):
+    try:
+        enable_tracing()
+        logger.info("Pipeline stage spans enabled (global tracer provider)")
+    except ImportError as e:
+        logger.warning("TRACING_ENABLED set but OpenTelemetry is not installed: %s", e)
+
 try:
     logger.info("Importing predict_intent...")
-    from model.predict_intent import predict_intent
+    from model.predict_intent import predict_intent, predict_intent_async, predict_intents, warm_up_async
     logger.info("✓ predict_intent imported successfully")
 except Exception as e:
-    logger.error(f"ERROR importing predict_intent: {e}")
-    import traceback
-    logger.error(traceback.format_exc())
-    def predict_intent(text):
-        return {"error": f"Model not loaded: {str(e)}", "text": text}
-
-app = FastAPI()
+    logger.exception("ERROR importing predict_intent: %s", e)
+    _import_error = str(e)
+    def predict_intent(text, timings=None):
+        return {"error": f"Model not loaded: {_import_error}", "text": text}
+    async def predict_intent_async(text, timings=None):
+        return predict_intent(text)
+    def predict_intents(texts):
+        return [predict_intent(t) for t in texts]
+    async def warm_up_async():
+        raise RuntimeError(f"Model not loaded: {_import_error}")
+
+# Readiness: erst nach erfolgreichem Warm-up bekommt der Worker Traffic (/ready)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 10))
+readiness = {"ready": False, "error": None, "warmup_seconds": None}
+
+async def _warm_up():
+    """Warm-up im Hintergrund, bis es klappt; "/" bleibt währenddessen erreichbar"""
+    while True:
+        start = time.perf_counter()
+        try:
+            await warm_up_async()
+            readiness["warmup_seconds"] = round(time.perf_counter() - start, 3)
+            readiness["error"] = None
+            readiness["ready"] = True
+            logger.info("Warm-up complete in %ss, worker ready", readiness["warmup_seconds"])
+            return
+        except Exception as e:
+            readiness["error"] = str(e)
+            logger.error("Warm-up failed, retrying in %ss: %s", WARMUP_RETRY_SECONDS, e)
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app):
+    task = None
+    if WARMUP_ENABLED:
+        task = asyncio.create_task(_warm_up())
+    else:
+        readiness["ready"] = True
+    # ONLINE_LEARNING: Fallback-Feedback anwenden, nachtrainieren, Artefakte neu laden
+    learner = start_online_learning()
+    yield
+    if task is not None:
+        task.cancel()
+    stop_online_learning(learner)
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 logger.info("FastAPI app created")
 
 # FastAPI Instrumentation (automatisches Tracing)
@@ -128,25 +151,80 @@ if connection_string_valid:
         FastAPIInstrumentor.instrument_app(app)
         logger.info("FastAPI instrumentation enabled")
     except Exception as e:
-        logger.warning(f"Could not instrument FastAPI: {e}")
+        logger.warning("Could not instrument FastAPI: %s", e)
 
 class Query(BaseModel):
     text: str
 
+class BatchQuery(BaseModel):
+    texts: list[str]
+
+# Texte pro predict_intents Aufruf beim NDJSON-Streaming
+BATCH_STREAM_CHUNK = int(os.getenv("BATCH_STREAM_CHUNK", 256))
+
+# Server-Timing Header mit den Stage-Zeiten pro /predict (für run/bench_load.py, verrät Interna -> Standard aus)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+def _server_timing(timer, total_seconds) -> str:
+    """embed;dur=12.3, classify;dur=0.4, total;dur=13.0 (Millisekunden)"""
+    parts = [f"{name};dur={s['seconds'] * 1000:.2f}" for name, s in timer.as_dict().items()]
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
 @app.post("/predict")
-def predict(q: Query):
+async def predict(q: Query, response: Response):
+    timer = StageTimer() if SERVER_TIMING else None
+    start = time.perf_counter()
     try:
-        result = predict_intent(q.text)
-        logger.info(f"Predict result: {result}")
+        result = await predict_intent_async(q.text, timings=timer)
+        if sample_result():
+            # extra statt f-String: serialisiert wird erst im Logging-Thread
+            logger.info("Predict result", extra={"result": result})
         return result
     except Exception as e:
-        logger.error(f"Error in predict: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception("Error in predict: %s", e)
         return {"error": str(e), "text": q.text}
+    finally:
+        if timer is not None:
+            response.headers["Server-Timing"] = _server_timing(timer, time.perf_counter() - start)
+
+def _stream_batch(texts):
+    """NDJSON: eine Zeile pro Text, Chunk für Chunk, damit große Payloads nicht komplett im Speicher landen"""
+    for i in range(0, len(texts), BATCH_STREAM_CHUNK):
+        chunk = texts[i:i + BATCH_STREAM_CHUNK]
+        try:
+            results = predict_intents(chunk)
+        except Exception as e:
+            logger.error("Error in predict_batch chunk %d: %s", i // BATCH_STREAM_CHUNK, e)
+            results = [{"error": str(e), "text": t} for t in chunk]
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+@app.post("/predict/batch")
+def predict_batch(q: BatchQuery, stream: bool = False):
+    if stream:
+        return StreamingResponse(_stream_batch(q.texts), media_type="application/x-ndjson")
+    try:
+        results = predict_intents(q.texts)
+        logger.info("Predict batch: %d results", len(results))
+        return {"results": results}
+    except Exception as e:
+        logger.exception("Error in predict_batch: %s", e)
+        return {"error": str(e), "texts": q.texts}
 
 @app.get("/")
 def root():
     return {"status": "running", "message": "LLM-Ops Intent Model API"}
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus Text-Format: Stage- und Request-Latenzen, Fallback-Quote, Cache-Hit-Raten, In-Flight"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready():
+    if readiness["ready"]:
+        return {"status": "ready", "warmup_seconds": readiness["warmup_seconds"]}
+    return JSONResponse(status_code=503, content={"status": "warming_up", "error": readiness["error"]})
+
 logger.info("App startup complete")
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Logging setup for the API: non-blocking, structured, sampled.
+
+Request threads only put the LogRecord on an in-memory queue (QueueHandler);
+a background QueueListener thread formats and writes it to stdout. Formatting
+is lazy: records keep msg + args (use `logger.info("x %s", value)` or
+`extra={...}`, not f-strings) and are only rendered in the listener thread.
+
+- LOG_FORMAT: json (one JSON object per line, extras as fields) or text
+  (colored on a TTY). Default: text on a TTY, json otherwise (ACI / log collectors).
+- LOG_LEVEL: root level, default INFO.
+- LOG_RESULT_SAMPLE_RATE: share of successful per-request result logs that are
+  written (0..1, default 1). Errors are always logged.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+LOG_RESULT_SAMPLE_RATE = float(os.getenv("LOG_RESULT_SAMPLE_RATE", 1.0))
+
+# Standard-Attribute eines LogRecord; alles andere kam über extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def _extras(record) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """Eine Zeile JSON pro Record: time, level, logger, message, extras, ggf. exception"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        entry.update(_extras(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Klassisches Format, extras als key=value angehängt"""
+
+    def format(self, record):
+        line = super().format(record)
+        extras = _extras(record)
+        if extras:
+            line += " " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return line
+
+
+# Custom Formatter mit Farben
+class ColoredFormatter(TextFormatter):
+    """Custom Formatter mit Farben für verschiedene Log-Level"""
+
+    # ANSI Color Codes
+    COLORS = {
+        'DEBUG': '\033[36m',      # Cyan
+        'INFO': '\033[32m',       # Grün
+        'WARNING': '\033[33m',    # Orange/Gelb
+        'ERROR': '\033[31m',      # Rot
+        'CRITICAL': '\033[35m',   # Magenta
+    }
+    RESET = '\033[0m'
+
+    def format(self, record):
+        # Farbe nur für diese Ausgabe, der Record selbst bleibt unverändert
+        levelname = record.levelname
+        record.levelname = f"{self.COLORS.get(levelname, self.RESET)}{levelname}{self.RESET}"
+        try:
+            return super().format(record)
+        finally:
+            record.levelname = levelname
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler ohne Formatieren im aufrufenden Thread.
+    Der Standard-QueueHandler rendert msg % args schon beim Einreihen; hier passiert das erst im Listener.
+    Nur Exceptions werden sofort als Text gesichert (Traceback-Frames leben sonst weiter)."""
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def make_formatter(fmt=None, stream=None) -> logging.Formatter:
+    stream = stream or sys.stdout
+    fmt = (fmt or os.getenv("LOG_FORMAT") or ("text" if stream.isatty() else "json")).lower()
+    if fmt == "json":
+        return JsonFormatter()
+    text_format = ('%(asctime)s - %(name)s - %(levelname)s - %(message)s', '%Y-%m-%d %H:%M:%S')
+    return ColoredFormatter(*text_format) if stream.isatty() else TextFormatter(*text_format)
+
+
+_listener = None
+_queue_handler = None
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """Root Logger -> Queue -> Listener-Thread -> stdout. Idempotent (uvicorn Reload, Tests)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+    stream = stream or sys.stdout
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(make_formatter(fmt, stream))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+    _queue_handler = LazyQueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+
+    # httpx/openai loggen jeden Azure-Request auf INFO; bisher ging das mangels Root-Handler verloren
+    for name in ("httpx", "httpcore", "openai"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    # uvicorn schreibt Access-/Error-Logs sonst synchron mit eigenen Handlern
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Listener stoppen; wartet, bis die Queue geleert ist"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def sample_result() -> bool:
+    """Soll dieses Request-Ergebnis geloggt werden? (LOG_RESULT_SAMPLE_RATE)"""
+    return LOG_RESULT_SAMPLE_RATE >= 1.0 or random.random() < LOG_RESULT_SAMPLE_RATE
@@ -1,4 +1,7 @@
+import os
 import sys
+import argparse
+import time
 from pathlib import Path
 
 # Set up project path before importing config
@@ -6,25 +9,170 @@ _project_root = Path(__file__).parent.parent.resolve()
 if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
-from turtle import clear
 import faiss
 import numpy as np
 import json
 
 import config
 
-# Lade Embeddings und Labels
-embeddings = np.load(config.PROJECT_ROOT / "data/embeddings/embeddings.npy").astype("float32")
+INDEX_PATH = config.PROJECT_ROOT / "data/vector_db/faiss.index"
+# Metadaten neben dem Index: Spec, Metrik, Suchparameter, kalibrierter RETRIEVAL_THRESHOLD
+META_PATH = config.PROJECT_ROOT / "data/vector_db/faiss.json"
 
-with open(config.PROJECT_ROOT / "data/embeddings/labels.json") as f:
-    labels = json.load(f)
+# "cosine" = normalisierte Vektoren + Inner Product. Beim Serving wird die Similarity in
+# 2 - 2*cos umgerechnet (= quadrierte L2-Distanz normierter Vektoren), damit
+# RETRIEVAL_THRESHOLD und das kNN-Voting für beide Metriken "kleiner = näher" bedeuten.
+METRICS = {
+    "l2": faiss.METRIC_L2,
+    "cosine": faiss.METRIC_INNER_PRODUCT,
+}
 
-dimension = embeddings.shape[1]
 
-# FAISS Index aufbauen
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
+def prepare_vectors(embeddings, metric):
+    x = np.ascontiguousarray(embeddings, dtype="float32").copy()
+    if metric == "cosine":
+        faiss.normalize_L2(x)
+    return x
 
-faiss.write_index(index, str(config.PROJECT_ROOT / "data/vector_db/faiss.index"))
 
-print("✅ FAISS Index gespeichert:", embeddings.shape)
\ No newline at end of file
+def to_distance(D, metric):
+    """FAISS-Scores -> Distanz (kleiner = näher) für beide Metriken"""
+    if metric == "cosine":
+        return 2.0 - 2.0 * D
+    return D
+
+
+def build_index(embeddings, spec="Flat", metric="l2"):
+    """Index per FAISS index_factory Spec bauen, z.B. "Flat", "IVF256,Flat", "HNSW32", "IVF256,PQ32" """
+    x = prepare_vectors(embeddings, metric)
+    index = faiss.index_factory(x.shape[1], spec, METRICS[metric])
+    if not index.is_trained:
+        index.train(x)
+    index.add(x)
+    return index
+
+
+def candidate_search_params(index) -> list:
+    """Suchparameter von günstig nach teuer, passend zum Index-Typ"""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        nprobes = [p for p in (1, 2, 4, 8, 16, 32, 64, 128, 256, 512) if p < ivf.nlist] + [ivf.nlist]
+        return [f"nprobe={p}" for p in nprobes]
+    except RuntimeError:
+        pass
+    if "HNSW" in type(index).__name__:
+        return [f"efSearch={ef}" for ef in (16, 32, 64, 128, 256, 512)]
+    return [""]  # exakte Indizes haben nichts zu tunen
+
+
+def set_search_params(index, params):
+    if params:
+        faiss.ParameterSpace().set_index_parameters(index, params)
+
+
+def recall_at_k(found, truth) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def tune(index, x, metric, k=10, target_recall=0.95, n_queries=1000, seed=42):
+    """Sweep über nprobe/efSearch gegen den exakten Flat-Index.
+    -> schnellste Konfiguration mit recall@k >= target_recall (sonst die mit dem höchsten Recall)"""
+    rng = np.random.default_rng(seed)
+    queries = x[rng.choice(len(x), size=min(n_queries, len(x)), replace=False)]
+    k = min(k, len(x))
+
+    exact = faiss.IndexFlat(x.shape[1], METRICS[metric])
+    exact.add(x)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for params in candidate_search_params(index):
+        set_search_params(index, params)
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = recall_at_k(found, truth)
+        results.append({"search_params": params, "recall_at_k": recall, "latency_ms": latency_ms})
+        print(f"  {params or '(exact)':<14} recall@{k}={recall:.3f}  {latency_ms:.4f} ms/query")
+
+    ok = [r for r in results if r["recall_at_k"] >= target_recall]
+    best = min(ok, key=lambda r: r["latency_ms"]) if ok else max(results, key=lambda r: r["recall_at_k"])
+    set_search_params(index, best["search_params"])
+    return best
+
+
+def calibrate_retrieval_threshold(index, x, metric, percentile=95.0) -> float:
+    """RETRIEVAL_THRESHOLD für die gewählte Metrik: Perzentil der Distanz jedes Beispiels
+    zu seinem nächsten anderen Beispiel (Leave-one-out)"""
+    if len(x) < 2:
+        return None
+    D, I = index.search(x, 2)
+    D = to_distance(D, metric)
+    own = np.arange(len(x))
+    # Treffer auf sich selbst überspringen
+    nearest_other = np.where(I[:, 0] == own, D[:, 1], D[:, 0])
+    return float(np.percentile(nearest_other, percentile))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS Index aus data/embeddings bauen")
+    parser.add_argument("--index", default="Flat", help='FAISS index_factory Spec, z.B. "Flat", "IVF1024,Flat", "HNSW32", "IVF1024,PQ64"')
+    parser.add_argument("--metric", choices=sorted(METRICS), default="l2")
+    parser.add_argument("--tune", action="store_true", help="nprobe/efSearch gegen den exakten Index tunen")
+    parser.add_argument("--k", type=int, default=10, help="k für recall@k beim Tuning")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--calibrate-threshold", action="store_true",
+                        help="RETRIEVAL_THRESHOLD für Metrik/Index neu kalibrieren (automatisch mit --tune)")
+    parser.add_argument("--threshold-percentile", type=float, default=95.0,
+                        help="Perzentil der Nearest-Neighbour-Distanzen für RETRIEVAL_THRESHOLD")
+    args = parser.parse_args()
+
+    # Lade Embeddings und Labels
+    embeddings = np.load(config.PROJECT_ROOT / "data/embeddings/embeddings.npy").astype("float32")
+
+    with open(config.PROJECT_ROOT / "data/embeddings/labels.json") as f:
+        labels = json.load(f)
+
+    # FAISS Index aufbauen
+    index = build_index(embeddings, args.index, args.metric)
+    x = prepare_vectors(embeddings, args.metric)
+
+    meta = {
+        "spec": args.index,
+        "metric": args.metric,
+        "dim": int(embeddings.shape[1]),
+        "ntotal": int(index.ntotal),
+        "search_params": "",
+    }
+    if args.tune:
+        print(f"Tuning {args.index} (target recall@{args.k} >= {args.target_recall})")
+        best = tune(index, x, args.metric, k=args.k, target_recall=args.target_recall)
+        meta.update(best)
+        meta["k"] = args.k
+        print(f"✅ Gewählt: {best['search_params'] or '(exact)'} recall={best['recall_at_k']:.3f}")
+
+    threshold = None
+    if args.tune or args.calibrate_threshold:
+        threshold = calibrate_retrieval_threshold(index, x, args.metric, args.threshold_percentile)
+    if threshold is not None:
+        meta["retrieval_threshold"] = threshold
+        print(f"✅ RETRIEVAL_THRESHOLD ({args.metric}, p{args.threshold_percentile:g}): {threshold:.4f}")
+
+    # tmp + rename: laufende Worker laden den Index per Hot-Reload und dürfen keine halbe Datei lesen;
+    # faiss.json zuletzt, erst damit gilt der neue Index
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_index = INDEX_PATH.with_suffix(".tmp")
+    faiss.write_index(index, str(tmp_index))
+    os.replace(tmp_index, INDEX_PATH)
+    tmp_meta = META_PATH.with_suffix(".json.tmp")
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_meta, META_PATH)
+
+    print("✅ FAISS Index gespeichert:", embeddings.shape, f"({args.index}, {args.metric}, {len(labels)} labels)")
+
+
+if __name__ == "__main__":
+    main()
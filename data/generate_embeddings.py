@@ -1,9 +1,12 @@
 import os
 import sys
+import argparse
 import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 from pathlib import Path
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 
 # Set up project path before importing config
@@ -12,29 +15,175 @@ if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
 import config
-from model.embedding_model import embed_texts
+from model.embedding_cache import SqliteVectorStore, make_key
+from model.embedding_model import _embed_batch, get_embedding_provider
 
 load_dotenv()
 
-# Lade Dataset
-with open(config.PROJECT_ROOT / "data/input/intents.json") as f:
-    INTENTS = json.load(f)
+EMBEDDINGS_DIR = config.PROJECT_ROOT / "data/embeddings"
+# Append-fähiger Store: ein Vektor pro (Text-Hash, EMB_MODEL, EMB_DIM), wächst mit dem Dataset
+STORE_PATH = EMBEDDINGS_DIR / "embeddings.sqlite"
 
-all_texts = []
-all_labels = []
+# Azure embeddings: max. 2048 Inputs pro Request; Zeichen als grobe Obergrenze für Tokens
+MAX_BATCH_SIZE = 2048
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
 
-for label, texts in INTENTS.items():
+
+def load_dataset(path):
+    """intents.json -> (texts, labels) in Dateireihenfolge"""
+    with open(path) as f:
+        intents = json.load(f)
+    texts, labels = [], []
+    for label, examples in intents.items():
+        for t in examples:
+            texts.append(t)
+            labels.append(label)
+    return texts, labels
+
+
+def make_chunks(texts, batch_size, max_chars):
+    """Texte in API-taugliche Batches teilen (Anzahl und Gesamtlänge begrenzt)"""
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    chunk, chars = [], 0
     for t in texts:
-        all_texts.append(t)
-        all_labels.append(label)
+        if chunk and (len(chunk) >= batch_size or chars + len(t) > max_chars):
+            yield chunk
+            chunk, chars = [], 0
+        chunk.append(t)
+        chars += len(t)
+    if chunk:
+        yield chunk
+
+
+def _retry_after(error):
+    """Retry-After Header (Sekunden) einer 429-Antwort, falls vorhanden"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error) -> bool:
+    if getattr(error, "status_code", None) in RETRY_STATUS:
+        return True
+    # Verbindungsabbrüche und Timeouts (openai.APIConnectionError / APITimeoutError)
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def embed_with_retry(texts, max_retries=6, base_delay=1.0, max_delay=60.0):
+    """_embed_batch mit exponentiellem Backoff + Jitter; Retry-After von 429 hat Vorrang"""
+    for attempt in range(max_retries + 1):
+        try:
+            return _embed_batch(texts)
+        except Exception as e:
+            if attempt == max_retries or not _is_retryable(e):
+                raise
+            delay = _retry_after(e) or min(max_delay, base_delay * 2 ** attempt) * (0.5 + random.random())
+            print(f"  ⚠️ {type(e).__name__}, retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def generate(texts, store, model, dim, batch_size=256, max_chars=200_000, concurrency=4, max_retries=6) -> dict:
+    """Nur Texte ohne gespeichertes Embedding einbetten; jeder fertige Batch landet sofort im Store"""
+    keys = {t: make_key(t, model, dim) for t in texts}
+    existing = store.get_many(set(keys.values()))
+    missing = list(dict.fromkeys(t for t in texts if keys[t] not in existing))
+    chunks = list(make_chunks(missing, batch_size, max_chars))
+
+    start = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max(1, concurrency)) as pool:
+        futures = {pool.submit(embed_with_retry, chunk, max_retries): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            vectors = future.result()
+            # SQLite: ein Schreiber (dieser Thread), Batch-weise committet
+            store.put_many((keys[t], v) for t, v in zip(chunk, vectors))
+            done += 1
+            print(f"  batch {done}/{len(chunks)}: {len(chunk)} texts")
+
+    return {
+        "texts": len(texts),
+        "cached": len(texts) - len(missing),
+        "embedded": len(missing),
+        "batches": len(chunks),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def export(texts, labels, store, model, dim, out_dir=EMBEDDINGS_DIR, dtype="float32"):
+    """embeddings.npy / labels.json / texts.json in Dataset-Reihenfolge aus dem Store schreiben.
+    dtype="float16" halbiert embeddings.npy; build_faiss und das Training rechnen in float32"""
+    keys = [make_key(t, model, dim) for t in texts]
+    vectors = store.get_many(set(keys))
+    embeddings = np.vstack([vectors[k] for k in keys]).astype(dtype) if keys else np.empty((0, dim), dtype)
+    _write_exports(out_dir, embeddings, labels, texts)
+    return embeddings
+
+
+def append(texts, labels, embeddings, out_dir=EMBEDDINGS_DIR):
+    """Neue Beispiele an embeddings.npy / labels.json / texts.json anhängen (Datentyp der Datei bleibt)"""
+    out_dir = Path(out_dir)
+    existing = np.load(out_dir / "embeddings.npy")
+    with open(out_dir / "labels.json") as f:
+        all_labels = json.load(f)
+    texts_path = out_dir / "texts.json"
+    all_texts = json.loads(texts_path.read_text()) if texts_path.exists() else [""] * len(all_labels)
+
+    combined = np.vstack([existing, np.asarray(embeddings, dtype=existing.dtype)])
+    _write_exports(out_dir, combined, all_labels + list(labels), all_texts + list(texts))
+    return combined
+
+
+def _write_exports(out_dir, embeddings, labels, texts):
+    """Alle drei Dateien erst als .tmp schreiben, dann per os.replace tauschen: ein Abbruch beim Schreiben
+    lässt die bisherigen Exporte unverändert, Leser sehen nie eine halb geschriebene Datei"""
+    out_dir = Path(out_dir)
+    tmp_paths = {name: out_dir / f"{name}.tmp" for name in ("embeddings.npy", "labels.json", "texts.json")}
+    try:
+        with open(tmp_paths["embeddings.npy"], "wb") as f:
+            np.save(f, embeddings)
+        with open(tmp_paths["labels.json"], "w") as f:
+            json.dump(labels, f, indent=2)
+        with open(tmp_paths["texts.json"], "w") as f:
+            json.dump(texts, f, indent=2, ensure_ascii=False)
+    except BaseException:
+        for tmp in tmp_paths.values():
+            tmp.unlink(missing_ok=True)
+        raise
+    for name, tmp in tmp_paths.items():
+        os.replace(tmp, out_dir / name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embeddings für data/input/intents.json inkrementell erzeugen")
+    parser.add_argument("--input", default=str(config.PROJECT_ROOT / "data/input/intents.json"))
+    parser.add_argument("--store", default=str(STORE_PATH), help="SQLite Store der Embeddings")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("EMB_BATCH_SIZE", 256)))
+    parser.add_argument("--max-batch-chars", type=int, default=200_000, help="max. Zeichen pro Request")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallele Requests")
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=os.getenv("EMB_STORAGE_DTYPE", "float32"),
+                        help="Datentyp von embeddings.npy")
+    args = parser.parse_args()
+
+    # Store-Schlüssel mit dem Modellnamen des Providers (EMB_PROVIDER=local mischt nie mit Azure)
+    provider = get_embedding_provider()
+    model, dim = provider.model, provider.dim
 
+    texts, labels = load_dataset(args.input)
+    EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
+    store = SqliteVectorStore(args.store)
 
-embeddings = embed_texts(all_texts)
+    stats = generate(texts, store, model, dim, args.batch_size, args.max_batch_chars,
+                     args.concurrency, args.max_retries)
+    print(f"✅ [{provider.name}] {stats['embedded']} neu eingebettet, {stats['cached']} aus dem Store "
+          f"({stats['batches']} Requests, {stats['seconds']:.1f}s)")
 
-# Speicher Embeddings & Labels
-np.save(config.PROJECT_ROOT / "data/embeddings/embeddings.npy", np.array(embeddings))
+    embeddings = export(texts, labels, store, model, dim, dtype=args.dtype)
+    print("✅ Embeddings gespeichert:", embeddings.shape, embeddings.dtype)
 
-with open(config.PROJECT_ROOT / "data/embeddings/labels.json", "w") as f:
-    json.dump(all_labels, f, indent=2)
 
-print("✅ Embeddings gespeichert")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Incremental FAISS index maintenance with stable IDs.
+
+Instead of rebuilding from embeddings.npy, examples are added (add_with_ids)
+and removed (remove_ids) by a stable int64 ID. Every change writes a new
+versioned index plus an ID sidecar (ID -> label, text) next to it and then
+atomically repoints data/vector_db/faiss.json at the new version, so a worker
+loading in the middle of an update sees either the old or the new version,
+never a mix. Writers (this CLI, online learning) serialize on a file lock
+next to faiss.json, so concurrent updates cannot overwrite each other's version.
+
+    python data/update_faiss.py init                         # current embeddings -> version 1
+    python data/update_faiss.py add new_tickets.json         # {"intent": ["text", ...]} or JSONL text/label
+    python data/update_faiss.py remove --ids 17 42
+    python data/update_faiss.py info
+
+New texts are embedded through generate_embeddings (only texts not yet in the
+embedding store cost an API call).
+"""
+import sys
+import argparse
+import contextlib
+import json
+import os
+import re
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import faiss
+import numpy as np
+
+import config
+from data.build_faiss import META_PATH, METRICS, prepare_vectors
+
+VERSION_RE = re.compile(r"^faiss\.v(\d+)\.(index|ids\.json)$")
+
+# Von build_faiss.py --tune / --calibrate-threshold: Suchparameter gelten nur für dieselbe Spec und Metrik,
+# der kalibrierte RETRIEVAL_THRESHOLD nur für dieselbe Metrik
+TUNING_KEYS = ("search_params", "recall_at_k", "latency_ms", "k")
+THRESHOLD_KEYS = ("retrieval_threshold",)
+
+
+def _atomic_write_json(path, obj, **kwargs):
+    tmp = Path(path).with_name(Path(path).name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(obj, f, **kwargs)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def index_lock(meta_path=META_PATH):
+    """Exklusiver flock neben faiss.json für load_state -> write_version: zwei Änderungen gleichzeitig
+    würden dieselbe Version schreiben und die erste ginge verloren"""
+    import fcntl
+    with open(Path(meta_path).with_suffix(".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def with_ids(index):
+    """IVF-Indizes speichern IDs selbst, alle anderen bekommen eine IndexIDMap2 darum"""
+    try:
+        faiss.extract_index_ivf(index)
+        return index
+    except RuntimeError:
+        return faiss.IndexIDMap2(index)
+
+
+def empty_sidecar() -> dict:
+    return {"ids": [], "labels": [], "texts": [], "next_id": 0}
+
+
+def load_state(meta_path=META_PATH):
+    """-> (meta, index, sidecar) der aktuellen Version"""
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if not meta.get("ids_file"):
+        raise ValueError(f"{meta_path} has no versioned index yet, run `update_faiss.py init` first")
+    directory = Path(meta_path).parent
+    index = faiss.read_index(str(directory / meta["index_file"]))
+    with open(directory / meta["ids_file"]) as f:
+        sidecar = json.load(f)
+    return meta, index, sidecar
+
+
+def add_examples(index, sidecar, embeddings, labels, texts, metric) -> list:
+    """Neue Beispiele mit fortlaufenden IDs ab next_id hinzufügen -> vergebene IDs"""
+    x = prepare_vectors(embeddings, metric)
+    start = sidecar["next_id"]
+    ids = np.arange(start, start + len(x), dtype="int64")
+    index.add_with_ids(x, ids)
+    # IDs wachsen monoton, das Sidecar bleibt nach ID sortiert (searchsorted beim Serving)
+    sidecar["ids"].extend(int(i) for i in ids)
+    sidecar["labels"].extend(labels)
+    sidecar["texts"].extend(texts)
+    sidecar["next_id"] = int(start + len(x))
+    return [int(i) for i in ids]
+
+
+def _rebuild_without(index, sidecar, keep, meta):
+    """Für Index-Typen ohne remove_ids (z.B. HNSW): verbleibende Vektoren in einen neuen Index"""
+    kept_ids = np.asarray([sidecar["ids"][i] for i in keep], dtype="int64")
+    vectors = np.vstack([index.reconstruct(int(i)) for i in kept_ids]) if len(kept_ids) else \
+        np.empty((0, index.d), dtype="float32")
+    new_index = with_ids(faiss.index_factory(index.d, meta["spec"], index.metric_type))
+    # z.B. HNSW mit SQ/PQ: der neue Index braucht wieder trainierte Codebooks
+    if not new_index.is_trained:
+        if not len(kept_ids):
+            raise ValueError(f"Cannot retrain {meta['spec']} without remaining vectors")
+        new_index.train(vectors)
+    if len(kept_ids):
+        new_index.add_with_ids(vectors, kept_ids)
+    return new_index
+
+
+def remove_examples(index, sidecar, ids, meta):
+    """Beispiele per ID entfernen -> (Index, Anzahl entfernt); Index kann neu gebaut sein"""
+    drop = set(int(i) for i in ids)
+    keep = [pos for pos, i in enumerate(sidecar["ids"]) if i not in drop]
+    removed = len(sidecar["ids"]) - len(keep)
+    if removed:
+        try:
+            index.remove_ids(np.asarray(sorted(drop), dtype="int64"))
+        except RuntimeError:
+            print(f"  {meta.get('spec')} does not support remove_ids, rebuilding from the remaining vectors")
+            index = _rebuild_without(index, sidecar, keep, meta)
+        for key in ("ids", "labels", "texts"):
+            sidecar[key] = [sidecar[key][pos] for pos in keep]
+    return index, removed
+
+
+def _existing_versions(directory) -> dict:
+    versions = {}
+    for p in Path(directory).iterdir():
+        m = VERSION_RE.match(p.name)
+        if m:
+            versions.setdefault(int(m.group(1)), []).append(p)
+    return versions
+
+
+def write_version(index, sidecar, meta, meta_path=META_PATH, keep=3) -> dict:
+    """Neue Version schreiben und faiss.json atomar umstellen; ältere Versionen über keep löschen"""
+    directory = Path(meta_path).parent
+    versions = _existing_versions(directory)
+    version = max([meta.get("version", 0), *versions]) + 1
+    index_file = f"faiss.v{version:04d}.index"
+    ids_file = f"faiss.v{version:04d}.ids.json"
+
+    faiss.write_index(index, str(directory / (index_file + ".tmp")))
+    os.replace(directory / (index_file + ".tmp"), directory / index_file)
+    _atomic_write_json(directory / ids_file, sidecar, ensure_ascii=False)
+
+    meta = {**meta, "version": version, "index_file": index_file, "ids_file": ids_file,
+            "ntotal": int(index.ntotal), "dim": int(index.d)}
+    # Der Zeigerwechsel ist der Commit: erst danach laden Worker die neue Version
+    _atomic_write_json(meta_path, meta, indent=2)
+
+    for old in sorted(v for v in versions if v <= version - keep):
+        for p in versions[old]:
+            p.unlink()
+    return meta
+
+
+def read_examples(path):
+    """Neue Beispiele: intents.json-Format {label: [texts]} oder JSONL mit text/label"""
+    path = Path(path)
+    texts, labels = [], []
+    if path.suffix == ".jsonl":
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    texts.append(row["text"])
+                    labels.append(row["label"])
+    else:
+        with open(path) as f:
+            for label, examples in json.load(f).items():
+                texts.extend(examples)
+                labels.extend([label] * len(examples))
+    return texts, labels
+
+
+def _embed(texts):
+    """Über den Embedding-Store von generate_embeddings (nur neue Texte kosten einen API-Call)"""
+    from data.generate_embeddings import STORE_PATH, generate
+    from model.embedding_cache import SqliteVectorStore, make_key
+    from model.embedding_model import get_embedding_provider
+
+    provider = get_embedding_provider()
+    model, dim = provider.model, provider.dim
+    store = SqliteVectorStore(STORE_PATH)
+    generate(texts, store, model, dim)
+    vectors = store.get_many({make_key(t, model, dim) for t in texts})
+    return np.vstack([vectors[make_key(t, model, dim)] for t in texts]).astype("float32")
+
+
+def init_meta(old, spec, metric) -> dict:
+    """faiss.json für einen neu aufgebauten Index: nur Schlüssel aus old, die für spec/metric noch gelten"""
+    meta = {"spec": spec, "metric": metric}
+    if "version" in old:
+        meta["version"] = old["version"]
+    same_metric = old.get("metric", "l2") == metric
+    if same_metric and old.get("spec", "Flat") == spec:
+        meta.update({k: old[k] for k in TUNING_KEYS if k in old})
+    if same_metric:
+        meta.update({k: old[k] for k in THRESHOLD_KEYS if k in old})
+    return meta
+
+
+def read_meta(meta_path=META_PATH) -> dict:
+    if not Path(meta_path).exists():
+        return {}
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def initial_version(old, data_dir=None, spec=None, metric=None):
+    """Erste Version aus data/embeddings (Spec/Metrik sonst aus der bisherigen faiss.json) -> (index, sidecar, meta);
+    geschrieben wird mit write_version unter index_lock"""
+    data_dir = Path(data_dir or config.PROJECT_ROOT / "data/embeddings")
+    spec = spec or old.get("spec", "Flat")
+    metric = metric or old.get("metric", "l2")
+
+    embeddings = np.load(data_dir / "embeddings.npy").astype("float32")
+    with open(data_dir / "labels.json") as f:
+        labels = json.load(f)
+    texts_path = data_dir / "texts.json"
+    texts = json.loads(texts_path.read_text()) if texts_path.exists() else [""] * len(labels)
+
+    # Training (IVF/PQ) auf allen Vektoren, Hinzufügen dann mit IDs 0..n-1
+    x = prepare_vectors(embeddings, metric)
+    trained = faiss.index_factory(x.shape[1], spec, METRICS[metric])
+    if not trained.is_trained:
+        trained.train(x)
+    index = with_ids(trained)
+    sidecar = empty_sidecar()
+    add_examples(index, sidecar, embeddings, labels, texts, metric)
+    return index, sidecar, init_meta(old, spec, metric)
+
+
+def cmd_init(args):
+    old = read_meta(META_PATH)
+    index, sidecar, meta = initial_version(old, spec=args.index, metric=args.metric)
+    spec, metric = meta["spec"], meta["metric"]
+
+    dropped = sorted(k for k in (*TUNING_KEYS, *THRESHOLD_KEYS) if k in old and k not in meta)
+    if dropped:
+        print(f"  {', '.join(dropped)} from faiss.json do not apply to {spec} ({metric}), re-run build_faiss.py --tune")
+    with index_lock(META_PATH):
+        meta = write_version(index, sidecar, meta, META_PATH, keep=args.keep)
+    print(f"✅ Version {meta['version']}: {meta['ntotal']} vectors ({spec}, {metric})")
+
+
+def cmd_add(args):
+    texts, labels = read_examples(args.examples)
+    if not texts:
+        print("Nothing to add")
+        return
+    embeddings = _embed(texts)
+    with index_lock(META_PATH):
+        meta, index, sidecar = load_state(META_PATH)
+        ids = add_examples(index, sidecar, embeddings, labels, texts, meta.get("metric", "l2"))
+        meta = write_version(index, sidecar, meta, META_PATH, keep=args.keep)
+    print(f"✅ Version {meta['version']}: +{len(ids)} (ids {ids[0]}..{ids[-1]}), {meta['ntotal']} vectors")
+
+
+def cmd_remove(args):
+    with index_lock(META_PATH):
+        meta, index, sidecar = load_state(META_PATH)
+        index, removed = remove_examples(index, sidecar, args.ids, meta)
+        meta = write_version(index, sidecar, meta, META_PATH, keep=args.keep)
+    print(f"✅ Version {meta['version']}: -{removed}, {meta['ntotal']} vectors")
+
+
+def cmd_info(args):
+    meta, index, sidecar = load_state(META_PATH)
+    print(json.dumps({k: meta[k] for k in ("version", "index_file", "spec", "metric", "ntotal") if k in meta}, indent=2))
+    print(f"next_id: {sidecar['next_id']}, labels: {len(set(sidecar['labels']))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS Index inkrementell pflegen (stabile IDs, versioniert)")
+    parser.add_argument("--keep", type=int, default=3, help="Anzahl Versionen, die auf der Platte bleiben")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("init", help="Versionierten Index aus data/embeddings anlegen")
+    p.add_argument("--index", default=None, help="index_factory Spec (Standard: aus faiss.json bzw. Flat)")
+    p.add_argument("--metric", choices=["l2", "cosine"], default=None)
+    p.set_defaults(func=cmd_init)
+
+    p = sub.add_parser("add", help="Neue gelabelte Beispiele hinzufügen")
+    p.add_argument("examples", help='{"intent": ["text", ...]} JSON oder JSONL mit "text" und "label"')
+    p.set_defaults(func=cmd_add)
+
+    p = sub.add_parser("remove", help="Beispiele per ID entfernen")
+    p.add_argument("--ids", type=int, nargs="+", required=True)
+    p.set_defaults(func=cmd_remove)
+
+    p = sub.add_parser("info", help="Aktuelle Version anzeigen")
+    p.set_defaults(func=cmd_info)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,23 @@ ENV_VARS="${ENV_VARS} CHAT_MODEL=${CHAT_MODEL}"
 ENV_VARS="${ENV_VARS} CLF_THRESHOLD=${CLF_THRESHOLD}"
 ENV_VARS="${ENV_VARS} RETRIEVAL_THRESHOLD=${RETRIEVAL_THRESHOLD}"
 
+# Optional: Performance-Tuning (wenn gesetzt)
+for VAR in FAISS_MMAP RETRIEVAL_K KNN_AGREEMENT_THRESHOLD \
+           EMB_PROVIDER EMB_CACHE_SIZE EMB_CACHE_PATH SERVER_TIMING METRICS_ENABLED TRACING_ENABLED \
+           LOG_FORMAT LOG_LEVEL LOG_RESULT_SAMPLE_RATE \
+           ONLINE_LEARNING FEEDBACK_DB_PATH FEEDBACK_AUTO_ACCEPT FEEDBACK_MIN_AGREEMENT \
+           ONLINE_APPLY_SECONDS ONLINE_RELOAD_SECONDS ONLINE_RETRAIN_MIN_EXAMPLES ONLINE_RETRAIN_MAX_DROP \
+           EMB_BATCH_ENABLED EMB_BATCH_MAX_WAIT_MS EMB_BATCH_MAX_SIZE EMB_BATCH_CONCURRENCY \
+           EMB_BATCH_SIZE BATCH_FALLBACK_WORKERS BATCH_STREAM_CHUNK \
+           FALLBACK_CACHE_SIZE FALLBACK_CACHE_TTL CHAT_MAX_CONCURRENCY CHAT_MAX_QUEUE CHAT_QUEUE_TIMEOUT \
+           WARMUP_ENABLED WARMUP_FALLBACK WARMUP_RETRY_SECONDS \
+           HTTP_MAX_CONNECTIONS HTTP_MAX_KEEPALIVE HTTP_KEEPALIVE_EXPIRY HTTP2 \
+           EMB_CONNECT_TIMEOUT EMB_READ_TIMEOUT CHAT_CONNECT_TIMEOUT CHAT_READ_TIMEOUT; do
+  if [ -n "${!VAR}" ]; then
+    ENV_VARS="${ENV_VARS} ${VAR}=${!VAR}"
+  fi
+done
+
 # Optional: Application Insights (wenn gesetzt)
 if [ -n "${APP_INSIGHTS_CONN_STR}" ]; then
   ENV_VARS="${ENV_VARS} APP_INSIGHTS_CONN_STR=${APP_INSIGHTS_CONN_STR}"
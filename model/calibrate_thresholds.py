@@ -0,0 +1,296 @@
+"""
+Calibrate CLF_THRESHOLD / RETRIEVAL_THRESHOLD for the lowest LLM fallback rate
+that keeps end-to-end accuracy at or above a target.
+
+A labelled set is replayed through the serving stages (predict_intent._classify_batch:
+numpy scorer + FAISS kNN) without any LLM call:
+
+- default: stratified k-fold over data/embeddings; per fold a classifier and an
+  exact index are fitted on the other folds, so every example is scored out-of-fold
+- --holdout: a separate labelled file (intents.json format or JSONL text/label)
+  through the served artifacts
+
+For every (CLF_THRESHOLD, RETRIEVAL_THRESHOLD) pair the fallback decision of
+_needs_fallback is evaluated. Answered locally, an example counts as correct if
+clf_intent is its label; a fallback counts as correct with probability
+--llm-accuracy. The pair with the lowest fallback rate among those reaching
+--target-accuracy (default: the accuracy of the current thresholds) wins. With
+--per-intent, intents with enough support get their own pair as long as the
+overall accuracy stays above the target.
+
+The result is written to model/artifacts/thresholds.json and applied by
+predict_intent when the models are loaded (it replaces env and faiss.json values).
+
+    python model/calibrate_thresholds.py --target-accuracy 0.95 --per-intent
+    python model/calibrate_thresholds.py --holdout data/input/holdout.jsonl
+"""
+import os
+import sys
+import argparse
+import json
+import time
+import warnings
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import numpy as np
+
+import config
+from model import predict_intent as p
+
+THRESHOLDS_PATH = config.PROJECT_ROOT / "model/artifacts/thresholds.json"
+
+def replay_kfold(X, labels, params=None, folds=5, metric="l2", max_iter=2000, seed=42) -> list:
+    """Out-of-fold Scores: pro Fold Classifier + Flat-Index auf den übrigen Folds, dann _classify_batch mit
+    einem eigenen ServingState (der ausgelieferte Zustand bleibt unberührt)"""
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.model_selection import StratifiedKFold
+
+    from data.build_faiss import build_index
+    from model.knn import encode_labels
+    from model.linear_scorer import LinearScorer
+    from model.train_classifier import clamp_folds, make_classifier
+
+    params = params or {"solver": "lbfgs", "penalty": "l2", "C": 1.0}
+    X = np.ascontiguousarray(X, dtype="float32")
+    y = np.asarray(labels).astype(str)
+    folds = clamp_folds(y, folds)
+    scores = [None] * len(y)
+    for train_idx, test_idx in StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, y):
+        clf = make_classifier(params, len(np.unique(y)), max_iter)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", ConvergenceWarning)
+            clf.fit(X[train_idx], y[train_idx])
+        classes, codes = encode_labels(y[train_idx])
+        state = p.ServingState(scorer=LinearScorer.from_sklearn(clf), index=build_index(X[train_idx], "Flat", metric),
+                               retrieval_classes=classes, retrieval_codes=codes, index_meta={"metric": metric})
+        for i, s in zip(test_idx, p._classify_batch(X[test_idx], state)):
+            scores[i] = s
+    return scores
+
+
+def replay_served(X) -> list:
+    """Scores der ausgelieferten Artefakte (linear_model.npz + faiss.json/Index)"""
+    p._load_models()
+    return p._classify_batch(np.ascontiguousarray(X, dtype="float32"))
+
+
+def to_arrays(scores, labels) -> dict:
+    """Score-Dicts von _classify_batch -> Spalten für die vektorisierte Auswertung"""
+    return {
+        "label": np.asarray(labels).astype(str),
+        "clf_intent": np.array([s["clf_intent"] for s in scores]),
+        "clf_confidence": np.array([s["clf_confidence"] for s in scores]),
+        "retrieval_intent": np.array([s["retrieval_intent"] for s in scores]),
+        "retrieval_distance": np.array([s["retrieval_distance"] for s in scores]),
+        "retrieval_agreement": np.array([s["retrieval_agreement"] for s in scores]),
+    }
+
+
+def _subset(a, mask) -> dict:
+    return {k: v[mask] for k, v in a.items()}
+
+
+def fallback_mask(a, clf_threshold, retrieval_threshold, agreement_threshold):
+    """_needs_fallback für alle Zeilen auf einmal"""
+    knn_confirms = (a["retrieval_intent"] == a["clf_intent"]) & (a["retrieval_agreement"] >= agreement_threshold)
+    return (a["retrieval_distance"] > retrieval_threshold) | ((a["clf_confidence"] < clf_threshold) & ~knn_confirms)
+
+
+def _rates(a, fallback, llm_accuracy) -> dict:
+    """Fallback-Quote und End-to-End Accuracy (LLM-Antworten mit llm_accuracy richtig)"""
+    n = len(a["label"])
+    if not n:
+        return {"fallback_rate": 0.0, "accuracy": 0.0}
+    local_correct = int(np.sum((a["clf_intent"] == a["label"]) & ~fallback))
+    return {
+        "fallback_rate": float(fallback.mean()),
+        "accuracy": (local_correct + llm_accuracy * int(fallback.sum())) / n,
+    }
+
+
+def evaluate(a, clf_threshold, retrieval_threshold, agreement_threshold, llm_accuracy=1.0) -> dict:
+    fallback = fallback_mask(a, clf_threshold, retrieval_threshold, agreement_threshold)
+    return {
+        "clf_threshold": float(clf_threshold),
+        "retrieval_threshold": float(retrieval_threshold),
+        **_rates(a, fallback, llm_accuracy),
+    }
+
+
+def clf_grid(step=0.025) -> np.ndarray:
+    return np.round(np.arange(0.0, 1.0 + 1e-9, step), 4)
+
+
+def retrieval_grid(distances, n=40) -> np.ndarray:
+    """Quantile der beobachteten Top-1 Distanzen; das Maximum heißt: nie wegen Distanz zum LLM"""
+    return np.unique(np.quantile(distances, np.linspace(0.0, 1.0, n + 1)))
+
+
+def sweep(a, clf_thresholds, retrieval_thresholds, agreement_threshold, llm_accuracy=1.0) -> list:
+    return [
+        evaluate(a, ct, rt, agreement_threshold, llm_accuracy)
+        for ct in clf_thresholds
+        for rt in retrieval_thresholds
+    ]
+
+
+def select(rows, target_accuracy):
+    """Niedrigste Fallback-Quote mit accuracy >= target; bei Gleichstand die vorsichtigste Einstellung.
+    None, wenn keine Einstellung das Ziel erreicht"""
+    ok = [r for r in rows if r["accuracy"] >= target_accuracy - 1e-12]
+    if not ok:
+        return None
+    return min(ok, key=lambda r: (r["fallback_rate"], -r["accuracy"], -r["clf_threshold"], r["retrieval_threshold"]))
+
+
+def calibrate_per_intent(a, best, clf_thresholds, retrieval_thresholds, target_accuracy, agreement_threshold,
+                         llm_accuracy=1.0, min_support=30) -> dict:
+    """Eigene Thresholds pro clf_intent. Jede Gruppe darf höchstens den globalen Accuracy-Überschuss
+    (best - target) verlieren, so bleibt die Gesamt-Accuracy >= target"""
+    slack = max(best["accuracy"] - target_accuracy, 0.0)
+    per_intent = {}
+    for intent in np.unique(a["clf_intent"]):
+        group = _subset(a, a["clf_intent"] == intent)
+        if len(group["label"]) < min_support:
+            continue
+        current = evaluate(group, best["clf_threshold"], best["retrieval_threshold"], agreement_threshold, llm_accuracy)
+        row = select(sweep(group, clf_thresholds, retrieval_thresholds, agreement_threshold, llm_accuracy),
+                     current["accuracy"] - slack)
+        if row is None or row["fallback_rate"] >= current["fallback_rate"]:
+            continue
+        per_intent[str(intent)] = {**row, "support": len(group["label"])}
+    return per_intent
+
+
+def apply_per_intent(a, best, per_intent, agreement_threshold, llm_accuracy=1.0) -> dict:
+    """Gesamtergebnis mit globalen + pro-Intent Thresholds (wie predict_intent sie anwendet)"""
+    clf_t = np.full(len(a["label"]), best["clf_threshold"])
+    ret_t = np.full(len(a["label"]), best["retrieval_threshold"])
+    for intent, t in per_intent.items():
+        mask = a["clf_intent"] == intent
+        clf_t[mask], ret_t[mask] = t["clf_threshold"], t["retrieval_threshold"]
+    return _rates(a, fallback_mask(a, clf_t, ret_t, agreement_threshold), llm_accuracy)
+
+
+def calibrate(a, target_accuracy=None, agreement_threshold=None, llm_accuracy=1.0, per_intent=False,
+              min_support=30, step=0.025, quantiles=40, current=None) -> dict:
+    """Sweep + Auswahl -> Inhalt von thresholds.json. Baseline sind die aktiven Thresholds (current im Format
+    von p.resolve_thresholds, Default: der geladene Serving-Zustand) inkl. der Werte pro Intent"""
+    current = current or p._state._asdict()
+    if agreement_threshold is None:
+        agreement_threshold = current["KNN_AGREEMENT_THRESHOLD"]
+    baseline = evaluate(a, current["CLF_THRESHOLD"], current["RETRIEVAL_THRESHOLD"], agreement_threshold, llm_accuracy)
+    if current["intent_thresholds"]:
+        baseline.update(apply_per_intent(a, baseline, current["intent_thresholds"], agreement_threshold, llm_accuracy))
+    target = baseline["accuracy"] if target_accuracy is None else target_accuracy
+
+    clf_thresholds = clf_grid(step)
+    retrieval_thresholds = retrieval_grid(a["retrieval_distance"], quantiles)
+    best = select(sweep(a, clf_thresholds, retrieval_thresholds, agreement_threshold, llm_accuracy), target)
+    if best is None:
+        raise ValueError(f"No threshold setting reaches accuracy {target:.3f} "
+                         f"(llm_accuracy={llm_accuracy}); lower --target-accuracy")
+
+    intents = {}
+    expected = best
+    if per_intent:
+        intents = calibrate_per_intent(a, best, clf_thresholds, retrieval_thresholds, target, agreement_threshold,
+                                       llm_accuracy, min_support)
+        expected = apply_per_intent(a, best, intents, agreement_threshold, llm_accuracy)
+
+    return {
+        "clf_threshold": best["clf_threshold"],
+        "retrieval_threshold": best["retrieval_threshold"],
+        "agreement_threshold": float(agreement_threshold),
+        "per_intent": {k: {"clf_threshold": v["clf_threshold"], "retrieval_threshold": v["retrieval_threshold"]}
+                       for k, v in intents.items()},
+        "target_accuracy": float(target),
+        "llm_accuracy": float(llm_accuracy),
+        "examples": int(len(a["label"])),
+        "expected": {"fallback_rate": expected["fallback_rate"], "accuracy": expected["accuracy"]},
+        "baseline": {k: baseline[k] for k in ("clf_threshold", "retrieval_threshold", "fallback_rate", "accuracy")},
+        "per_intent_expected": {k: {m: v[m] for m in ("support", "fallback_rate", "accuracy")}
+                                for k, v in intents.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLF/RETRIEVAL_THRESHOLD für minimale Fallback-Quote kalibrieren")
+    parser.add_argument("--holdout", default=None,
+                        help="gelabelte Texte (intents.json-Format oder JSONL text/label) gegen die ausgelieferten Artefakte")
+    parser.add_argument("--embeddings", default=str(config.PROJECT_ROOT / "data/embeddings/embeddings.npy"))
+    parser.add_argument("--labels", default=str(config.PROJECT_ROOT / "data/embeddings/labels.json"))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--C", type=float, default=1.0)
+    parser.add_argument("--solver", default="lbfgs", choices=["liblinear", "saga", "lbfgs"])
+    parser.add_argument("--penalty", default="l2", choices=["l1", "l2"])
+    parser.add_argument("--target-accuracy", type=float, default=None,
+                        help="min. End-to-End Accuracy (Default: Accuracy der aktuellen Thresholds)")
+    parser.add_argument("--llm-accuracy", type=float, default=1.0, help="angenommene Accuracy des LLM-Fallbacks")
+    parser.add_argument("--agreement-threshold", type=float, default=None, help="Default: KNN_AGREEMENT_THRESHOLD")
+    parser.add_argument("--per-intent", action="store_true", help="zusätzlich Thresholds pro Intent")
+    parser.add_argument("--min-support", type=int, default=30, help="min. Beispiele für Thresholds pro Intent")
+    parser.add_argument("--step", type=float, default=0.025, help="Schrittweite des CLF_THRESHOLD Grids")
+    parser.add_argument("--quantiles", type=int, default=40, help="Stützstellen des RETRIEVAL_THRESHOLD Grids")
+    parser.add_argument("--output", default=str(THRESHOLDS_PATH))
+    args = parser.parse_args()
+
+    if args.holdout:
+        from data.update_faiss import _embed, read_examples
+        texts, labels = read_examples(args.holdout)
+        scores = replay_served(_embed(texts))
+        metric = p.index_meta.get("metric", "l2")
+        current = None  # Thresholds des eben geladenen Zustands
+        source = f"holdout:{Path(args.holdout).name}"
+    else:
+        X = np.load(args.embeddings).astype("float32")
+        with open(args.labels) as f:
+            labels = json.load(f)
+        meta = p._read_index_meta(config.PROJECT_ROOT / "data/vector_db/faiss.json")
+        metric = meta.get("metric", "l2")
+        # Baseline wie beim Serving: Env, dann faiss.json, dann thresholds.json (bei passender Metrik)
+        current = p.resolve_thresholds(meta, p._read_index_meta(THRESHOLDS_PATH))
+        params = {"solver": args.solver, "penalty": args.penalty, "C": args.C}
+        from model.train_classifier import clamp_folds
+        try:
+            folds = clamp_folds(labels, args.folds)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        scores = replay_kfold(X, labels, params, folds, metric)
+        source = f"kfold:{folds}"
+
+    a = to_arrays(scores, labels)
+    result = calibrate(a, args.target_accuracy, args.agreement_threshold, args.llm_accuracy, args.per_intent,
+                       args.min_support, args.step, args.quantiles, current)
+    result.update({"metric": metric, "source": source, "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
+
+    base, exp = result["baseline"], result["expected"]
+    print(f"{result['examples']} examples ({source}), metric {metric}, target accuracy {result['target_accuracy']:.3f}")
+    print(f"  current:    CLF_THRESHOLD={base['clf_threshold']:.3f} RETRIEVAL_THRESHOLD={base['retrieval_threshold']:.4f} "
+          f"fallback={base['fallback_rate']:.1%} accuracy={base['accuracy']:.3f}")
+    print(f"  calibrated: CLF_THRESHOLD={result['clf_threshold']:.3f} "
+          f"RETRIEVAL_THRESHOLD={result['retrieval_threshold']:.4f} "
+          f"fallback={exp['fallback_rate']:.1%} accuracy={exp['accuracy']:.3f}")
+    for intent, t in result["per_intent"].items():
+        e = result["per_intent_expected"][intent]
+        print(f"    {intent:<20} clf={t['clf_threshold']:.3f} retrieval={t['retrieval_threshold']:.4f} "
+              f"n={e['support']} fallback={e['fallback_rate']:.1%} accuracy={e['accuracy']:.3f}")
+
+    # tmp + rename: Worker laden thresholds.json per mtime neu und dürfen keine halbe Datei sehen
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp, output)
+    print(f"✅ Thresholds saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-from openai import AzureOpenAI
+import hashlib
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import logging
 
+from model.cache import LRUCache, normalize_text
+from model.concurrency import (
+    AsyncSingleFlight,
+    ConcurrencyLimiter,
+    SingleFlight,
+)
 from model.fallback_promt import INTENT_DESCRIPTIONS, build_fallback_prompt
 
 logger = logging.getLogger(__name__)
@@ -10,30 +18,188 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 logger.info("Environment loaded")
 
-api_version=os.getenv("AZURE_OPENAI_APIVERSION")
-azure_endpoint=os.getenv("CHAT_ENDPOINT_URI")
+# Clients werden erst beim ersten Fallback erzeugt (get_chat_client), damit der Import
+# von openai nicht den Start der App verzögert. Die Modul-Variablen bleiben patchbar.
+chat_client = None
+async_chat_client = None
+_client_lock = threading.Lock()
 
-logger.info(f"API version: {api_version}")
-logger.info(f"Azure endpoint: {azure_endpoint}")
 
-chat_client = AzureOpenAI(
-    api_version=api_version,
-    azure_endpoint=azure_endpoint,
-    api_key=os.getenv("CHAT_ENDPOINT_KEY") # AZURE_OPENAI_KEY1
-)
+def _client_kwargs() -> dict:
+    api_key = os.getenv("CHAT_ENDPOINT_KEY") # AZURE_OPENAI_KEY1
+    if not api_key:
+        raise ValueError("CHAT_ENDPOINT_KEY environment variable is not set")
+    api_version = os.getenv("AZURE_OPENAI_APIVERSION")
+    azure_endpoint = os.getenv("CHAT_ENDPOINT_URI")
+    logger.info(f"API version: {api_version}")
+    logger.info(f"Azure endpoint: {azure_endpoint}")
+    return {
+        "api_version": api_version,
+        "azure_endpoint": azure_endpoint,
+        "api_key": api_key,
+    }
 
-if not chat_client.api_key:
-    raise ValueError("CHAT_ENDPOINT_KEY environment variable is not set")
 
-logger.info("Chat client created")
+def get_chat_client():
+    global chat_client
+    if chat_client is None:
+        with _client_lock:
+            if chat_client is None:
+                from openai import AzureOpenAI
+                from model.http_client import get_http_client, stage_timeout
+                chat_client = AzureOpenAI(
+                    **_client_kwargs(),
+                    http_client=get_http_client("CHAT"),
+                    timeout=stage_timeout("CHAT")
+                )
+                logger.info("Chat client created")
+    return chat_client
 
 
-def llm_fallback(text):
+def get_async_chat_client():
+    """Async Client für den async /predict Pfad (gleiche Konfiguration)"""
+    global async_chat_client
+    if async_chat_client is None:
+        with _client_lock:
+            if async_chat_client is None:
+                from openai import AsyncAzureOpenAI
+                from model.http_client import get_async_http_client, stage_timeout
+                async_chat_client = AsyncAzureOpenAI(
+                    **_client_kwargs(),
+                    http_client=get_async_http_client("CHAT"),
+                    timeout=stage_timeout("CHAT")
+                )
+                logger.info("Async chat client created")
+    return async_chat_client
+
+
+def _fallback_messages(text):
     prompt = INTENT_DESCRIPTIONS + "\n" + build_fallback_prompt(text)
-    r = chat_client.chat.completions.create(
-        model=os.getenv("CHAT_MODEL"),
-        messages=[{"role": "system", "content": prompt}]
-    )
-    return r.choices[0].message.content.strip()
+    return [{"role": "system", "content": prompt}]
+
+
+# Fallback Cache (TTL + LRU). Der Key enthält einen Hash von Prompt-Template und CHAT_MODEL,
+# d.h. eine Änderung am Prompt oder am Modell invalidiert alte Antworten automatisch.
+_fallback_cache = None
+_fallback_cache_lock = threading.Lock()
+_fallback_stats = {"calls": 0, "latency_s": 0.0, "max_latency_s": 0.0}
+
+
+# Single-Flight (gleiche Texte teilen sich einen LLM-Call) und Concurrency-Limit mit
+# begrenzter Warteschlange, damit ein Fallback-Sturm das Rate Limit nicht ausschöpft.
+# Ein Limiter für sync und async Pfad: CHAT_MAX_CONCURRENCY gilt für beide zusammen
+_fallback_flight = SingleFlight()
+_async_fallback_flight = AsyncSingleFlight()
+_chat_limiter = None
+
+
+def _limiter_settings() -> dict:
+    return {
+        "max_concurrent": int(os.getenv("CHAT_MAX_CONCURRENCY", 8)),
+        "max_queue": int(os.getenv("CHAT_MAX_QUEUE", 32)),
+        "timeout": float(os.getenv("CHAT_QUEUE_TIMEOUT", 30)),
+    }
+
+
+def get_chat_limiter() -> ConcurrencyLimiter:
+    global _chat_limiter
+    if _chat_limiter is None:
+        with _fallback_cache_lock:
+            if _chat_limiter is None:
+                _chat_limiter = ConcurrencyLimiter(**_limiter_settings())
+    return _chat_limiter
+
+
+def get_fallback_cache() -> LRUCache:
+    global _fallback_cache
+    if _fallback_cache is None:
+        with _fallback_cache_lock:
+            if _fallback_cache is None:
+                _fallback_cache = LRUCache(
+                    maxsize=int(os.getenv("FALLBACK_CACHE_SIZE", 1024)),
+                    ttl=float(os.getenv("FALLBACK_CACHE_TTL", 86400))
+                )
+    return _fallback_cache
+
+
+def prompt_fingerprint(model) -> str:
+    template = INTENT_DESCRIPTIONS + "\n" + build_fallback_prompt("{text}")
+    return hashlib.sha256(f"{model}\x1f{template}".encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_key(text, model):
+    return (normalize_text(text), prompt_fingerprint(model))
+
+
+def _record_call(latency):
+    with _fallback_cache_lock:
+        _fallback_stats["calls"] += 1
+        _fallback_stats["latency_s"] += latency
+        _fallback_stats["max_latency_s"] = max(_fallback_stats["max_latency_s"], latency)
+
+
+def fallback_stats() -> dict:
+    cache = get_fallback_cache().stats()
+    lookups = cache["hits"] + cache["misses"]
+    calls = _fallback_stats["calls"]
+    return {
+        "cache_hits": cache["hits"],
+        "cache_misses": cache["misses"],
+        "cache_size": cache["size"],
+        "evictions": cache["evictions"],
+        "expirations": cache["expirations"],
+        "hit_rate": cache["hits"] / lookups if lookups else 0.0,
+        "llm_calls": calls,
+        "avg_latency_s": _fallback_stats["latency_s"] / calls if calls else 0.0,
+        "max_latency_s": _fallback_stats["max_latency_s"],
+        "shared_inflight": _fallback_flight.shared + _async_fallback_flight.shared,
+        "limiter": get_chat_limiter().stats(),
+    }
+
+
+def llm_fallback(text):
+    """LLM-Klassifikation; wirft FallbackRejectedError, wenn kein Slot frei wird"""
+    model = os.getenv("CHAT_MODEL")
+    key = _cache_key(text, model)
+    cached = get_fallback_cache().get(key)
+    if cached is not None:
+        return cached
+    return _fallback_flight.do(key, lambda: _complete(text, model, key))
+
+
+def _complete(text, model, key):
+    with get_chat_limiter().slot():
+        start = time.perf_counter()
+        r = get_chat_client().chat.completions.create(
+            model=model,
+            messages=_fallback_messages(text)
+        )
+        _record_call(time.perf_counter() - start)
+    answer = r.choices[0].message.content.strip()
+    get_fallback_cache().put(key, answer)
+    return answer
+
+
+async def llm_fallback_async(text):
+    """Async Variante von llm_fallback"""
+    model = os.getenv("CHAT_MODEL")
+    key = _cache_key(text, model)
+    cached = get_fallback_cache().get(key)
+    if cached is not None:
+        return cached
+    return await _async_fallback_flight.do(key, lambda: _complete_async(text, model, key))
+
+
+async def _complete_async(text, model, key):
+    async with get_chat_limiter().async_slot():
+        start = time.perf_counter()
+        r = await get_async_chat_client().chat.completions.create(
+            model=model,
+            messages=_fallback_messages(text)
+        )
+        _record_call(time.perf_counter() - start)
+    answer = r.choices[0].message.content.strip()
+    get_fallback_cache().put(key, answer)
+    return answer
 
 
@@ -0,0 +1,194 @@
+"""
+Concurrency primitives for calls to rate-limited Azure deployments.
+
+SingleFlight lets concurrent callers with the same key share one call.
+ConcurrencyLimiter caps parallel calls and bounds the number of callers that
+may wait for a free slot; everyone beyond that is rejected right away instead
+of piling up behind a 429-ing deployment. SingleFlight comes in a thread and an
+asyncio flavour; the limiter serves both prediction paths from one budget
+(slot() for threads, async_slot() for coroutines).
+"""
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+
+
+class FallbackRejectedError(RuntimeError):
+    """Kein Slot frei: Warteschlange voll oder Wartezeit abgelaufen"""
+
+
+class SingleFlight:
+    """In-flight Deduplizierung für Threads: gleiche Keys teilen sich einen Call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """In-flight Deduplizierung für Coroutines im selben Event Loop. Der Call läuft als eigener Task:
+    bricht der erste Aufrufer ab (Client weg), bekommen die Mitläufer trotzdem das Ergebnis"""
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, coro_fn):
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(coro_fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # als abgerufen markieren, auch wenn niemand mehr wartet
+
+
+class _Waiter:
+    """Wartender Thread (Event) oder wartende Coroutine (Future in ihrem Loop)"""
+
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def wake(self) -> bool:
+        if self.loop is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._set_future)
+        except RuntimeError:  # Loop bereits geschlossen
+            return False
+        return True
+
+    def _set_future(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """Max. max_concurrent parallele Calls, max. max_queue Wartende. Threads (slot) und Coroutines
+    (async_slot) teilen sich ein Budget; ein freier Slot geht direkt an den nächsten Wartenden (FIFO)"""
+
+    def __init__(self, max_concurrent, max_queue, timeout=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def _acquire_or_enqueue(self, waiter) -> bool:
+        """True: Slot sofort erhalten; False: eingereiht"""
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiters:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise FallbackRejectedError("Fallback queue is full")
+            self.waiting += 1
+            self._waiters.append(waiter)
+            return False
+
+    def _leave(self, waiter) -> bool:
+        """Nach Timeout/Abbruch: True, wenn der Slot inzwischen doch übergeben wurde"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            self.waiting -= 1
+            return False
+
+    def _reject_timeout(self):
+        with self._lock:
+            self.rejected += 1
+        raise FallbackRejectedError(f"No fallback slot within {self.timeout}s")
+
+    def _release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                self.waiting -= 1
+                if waiter.wake():
+                    waiter.granted = True
+                    return
+            self.active -= 1
+
+    @contextmanager
+    def slot(self):
+        waiter = _Waiter()
+        if not self._acquire_or_enqueue(waiter):
+            waiter.event.wait(self.timeout)
+            if not self._leave(waiter):
+                self._reject_timeout()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        waiter = _Waiter(asyncio.get_running_loop())
+        if not self._acquire_or_enqueue(waiter):
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if self._leave(waiter):
+                    self._release()
+                raise
+            if not self._leave(waiter):
+                self._reject_timeout()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,106 @@
+"""
+Micro-batching for concurrent embed_query calls.
+
+Requests arriving within a short window (max_wait_ms) are collected and sent
+as one embeddings.create call with a list input; the vectors are fanned back
+out to the waiting callers. Identical texts that are already in flight share
+the same future instead of being embedded twice.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from model.cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Sammelt parallele Einzel-Requests und schickt sie gebündelt an embed_batch"""
+
+    def __init__(self, embed_batch, max_wait_ms=5.0, max_batch_size=64, max_concurrent_batches=4):
+        self._embed_batch = embed_batch  # callable(list[str]) -> list of vectors
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._cond = threading.Condition()
+        self._pending = []  # normalisierte Texte, die auf den nächsten Batch warten
+        self._inflight = {}  # normalisierter Text -> Future
+        self._executor = ThreadPoolExecutor(max_concurrent_batches, thread_name_prefix="emb-batch")
+        self._worker = None
+        self.requests = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+    def submit(self, text) -> Future:
+        key = normalize_text(text)
+        with self._cond:
+            self.requests += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            future = Future()
+            self._inflight[key] = future
+            self._pending.append(key)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="emb-batcher", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        return future
+
+    def embed(self, text, timeout=None):
+        return self.submit(text).result(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Fenster offen halten, bis es voll ist oder max_wait abläuft
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            vectors = self._embed_batch(batch)
+            error = None
+            if vectors is None or len(vectors) != len(batch):
+                raise ValueError(f"embed_batch returned {0 if vectors is None else len(vectors)} "
+                                 f"vectors for {len(batch)} texts")
+        except Exception as e:
+            logger.warning("Embedding batch of %d failed: %s", len(batch), e)
+            vectors, error = None, e
+
+        with self._cond:
+            futures = [self._inflight.pop(key) for key in batch]
+            self.batches += 1
+            self.batched_texts += len(batch)
+
+        for i, future in enumerate(futures):
+            # abgebrochene Futures überspringen; ein Fehler darf die übrigen Aufrufer nicht hängen lassen
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(vectors[i])
+            except Exception as e:
+                logger.warning("Could not resolve embedding future: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "avg_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,169 @@
+"""
+Two-tier embedding cache in front of the Azure embeddings API.
+
+Tier 1 is a per-process LRU, tier 2 a SQLite file (WAL mode) that all uvicorn
+workers on the host share and that survives restarts. Keys are derived from
+(normalized text, EMB_MODEL, EMB_DIM), so changing model or dimension never
+serves stale vectors.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from model.cache import LRUCache, normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(text, model, dim) -> str:
+    raw = f"{model}\x1f{dim}\x1f{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SqliteVectorStore:
+    """Float32-Vektoren in SQLite, Key -> Vektor (eine Connection pro Thread).
+    Mit max_rows werden beim Einfügen die ältesten Zeilen gelöscht (rowid wächst mit jedem INSERT OR REPLACE)"""
+
+    def __init__(self, path, max_rows=None):
+        self.path = Path(path)
+        self.max_rows = max_rows or None
+        self.evictions = 0
+        self._evictions_lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            # WAL: parallele Leser aus mehreren Worker-Prozessen, ein Schreiber
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT vector FROM vectors WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype="float32").copy()
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        keys = list(keys)
+        # SQLite Parameter-Limit: in Blöcken abfragen
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn().execute(
+                f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype="float32").copy()
+        return found
+
+    def put(self, key, vector):
+        self.put_many([(key, vector)])
+
+    def put_many(self, items):
+        rows = []
+        for key, vector in items:
+            vec = np.asarray(vector, dtype="float32").ravel()
+            rows.append((key, int(vec.shape[0]), vec.tobytes()))
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO vectors (key, dim, vector) VALUES (?, ?, ?)", rows
+        )
+        if self.max_rows:
+            # Bereichs-Delete über rowid statt COUNT(*): bleibt O(log n) pro Insert
+            cur = conn.execute(
+                "DELETE FROM vectors WHERE rowid <= (SELECT MAX(rowid) FROM vectors) - ?", (self.max_rows,)
+            )
+            if cur.rowcount > 0:
+                with self._evictions_lock:
+                    self.evictions += cur.rowcount
+        conn.commit()
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class EmbeddingCache:
+    """Memory-LRU + optionaler SQLite-Tier (höchstens disk_max_rows Zeilen) mit Countern für Hits, Misses
+    und Evictions"""
+
+    def __init__(self, maxsize=4096, path=None, disk_max_rows=None):
+        self.memory = LRUCache(maxsize)
+        self.disk = SqliteVectorStore(path, max_rows=disk_max_rows) if path else None
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0  # Summe der API-Latenz bei Misses
+
+    def get_memory(self, text, model, dim):
+        """Nur der Memory-Tier (kein I/O, im Event Loop unbedenklich); Misses zählt erst get()"""
+        vec = self.memory.get(make_key(text, model, dim))
+        return None if vec is None else vec.copy()
+
+    def get(self, text, model, dim):
+        key = make_key(text, model, dim)
+        vec = self.memory.get(key)
+        if vec is not None:
+            return vec.copy()
+        if self.disk is not None:
+            try:
+                vec = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+                vec = None
+            if vec is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self.memory.put(key, vec)
+                return vec.copy()
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, model, dim, vector, latency=None):
+        key = make_key(text, model, dim)
+        vec = np.asarray(vector, dtype="float32").ravel().copy()
+        self.memory.put(key, vec)
+        if latency is not None:
+            with self._lock:
+                self.miss_seconds += latency
+        if self.disk is not None:
+            try:
+                self.disk.put(key, vec)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.disk_hits
+        lookups = hits + self.misses
+        avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": memory["evictions"],
+            "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+            "memory_size": memory["size"],
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "avg_miss_latency_s": avg_miss,
+            # geschätzte eingesparte Netzwerk-Latenz
+            "saved_seconds": hits * avg_miss,
+        }
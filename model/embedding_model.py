@@ -1,46 +1,244 @@
-from openai import AzureOpenAI
+import asyncio
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import numpy as np
 import logging
 
+import config
+from model.embedding_batcher import EmbeddingBatcher
+from model.embedding_cache import EmbeddingCache
+from model.embedding_providers import EmbeddingProvider, HashingEmbeddingProvider
+
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 logger.info("Environment loaded")
 
-azure_endpoint=os.getenv("EMB_ENDPOINT_BASE")   #("EMB_MODEL_DEPLOY_TARGET_URI")
-azure_deployment=os.getenv("EMB_MODEL_DEPLOY_NAME")
-api_version=os.getenv("AZURE_OPENAI_APIVERSION")
+# Clients werden erst beim ersten Embedding erzeugt (get_embed_client): der Import
+# von openai kostet mehrere hundert ms und gehört nicht in den Import der App.
+# Die Modul-Variablen bleiben, damit Tests sie patchen können.
+embed_client = None
+async_embed_client = None
+_client_lock = threading.Lock()
+
+
+def _client_kwargs() -> dict:
+    api_key = os.getenv("EMB_MODEL_DEPLOY_KEY")
+    if not api_key:
+        raise ValueError("EMB_MODEL_DEPLOY_KEY environment variable is not set")
+    azure_endpoint = os.getenv("EMB_ENDPOINT_BASE")   #("EMB_MODEL_DEPLOY_TARGET_URI")
+    azure_deployment = os.getenv("EMB_MODEL_DEPLOY_NAME")
+    api_version = os.getenv("AZURE_OPENAI_APIVERSION")
+    logger.info(f"Azure endpoint: {azure_endpoint}")
+    logger.info(f"Azure deployment: {azure_deployment}")
+    logger.info(f"API version: {api_version}")
+    return {
+        "azure_endpoint": azure_endpoint,
+        "azure_deployment": azure_deployment,
+        "api_version": api_version,
+        "api_key": api_key,
+    }
+
+
+def get_embed_client():
+    global embed_client
+    if embed_client is None:
+        with _client_lock:
+            if embed_client is None:
+                from openai import AzureOpenAI
+                from model.http_client import get_http_client, stage_timeout
+                embed_client = AzureOpenAI(
+                    **_client_kwargs(),
+                    http_client=get_http_client("EMB"),
+                    timeout=stage_timeout("EMB")
+                )
+                logger.info("Embedding client created")
+    return embed_client
+
+
+def get_async_embed_client():
+    """Async Client für den async /predict Pfad (gleiche Konfiguration)"""
+    global async_embed_client
+    if async_embed_client is None:
+        with _client_lock:
+            if async_embed_client is None:
+                from openai import AsyncAzureOpenAI
+                from model.http_client import get_async_http_client, stage_timeout
+                async_embed_client = AsyncAzureOpenAI(
+                    **_client_kwargs(),
+                    http_client=get_async_http_client("EMB"),
+                    timeout=stage_timeout("EMB")
+                )
+                logger.info("Async embedding client created")
+    return async_embed_client
+
+
+class AzureEmbeddingProvider(EmbeddingProvider):
+    """Azure OpenAI embeddings über die geteilten (lazy) Clients"""
+
+    name = "azure"
+
+    def embed_batch(self, texts) -> list:
+        r = get_embed_client().embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        return [np.array(d.embedding, dtype="float32") for d in r.data]
+
+    def embed(self, text):
+        r = get_embed_client().embeddings.create(model=self.model, input=text, dimensions=self.dim)
+        return np.array(r.data[0].embedding, dtype="float32")
+
+    async def embed_batch_async(self, texts) -> list:
+        r = await get_async_embed_client().embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        return [np.array(d.embedding, dtype="float32") for d in r.data]
+
+    async def embed_async(self, text):
+        r = await get_async_embed_client().embeddings.create(model=self.model, input=text, dimensions=self.dim)
+        return np.array(r.data[0].embedding, dtype="float32")
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Provider nach EMB_PROVIDER ("azure" | "local"); bei jedem Aufruf aus der Umgebung gelesen,
+    die Objekte sind leichtgewichtig (die Azure Clients bleiben geteilt)"""
+    name = (os.getenv("EMB_PROVIDER") or "azure").lower()
+    dim = int(os.getenv("EMB_DIM"))
+    if name == "azure":
+        return AzureEmbeddingProvider(os.getenv("EMB_MODEL"), dim)
+    if name == "local":
+        return HashingEmbeddingProvider(dim)
+    raise ValueError(f"Unknown EMB_PROVIDER: {name} (expected 'azure' or 'local')")
+
 
-logger.info(f"Azure endpoint: {azure_endpoint}")
-logger.info(f"Azure deployment: {azure_deployment}")
-logger.info(f"API version: {api_version}")
+# Embedding Cache (Memory-LRU + optional SQLite, von allen Workern geteilt)
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
 
-embed_client = AzureOpenAI(
-    azure_endpoint=azure_endpoint,
-    azure_deployment=azure_deployment,
-    api_version=api_version,
-    api_key=os.getenv("EMB_MODEL_DEPLOY_KEY")
-)
 
-if not embed_client.api_key:
-    raise ValueError("EMB_MODEL_DEPLOY_KEY environment variable is not set")
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                path = os.getenv("EMB_CACHE_PATH")
+                if path:
+                    path = config.PROJECT_ROOT / path
+                _embedding_cache = EmbeddingCache(
+                    maxsize=int(os.getenv("EMB_CACHE_SIZE", 4096)),
+                    path=path,
+                    disk_max_rows=int(os.getenv("EMB_CACHE_DISK_MAX_ROWS", 100000))
+                )
+                logger.info(f"Embedding cache created (disk tier: {path or 'disabled'})")
+    return _embedding_cache
+
+
+def embedding_cache_stats() -> dict:
+    return get_embedding_cache().stats()
+
+
+# Micro-Batching paralleler embed_query Aufrufe (optional)
+_embedding_batcher = None
+_embedding_batcher_lock = threading.Lock()
+
+
+def _embed_batch(texts):
+    return get_embedding_provider().embed_batch(texts)
+
+
+def get_embedding_batcher():
+    """Liefert den Batcher, oder None wenn EMB_BATCH_ENABLED nicht gesetzt ist"""
+    global _embedding_batcher
+    if os.getenv("EMB_BATCH_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    if _embedding_batcher is None:
+        with _embedding_batcher_lock:
+            if _embedding_batcher is None:
+                _embedding_batcher = EmbeddingBatcher(
+                    _embed_batch,
+                    max_wait_ms=float(os.getenv("EMB_BATCH_MAX_WAIT_MS", 5)),
+                    max_batch_size=int(os.getenv("EMB_BATCH_MAX_SIZE", 64)),
+                    max_concurrent_batches=int(os.getenv("EMB_BATCH_CONCURRENCY", 4))
+                )
+                logger.info("Embedding batcher created")
+    return _embedding_batcher
 
-logger.info("Embedding client created")
 
 def embed_query(q):
-    r = embed_client.embeddings.create(
-        model=os.getenv("EMB_MODEL"),
-        input=q,
-        dimensions=int(os.getenv("EMB_DIM"))
-    )
-    return np.array(r.data[0].embedding, dtype="float32").reshape(1, -1)
+    provider = get_embedding_provider()
+    model, dim = provider.model, provider.dim
+
+    cache = get_embedding_cache()
+    cached = cache.get(q, model, dim)
+    if cached is not None:
+        return cached.reshape(1, -1)
+
+    start = time.perf_counter()
+    batcher = get_embedding_batcher()
+    if batcher is not None:
+        emb = batcher.embed(q)
+    else:
+        emb = provider.embed(q)
+    cache.put(q, model, dim, emb, latency=time.perf_counter() - start)
+    return emb.reshape(1, -1)
+
+async def embed_query_async(q):
+    """Async Variante von embed_query – blockiert den Event Loop nicht"""
+    provider = get_embedding_provider()
+    model, dim = provider.model, provider.dim
+
+    cache = get_embedding_cache()
+    # SQLite-Tier (Lesen / Commit mit Lock-Timeout) im Threadpool, Memory-LRU direkt
+    if cache.disk is None:
+        cached = cache.get(q, model, dim)
+    else:
+        cached = cache.get_memory(q, model, dim)
+        if cached is None:
+            cached = await asyncio.to_thread(cache.get, q, model, dim)
+    if cached is not None:
+        return cached.reshape(1, -1)
+
+    start = time.perf_counter()
+    batcher = get_embedding_batcher()
+    if batcher is not None:
+        # Das Future des Batchers teilen sich deduplizierte Aufrufer: ein abgebrochener Request
+        # (Client weg, Timeout) darf es nicht mit abbrechen
+        emb = await asyncio.shield(asyncio.wrap_future(batcher.submit(q)))
+    else:
+        emb = await provider.embed_async(q)
+    if cache.disk is None:
+        cache.put(q, model, dim, emb, latency=time.perf_counter() - start)
+    else:
+        await asyncio.to_thread(cache.put, q, model, dim, emb, latency=time.perf_counter() - start)
+    return emb.reshape(1, -1)
+
+def embed_many(texts):
+    """Embeddings für viele Texte als (n, dim) Matrix: Cache zuerst, Rest in Chunks
+    von EMB_BATCH_SIZE pro embeddings.create Call"""
+    provider = get_embedding_provider()
+    model, dim = provider.model, provider.dim
+    batch_size = int(os.getenv("EMB_BATCH_SIZE", 256))
+    cache = get_embedding_cache()
+
+    vectors = {}
+    missing = []
+    for t in dict.fromkeys(texts):  # dedupliziert, Reihenfolge bleibt
+        cached = cache.get(t, model, dim)
+        if cached is not None:
+            vectors[t] = cached
+        else:
+            missing.append(t)
+
+    for i in range(0, len(missing), batch_size):
+        chunk = missing[i:i + batch_size]
+        start = time.perf_counter()
+        embs = provider.embed_batch(chunk)
+        latency = (time.perf_counter() - start) / len(chunk)
+        for t, emb in zip(chunk, embs):
+            cache.put(t, model, dim, emb, latency=latency)
+            vectors[t] = emb
+
+    if not texts:
+        return np.empty((0, dim), dtype="float32")
+    return np.vstack([vectors[t] for t in texts]).astype("float32", copy=False)
 
 def embed_texts(texts):
-    r = embed_client.embeddings.create(
-        model=os.getenv("EMB_MODEL"),
-        input=texts,
-        dimensions=int(os.getenv("EMB_DIM"))
-    )
-    return [d.embedding for d in r.data]
+    return [v.tolist() for v in get_embedding_provider().embed_batch(texts)]
@@ -0,0 +1,77 @@
+"""
+Embedding-Provider: wer aus Texten Vektoren macht, wird per EMB_PROVIDER gewählt.
+
+- "azure" (Standard): Azure OpenAI embeddings (model/embedding_model.py)
+- "local": deterministische Hashing-Projektion von Zeichen-n-Grammen, ohne
+  Netzwerk und Key – für Load-Tests und reproduzierbare Offline-Benchmarks.
+  Ähnliche Texte bekommen ähnliche Vektoren, die Qualität ersetzt aber kein
+  echtes Embedding-Modell.
+
+Jeder Provider hat einen eigenen Modellnamen, damit Cache und Embedding-Store
+Vektoren verschiedener Provider nie mischen.
+"""
+import asyncio
+import re
+import zlib
+
+import numpy as np
+
+
+class EmbeddingProvider:
+    """Schnittstelle: embed_batch ist Pflicht, der Rest hat Default-Implementierungen"""
+
+    name = None
+
+    def __init__(self, model, dim):
+        self.model = model
+        self.dim = dim
+
+    def embed_batch(self, texts) -> list:
+        """list[str] -> list of float32 Vektoren (dim,)"""
+        raise NotImplementedError
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+    async def embed_batch_async(self, texts) -> list:
+        return await asyncio.to_thread(self.embed_batch, texts)
+
+    async def embed_async(self, text):
+        return (await self.embed_batch_async([text]))[0]
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Zeichen-n-Gramme (mit Wortgrenzen) per crc32 auf dim Buckets mit Vorzeichen, L2-normiert"""
+
+    name = "local"
+    VERSION = "v1"
+
+    def __init__(self, dim, ngram_range=(3, 5)):
+        low, high = ngram_range
+        super().__init__(f"local-hash-ngram{low}{high}-{self.VERSION}", dim)
+        self.ngram_range = (low, high)
+
+    def _ngrams(self, text):
+        text = f" {_WHITESPACE_RE.sub(' ', text.strip().lower())} "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                yield text[i:i + n]
+
+    def embed(self, text):
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in self._ngrams(text)), dtype="uint64")
+        # Unteres Bit als Vorzeichen, der Rest wählt den Bucket
+        signs = np.where(hashes & 1, -1.0, 1.0)
+        v = np.bincount((hashes >> 1) % self.dim, weights=signs, minlength=self.dim).astype("float32")
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def embed_batch(self, texts) -> list:
+        return [self.embed(t) for t in texts]
+
+    async def embed_batch_async(self, texts) -> list:
+        # Reine CPU-Arbeit im µs-Bereich: ein Thread-Hop wäre teurer als die Rechnung
+        return self.embed_batch(texts)
@@ -0,0 +1,204 @@
+"""
+Shared, pooled HTTP transport for the Azure OpenAI clients.
+
+All embedding and chat clients of a worker use one httpx transport (sync) and
+one async transport per event loop, i.e. one connection pool each: connections opened for
+embeddings are reused by the chat fallback and vice versa. Pool size, keep-alive
+and HTTP/2 are configured once; connect/read timeouts are set per stage
+("EMB", "CHAT") on the httpx client that wraps the shared transport.
+
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP2
+    EMB_CONNECT_TIMEOUT, EMB_READ_TIMEOUT, CHAT_CONNECT_TIMEOUT, CHAT_READ_TIMEOUT
+
+pool_stats() reports pool utilization (open / busy / idle connections) and
+per-stage request counters (requests, in flight, peak, errors).
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Default Timeouts pro Stage: Embeddings sind kurz, Chat-Completions brauchen länger
+_DEFAULT_TIMEOUTS = {
+    "EMB": {"connect": 5.0, "read": 10.0},
+    "CHAT": {"connect": 5.0, "read": 30.0},
+}
+
+_lock = threading.Lock()
+_transport = None
+# Event Loop -> AsyncHTTPTransport; verschwindet mit dem Loop (asyncio.run in Skripten / Tests)
+_async_transports = weakref.WeakKeyDictionary()
+_clients = {}
+_async_clients = {}
+_request_stats = {}
+_http2 = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", 20)),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30)),
+    )
+
+
+def _http2_enabled() -> bool:
+    global _http2
+    if _http2 is None:
+        _http2 = _check_http2()
+    return _http2
+
+
+def _check_http2() -> bool:
+    if os.getenv("HTTP2", "false").lower() not in ("1", "true", "yes"):
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2=true but the h2 package is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def stage_timeout(stage) -> httpx.Timeout:
+    """Connect/Read Timeout für eine Stage ("EMB" oder "CHAT") aus den Env-Variablen"""
+    defaults = _DEFAULT_TIMEOUTS.get(stage, _DEFAULT_TIMEOUTS["CHAT"])
+    connect = float(os.getenv(f"{stage}_CONNECT_TIMEOUT", defaults["connect"]))
+    read = float(os.getenv(f"{stage}_READ_TIMEOUT", defaults["read"]))
+    # write/pool wie connect: Warten auf einen freien Pool-Slot zählt zum Verbindungsaufbau
+    return httpx.Timeout(read, connect=connect, write=connect, pool=connect)
+
+
+def _get_transport() -> httpx.HTTPTransport:
+    global _transport
+    if _transport is None:
+        _transport = httpx.HTTPTransport(limits=_limits(), http2=_http2_enabled())
+        logger.info("Shared HTTP transport created")
+    return _transport
+
+
+def _get_async_transport() -> httpx.AsyncHTTPTransport:
+    """Transport des laufenden Event Loops: Verbindungen gehören zum Loop, in dem sie geöffnet wurden
+    (uvicorn: ein Loop pro Worker, aber z.B. jedes asyncio.run einen neuen)"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        transport = _async_transports.get(loop)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(limits=_limits(), http2=_http2_enabled())
+            _async_transports[loop] = transport
+            logger.info("Shared async HTTP transport created")
+    return transport
+
+
+def _stats_for(stage) -> dict:
+    if stage not in _request_stats:
+        _request_stats[stage] = {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "errors": 0}
+    return _request_stats[stage]
+
+
+def _on_request(stats):
+    with _lock:
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+
+
+def _on_done(stats, failed):
+    with _lock:
+        stats["in_flight"] -= 1
+        if failed:
+            stats["errors"] += 1
+
+
+class _StageTransport(httpx.BaseTransport):
+    """Zählt Requests einer Stage und reicht sie an den geteilten Transport weiter.
+    close() schließt den geteilten Pool nicht."""
+
+    def __init__(self, stage, transport):
+        self.stats = _stats_for(stage)
+        self.transport = transport
+
+    def handle_request(self, request):
+        _on_request(self.stats)
+        failed = True
+        try:
+            response = self.transport.handle_request(request)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            _on_done(self.stats, failed)
+
+    def close(self):
+        pass
+
+
+class _AsyncStageTransport(httpx.AsyncBaseTransport):
+    """Wie _StageTransport; der geteilte Transport wird pro Request zum laufenden Loop gewählt,
+    damit ein gecachter Client auch in einem späteren Loop funktioniert"""
+
+    def __init__(self, stage):
+        self.stats = _stats_for(stage)
+
+    async def handle_async_request(self, request):
+        _on_request(self.stats)
+        failed = True
+        try:
+            response = await _get_async_transport().handle_async_request(request)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            _on_done(self.stats, failed)
+
+    async def aclose(self):
+        pass
+
+
+def get_http_client(stage) -> httpx.Client:
+    """httpx.Client für eine Stage auf dem geteilten Transport"""
+    with _lock:
+        if stage not in _clients:
+            _clients[stage] = httpx.Client(
+                transport=_StageTransport(stage, _get_transport()),
+                timeout=stage_timeout(stage),
+            )
+        return _clients[stage]
+
+
+def get_async_http_client(stage) -> httpx.AsyncClient:
+    """httpx.AsyncClient für eine Stage auf dem geteilten async Transport"""
+    with _lock:
+        if stage not in _async_clients:
+            _async_clients[stage] = httpx.AsyncClient(
+                transport=_AsyncStageTransport(stage),
+                timeout=stage_timeout(stage),
+            )
+        return _async_clients[stage]
+
+
+def _pool_snapshot(*transports) -> dict:
+    connections = [c for t in transports for c in (getattr(getattr(t, "_pool", None), "connections", []) or [])]
+    idle = sum(1 for c in connections if c.is_idle())
+    limits = _limits()
+    return {
+        "connections": len(connections),
+        "busy": len(connections) - idle,
+        "idle": idle,
+        "max_connections": limits.max_connections,
+        "utilization": (len(connections) - idle) / limits.max_connections if limits.max_connections else 0.0,
+    }
+
+
+def pool_stats() -> dict:
+    with _lock:
+        requests = {stage: dict(stats) for stage, stats in _request_stats.items()}
+        async_transports = list(_async_transports.values())
+    return {
+        "http2": bool(_http2),
+        "sync_pool": _pool_snapshot(_transport) if _transport is not None else None,
+        "async_pool": _pool_snapshot(*async_transports) if async_transports else None,
+        "requests": requests,
+    }
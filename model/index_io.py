@@ -0,0 +1,53 @@
+"""
+FAISS index loading for the serving path.
+
+With mmap enabled the index file is memory-mapped read-only instead of being
+copied onto the heap: N uvicorn workers share the page cache and a cold start
+no longer reads the whole file. IO_FLAG_MMAP_IFC maps the codes of flat-code
+indexes (Flat, HNSW storage, SQ, PQ); IO_FLAG_MMAP maps IVF inverted lists as
+on-disk lists. The two cannot be combined for every index type, so they are
+tried in turn before falling back to a regular read.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _mmap_flags() -> list:
+    import faiss
+    flags = []
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        flags.append(faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    flags.append(faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    return flags
+
+
+def read_index(path, mmap=False):
+    """-> (index, mode, load_seconds); mode ist "mmap" oder "memory" """
+    import faiss  # erst hier: faiss gehört nicht in den Import der App
+    start = time.perf_counter()
+    if mmap:
+        for flags in _mmap_flags():
+            try:
+                index = faiss.read_index(str(path), flags)
+                return index, "mmap", time.perf_counter() - start
+            except RuntimeError as e:
+                logger.info(f"mmap load with flags {flags} not supported for {path}: {e}")
+        logger.warning(f"Index {path} cannot be memory-mapped, loading it into memory")
+    index = faiss.read_index(str(path))
+    return index, "memory", time.perf_counter() - start
+
+
+def memory_usage_mb() -> dict:
+    """RSS des aktuellen Prozesses, aufgeteilt in private (Anon) und dateibasierte, teilbare Seiten (Linux)"""
+    usage = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key = line.split(":")[0]
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    usage[key] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return usage
@@ -0,0 +1,34 @@
+"""
+Distance-weighted kNN voting over FAISS search results.
+"""
+import numpy as np
+
+
+def encode_labels(labels):
+    """Label-Strings -> (Klassennamen, Code pro Beispiel) für vektorisiertes Voting"""
+    classes, codes = np.unique(np.asarray(labels), return_inverse=True)
+    return classes, codes.astype("int64")
+
+
+def knn_vote(D, I, codes, n_classes, eps=1e-6):
+    """Gewichtetes Voting für alle Zeilen von index.search auf einmal.
+
+    D, I: (n, k) Distanzen und FAISS-IDs, codes: Klassen-Code pro ID.
+    Gewicht eines Nachbarn = 1 / (Distanz + eps); IDs < 0 (nicht gefunden) zählen nicht.
+    -> (Code des Gewinners, Anteil seines Gewichts am Gesamtgewicht) pro Zeile
+    """
+    D = np.asarray(D, dtype="float64")
+    I = np.asarray(I)
+    valid = I >= 0
+    weights = np.where(valid, 1.0 / (np.maximum(D, 0.0) + eps), 0.0)
+    neighbour_codes = codes[np.where(valid, I, 0)]
+
+    votes = np.zeros((I.shape[0], n_classes))
+    rows = np.broadcast_to(np.arange(I.shape[0])[:, None], I.shape)
+    np.add.at(votes, (rows, neighbour_codes), weights)
+
+    best = votes.argmax(axis=1)
+    total = votes.sum(axis=1)
+    agreement = np.divide(votes[np.arange(len(best)), best], total,
+                          out=np.zeros_like(total), where=total > 0)
+    return best, agreement
@@ -0,0 +1,93 @@
+"""
+Numpy-native scoring for the logistic regression intent classifier.
+
+At serve time the sklearn estimator is replaced by its weights: one
+matrix-vector (or matrix-matrix for batches) product gives the decision
+values, from which label, confidence and top-k probabilities follow.
+Probabilities follow sklearn's semantics:
+
+- "ovr" (liblinear / OneVsRestClassifier): sigmoid per class, normalized to sum 1
+- "multinomial" (lbfgs, saga, ...): softmax over the decision values
+- binary models: sigmoid of the single decision value
+"""
+import numpy as np
+
+
+class LinearScorer:
+    """Gewichte, Intercepts und Klassennamen eines linearen Classifiers"""
+
+    def __init__(self, coef, intercept, classes, multi_class="multinomial"):
+        self.coef = np.ascontiguousarray(coef, dtype="float32")
+        self.intercept = np.ascontiguousarray(intercept, dtype="float32").ravel()
+        self.classes = np.asarray(classes)
+        self.multi_class = str(multi_class)
+        # Transponiert vorhalten: X @ coef_t ohne Kopie pro Request
+        self._coef_t = np.ascontiguousarray(self.coef.T)
+
+    @classmethod
+    def from_sklearn(cls, clf, le=None) -> "LinearScorer":
+        """Aus LogisticRegression oder OneVsRestClassifier(LogisticRegression) übernehmen"""
+        if hasattr(clf, "estimators_"):
+            # OneVsRestClassifier: ein binärer Classifier pro Klasse
+            coef = np.vstack([est.coef_ for est in clf.estimators_])
+            intercept = np.concatenate([np.ravel(est.intercept_) for est in clf.estimators_])
+            multi_class = "ovr"
+        else:
+            coef, intercept = clf.coef_, clf.intercept_
+            legacy = getattr(clf, "multi_class", "auto")
+            if legacy == "ovr" or (getattr(clf, "solver", None) == "liblinear" and coef.shape[0] > 1):
+                multi_class = "ovr"  # liblinear vor sklearn 1.8 war immer one-vs-rest
+            else:
+                multi_class = "multinomial"
+        classes = clf.classes_
+        if le is not None:
+            classes = le.inverse_transform(classes)
+        return cls(coef, intercept, classes, multi_class)
+
+    @classmethod
+    def load(cls, path) -> "LinearScorer":
+        with np.load(path) as bundle:
+            return cls(bundle["coef"], bundle["intercept"], bundle["classes"], bundle["multi_class"].item())
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            coef=self.coef,
+            intercept=self.intercept,
+            classes=self.classes.astype(str),
+            multi_class=np.array(self.multi_class),
+        )
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype="float32")
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X @ self._coef_t + self.intercept
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X).astype("float64")
+        if scores.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        if self.multi_class == "ovr":
+            p = 1.0 / (1.0 + np.exp(-scores))
+            return p / p.sum(axis=1, keepdims=True)
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        """-> (labels, confidences, probabilities) für alle Zeilen"""
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return self.classes[best], proba[np.arange(len(best)), best], proba
+
+    def top_k(self, X, k=3) -> list:
+        """Top-k (label, probability) pro Zeile, absteigend sortiert"""
+        proba = self.predict_proba(X)
+        k = min(k, proba.shape[1])
+        order = np.argsort(-proba, axis=1)[:, :k]
+        return [
+            [(str(self.classes[j]), float(row[j])) for j in idx]
+            for row, idx in zip(proba, order)
+        ]
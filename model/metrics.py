@@ -0,0 +1,234 @@
+"""
+In-process metrics and stage spans for the serving path.
+
+    with pipeline("predict_intent", timings):
+        with stage("embed"):
+            ...
+
+Every stage is observed in the `intent_stage_seconds` histogram. If a
+StageTimer is bound by `pipeline`, the stage is also added to that timer, which
+is how Server-Timing and predict_intents(timings=...) see the stages. When
+tracing is enabled, every stage is also an OpenTelemetry child span of the
+current span (the FastAPI request span under Application Insights).
+`render_prometheus()` returns everything in the Prometheus text format for
+GET /metrics. Values are per worker process, like the other *_stats().
+
+METRICS_ENABLED=false turns off histograms and spans; bound timers keep working.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Sekunden; deckt µs-schnelle Classifier bis LLM-Fallbacks ab
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    """Monoton steigender Zähler pro Label-Kombination"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Wert, der steigen und fallen kann (z.B. Requests in flight)"""
+
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    """Prometheus-Histogramm: Zähler pro Bucket-Obergrenze, Summe und Anzahl pro Label-Kombination"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [counts pro Bucket (nicht kumuliert) + Overflow, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                out.append((f"{self.name}_bucket", (*labels, _format_bound(bound)), cumulative))
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, cumulative))
+        return out
+
+
+def _format_bound(bound) -> str:
+    return bound if isinstance(bound, str) else repr(float(bound))
+
+
+STAGE_SECONDS = Histogram("intent_stage_seconds", "Latency per pipeline stage", ("stage",))
+REQUEST_SECONDS = Histogram("intent_http_request_seconds", "HTTP request latency", ("path",))
+REQUESTS_TOTAL = Counter("intent_http_requests_total", "HTTP requests", ("path", "status"))
+REQUESTS_IN_FLIGHT = Gauge("intent_http_requests_in_flight", "HTTP requests currently being served")
+PREDICTIONS_TOTAL = Counter("intent_predictions_total", "Predictions by whether the LLM fallback was used",
+                            ("fallback",))
+FEEDBACK_TOTAL = Counter("intent_feedback_total", "LLM fallback answers recorded for online learning by review status",
+                         ("status",))
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS_TOTAL, REQUESTS_IN_FLIGHT, PREDICTIONS_TOTAL, FEEDBACK_TOTAL]
+
+
+# Stage-Zeiten landen zusätzlich im StageTimer des laufenden Requests (falls gebunden)
+_current_timer = contextvars.ContextVar("stage_timer", default=None)
+_tracer = None
+
+
+def enable_tracing(tracer_provider=None):
+    """Stages zusätzlich als OpenTelemetry Spans (globaler oder übergebener TracerProvider)"""
+    global _tracer
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("intent.pipeline", tracer_provider=tracer_provider)
+
+
+def disable_tracing():
+    global _tracer
+    _tracer = None
+
+
+def _span(name):
+    return _tracer.start_as_current_span(name) if _tracer is not None and METRICS_ENABLED else nullcontext()
+
+
+@contextmanager
+def pipeline(name, timer=None):
+    """Eltern-Span einer Vorhersage; bindet timer, damit verschachtelte stage() Aufrufe ihn füllen"""
+    token = _current_timer.set(timer)
+    try:
+        with _span(name):
+            yield
+    finally:
+        _current_timer.reset(token)
+
+
+@contextmanager
+def stage(name, items=1):
+    """Misst eine Pipeline-Stage: Histogramm, gebundener StageTimer und (optional) Child Span"""
+    with _span(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if METRICS_ENABLED:
+                STAGE_SECONDS.observe(seconds, name)
+            timer = _current_timer.get()
+            if timer is not None:
+                timer.add(name, seconds, items)
+
+
+def record_prediction(fallback_used):
+    if METRICS_ENABLED:
+        PREDICTIONS_TOTAL.inc("true" if fallback_used else "false")
+
+
+def _derived_gauges() -> list:
+    """Fallback-Quote, Cache-Hit-Raten und offene Azure-Requests aus den vorhandenen *_stats()"""
+    from model.chat_model import fallback_stats
+    from model.embedding_model import embedding_cache_stats
+    from model.http_client import pool_stats
+
+    fallbacks, plain = PREDICTIONS_TOTAL.value("true"), PREDICTIONS_TOTAL.value("false")
+    emb, chat, pools = embedding_cache_stats(), fallback_stats(), pool_stats()
+    return [
+        ("intent_fallback_rate", "Share of predictions that used the LLM fallback", (),
+         [((), fallbacks / (fallbacks + plain) if fallbacks + plain else 0.0)]),
+        ("intent_cache_hit_rate", "Hit rate of the in-process caches", ("cache",),
+         [(("embedding",), emb["hit_rate"]), (("fallback",), chat["hit_rate"])]),
+        ("intent_upstream_requests_in_flight", "Azure requests in flight per stage", ("stage",),
+         [((s,), v["in_flight"]) for s, v in sorted(pools["requests"].items())]),
+        ("intent_fallback_queue_waiting", "Fallbacks waiting for a chat slot", (),
+         [((), chat["limiter"]["waiting"])]),
+    ]
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+        names = metric.labelnames + (("le",) if metric.kind == "histogram" else ())
+        for sample, labels, value in metric.samples():
+            label_names = names if sample.endswith("_bucket") else metric.labelnames
+            lines.append(f"{sample}{_labels(label_names, labels)} {value}")
+    for name, help, labelnames, values in _derived_gauges():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+        lines += [f"{name}{_labels(labelnames, labels)} {value}" for labels, value in values]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI Middleware: Requests in flight, Latenz und Status pro Route (Template, nicht die konkrete URL)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Der Router trägt die gematchte Route in den Scope ein
+            path = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, path)
+            REQUESTS_TOTAL.inc(path, str(status[0]))
@@ -0,0 +1,495 @@
+"""
+Online learning: LLM fallback answers flow back into the FAISS examples and the classifier.
+
+With ONLINE_LEARNING=true every request the LLM fallback resolved is recorded
+(text, embedding, local scores, LLM intent) in a SQLite review queue
+(FEEDBACK_DB_PATH, one entry per normalized text). The request thread only
+enqueues; a writer thread applies the guard and writes:
+
+- rejected: the LLM answered with an intent the classifier does not know
+- accepted: the LLM confirms the classifier or the kNN vote
+  (retrieval_agreement >= FEEDBACK_MIN_AGREEMENT)
+- pending:  the LLM contradicts both local answers, or FEEDBACK_AUTO_ACCEPT=false;
+  waits for a human (`accept` / `reject` below)
+
+A background learner thread runs in every worker and hot-reloads changed artifacts
+(predict_intent.reload_models_if_changed). Whichever worker gets the learner file lock
+(next to the feedback DB; the CLI `apply` / `retrain` wait for the same lock)
+also appends accepted examples every ONLINE_APPLY_SECONDS to the versioned FAISS
+index (update_faiss) and to data/embeddings. Once ONLINE_RETRAIN_MIN_EXAMPLES new
+examples have been applied, it retrains the classifier. The new weights are
+published only if their hold-out accuracy is at most ONLINE_RETRAIN_MAX_DROP below
+the current model's.
+
+    python model/online_learning.py status
+    python model/online_learning.py list --status pending
+    python model/online_learning.py accept 12 13
+    python model/online_learning.py reject 14
+    python model/online_learning.py apply --retrain
+    python model/online_learning.py export feedback.jsonl   # for data/update_faiss.py add / intents.json
+"""
+import sys
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import numpy as np
+from dotenv import load_dotenv
+
+import config
+from model.cache import normalize_text
+from model.metrics import FEEDBACK_TOTAL
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+ONLINE_LEARNING = os.getenv("ONLINE_LEARNING", "false").lower() in ("1", "true", "yes")
+FEEDBACK_DB_PATH = os.getenv("FEEDBACK_DB_PATH", str(config.PROJECT_ROOT / "data/feedback/feedback.sqlite"))
+# Guard: ohne Bestätigung durch Classifier oder kNN landet eine LLM-Antwort in der Review-Queue
+FEEDBACK_AUTO_ACCEPT = os.getenv("FEEDBACK_AUTO_ACCEPT", "true").lower() in ("1", "true", "yes")
+FEEDBACK_MIN_AGREEMENT = float(os.getenv("FEEDBACK_MIN_AGREEMENT", 0.5))
+
+# Learner: Intervalle in Sekunden, Retraining ab so vielen neuen Beispielen
+ONLINE_APPLY_SECONDS = float(os.getenv("ONLINE_APPLY_SECONDS", 300))
+ONLINE_RELOAD_SECONDS = float(os.getenv("ONLINE_RELOAD_SECONDS", 30))
+ONLINE_RETRAIN_MIN_EXAMPLES = int(os.getenv("ONLINE_RETRAIN_MIN_EXAMPLES", 50))
+ONLINE_RETRAIN_MAX_DROP = float(os.getenv("ONLINE_RETRAIN_MAX_DROP", 0.01))
+ONLINE_RETRAIN_C = float(os.getenv("ONLINE_RETRAIN_C", 1.0))
+ONLINE_RETRAIN_SOLVER = os.getenv("ONLINE_RETRAIN_SOLVER", "lbfgs")
+
+STATUSES = ("pending", "accepted", "rejected", "applied")
+
+
+def text_key(text) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class FeedbackStore:
+    """Review-Queue in SQLite (WAL, eine Connection pro Thread), ein Eintrag pro normalisiertem Text"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or FEEDBACK_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, text_key TEXT UNIQUE NOT NULL, text TEXT NOT NULL, "
+            "intent TEXT NOT NULL, status TEXT NOT NULL, reason TEXT, hits INTEGER NOT NULL DEFAULT 1, "
+            "clf_intent TEXT, clf_confidence REAL, retrieval_intent TEXT, retrieval_distance REAL, "
+            "retrieval_agreement REAL, model TEXT, dim INTEGER, embedding BLOB, faiss_id INTEGER, "
+            "trained INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            # WAL: alle Worker schreiben in dieselbe Queue
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def record(self, text, intent, scores, embedding, model, dim, status, reason):
+        """Neuer Eintrag oder hits + 1. Widerspricht eine spätere LLM-Antwort, geht ein
+        noch nicht angewendeter Eintrag zurück in die Review-Queue"""
+        now = time.time()
+        vec = np.asarray(embedding, dtype="float32").ravel()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO feedback (text_key, text, intent, status, reason, clf_intent, clf_confidence, "
+            "retrieval_intent, retrieval_distance, retrieval_agreement, model, dim, embedding, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(text_key) DO UPDATE SET hits = hits + 1, updated = excluded.updated, "
+            "status = CASE WHEN feedback.intent != excluded.intent AND feedback.status IN ('pending', 'accepted') "
+            "THEN 'pending' ELSE feedback.status END, "
+            "reason = CASE WHEN feedback.intent != excluded.intent AND feedback.status IN ('pending', 'accepted') "
+            "THEN 'conflicting LLM answers' ELSE feedback.reason END",
+            (text_key(text), text, intent, status, reason, scores["clf_intent"], scores["clf_confidence"],
+             scores["retrieval_intent"], scores["retrieval_distance"], scores["retrieval_agreement"],
+             model, int(dim), vec.tobytes(), now, now),
+        )
+        conn.commit()
+
+    def list(self, status=None, limit=50) -> list:
+        sql = ("SELECT id, text, intent, status, reason, hits, clf_intent, clf_confidence, retrieval_intent, "
+               "retrieval_distance, retrieval_agreement, faiss_id FROM feedback")
+        args = ()
+        if status:
+            sql += " WHERE status = ?"
+            args = (status,)
+        sql += " ORDER BY hits DESC, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self._conn().execute(sql, args).fetchall()]
+
+    def set_status(self, ids, status, reason="reviewed") -> int:
+        """Review: pending/accepted/rejected setzen; bereits angewendete Einträge bleiben unverändert"""
+        if status not in ("pending", "accepted", "rejected"):
+            raise ValueError(f"Unknown review status: {status}")
+        conn = self._conn()
+        changed = 0
+        for i in ids:
+            changed += conn.execute(
+                "UPDATE feedback SET status = ?, reason = ?, updated = ? WHERE id = ? AND status != 'applied'",
+                (status, reason, time.time(), int(i)),
+            ).rowcount
+        conn.commit()
+        return changed
+
+    def accepted(self, limit=1000) -> list:
+        """Akzeptierte, noch nicht angewendete Einträge inkl. Embedding"""
+        rows = self._conn().execute(
+            "SELECT id, text, intent, model, dim, embedding FROM feedback WHERE status = 'accepted' "
+            "ORDER BY id LIMIT ?", (int(limit),)
+        ).fetchall()
+        return [{**dict(row), "embedding": np.frombuffer(row["embedding"], dtype="float32").copy()} for row in rows]
+
+    def mark_applied(self, ids, faiss_ids):
+        conn = self._conn()
+        conn.executemany(
+            "UPDATE feedback SET status = 'applied', faiss_id = ?, updated = ? WHERE id = ?",
+            [(int(f), time.time(), int(i)) for i, f in zip(ids, faiss_ids)],
+        )
+        conn.commit()
+
+    def untrained_count(self) -> int:
+        """Angewendete Beispiele, die noch in keinem Retraining waren"""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM feedback WHERE status = 'applied' AND trained = 0").fetchone()[0]
+
+    def mark_trained(self):
+        conn = self._conn()
+        conn.execute("UPDATE feedback SET trained = 1 WHERE status = 'applied'")
+        conn.commit()
+
+    def counts(self) -> dict:
+        rows = self._conn().execute("SELECT status, COUNT(*), SUM(hits) FROM feedback GROUP BY status").fetchall()
+        out = {s: {"entries": 0, "hits": 0} for s in STATUSES}
+        for status, n, hits in rows:
+            out[status] = {"entries": n, "hits": hits or 0}
+        return out
+
+
+def review_status(intent, scores, known_intents) -> tuple:
+    """Guard -> (status, Grund). Automatisch übernommen wird nur, was ein lokales Modell bestätigt"""
+    if intent not in known_intents:
+        return "rejected", "unknown intent"
+    if not FEEDBACK_AUTO_ACCEPT:
+        return "pending", "auto accept disabled"
+    if intent == scores["clf_intent"]:
+        return "accepted", "confirms classifier"
+    if intent == scores["retrieval_intent"] and scores["retrieval_agreement"] >= FEEDBACK_MIN_AGREEMENT:
+        return "accepted", "confirms kNN"
+    return "pending", "contradicts classifier and kNN"
+
+
+# Writer-Thread: der Request-Pfad reiht nur ein
+_feedback_store = None
+_feedback_queue = None
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_feedback_store() -> FeedbackStore:
+    global _feedback_store
+    if _feedback_store is None:
+        _feedback_store = FeedbackStore(FEEDBACK_DB_PATH)
+    return _feedback_store
+
+
+def record_fallback(text, embedding, scores, intent):
+    """Vom LLM entschiedenen Text für die Review-Queue vormerken (no-op ohne ONLINE_LEARNING)"""
+    if not ONLINE_LEARNING:
+        return
+    _ensure_writer().put((text, np.array(embedding, dtype="float32").ravel(), dict(scores), intent))
+
+
+def _ensure_writer():
+    global _feedback_queue, _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _feedback_queue = queue.Queue()
+                _writer = threading.Thread(target=_write_loop, args=(_feedback_queue,), daemon=True,
+                                           name="feedback-writer")
+                _writer.start()
+    return _feedback_queue
+
+
+def _write_loop(q):
+    while True:
+        item = q.get()
+        try:
+            if item is None:
+                return
+            _write(*item)
+        except Exception as e:
+            logger.warning("Could not record fallback feedback: %s: %s", type(e).__name__, e)
+        finally:
+            q.task_done()
+
+
+def _write(text, embedding, scores, intent):
+    from model import predict_intent as p
+    from model.embedding_model import get_embedding_provider
+
+    known = set(str(c) for c in p.scorer.classes) if p.scorer is not None else set()
+    status, reason = review_status(intent, scores, known)
+    get_feedback_store().record(text, intent, scores, embedding, get_embedding_provider().model,
+                                len(embedding), status, reason)
+    FEEDBACK_TOTAL.inc(status)
+
+
+def flush_feedback():
+    """Warten, bis alle eingereihten Einträge geschrieben sind"""
+    if _feedback_queue is not None:
+        _feedback_queue.join()
+
+
+def apply_feedback(store=None, meta_path=None, data_dir=None, vector_store_path=None, limit=1000) -> int:
+    """Akzeptierte Einträge an den versionierten Index (neue Version) und data/embeddings anhängen -> Anzahl"""
+    from data.build_faiss import META_PATH
+    from data.generate_embeddings import EMBEDDINGS_DIR, STORE_PATH, append
+    from data.update_faiss import _embed, add_examples, index_lock, initial_version, load_state, read_meta, write_version
+    from model.embedding_cache import SqliteVectorStore, make_key
+    from model.embedding_model import get_embedding_provider
+
+    store = store or get_feedback_store()
+    rows = store.accepted(limit)
+    if not rows:
+        return 0
+    meta_path = meta_path or META_PATH
+    data_dir = data_dir or EMBEDDINGS_DIR
+    with index_lock(meta_path):
+        old = read_meta(meta_path)
+        if not old.get("ids_file"):
+            # nur build_faiss.py gelaufen: einmalig die erste Version wie `update_faiss.py init` anlegen
+            index, sidecar, meta = initial_version(old, data_dir)
+            meta = write_version(index, sidecar, meta, meta_path)
+            logger.info("✓ Online learning: initialized versioned index (version %s, %d vectors)",
+                        meta["version"], meta["ntotal"])
+        meta, index, sidecar = load_state(meta_path)
+
+        # gespeicherte Embeddings nur, wenn Modell und Dimension noch zum Index passen
+        model = get_embedding_provider().model
+        stale = [i for i, r in enumerate(rows) if r["model"] != model or r["dim"] != index.d]
+        if stale:
+            fresh = _embed([rows[i]["text"] for i in stale])
+            for i, vec in zip(stale, fresh):
+                rows[i]["embedding"] = vec
+        embeddings = np.vstack([r["embedding"] for r in rows]).astype("float32")
+        texts = [r["text"] for r in rows]
+        labels = [r["intent"] for r in rows]
+
+        faiss_ids = add_examples(index, sidecar, embeddings, labels, texts, meta.get("metric", "l2"))
+        meta = write_version(index, sidecar, meta, meta_path)
+        # direkt nach dem Veröffentlichen markieren: schlägt danach etwas fehl, landen die Einträge
+        # beim nächsten Lauf nicht ein zweites Mal im Index
+        store.mark_applied([r["id"] for r in rows], faiss_ids)
+        append(texts, labels, embeddings, data_dir)
+        SqliteVectorStore(vector_store_path or STORE_PATH).put_many(
+            (make_key(t, model, index.d), vec) for t, vec in zip(texts, embeddings))
+        logger.info("✓ Online learning: +%d examples, index version %s", len(rows), meta["version"])
+        return len(rows)
+
+
+def retrain(data_dir=None, linear_path=None, params=None, max_drop=None, seed=42) -> dict:
+    """Classifier auf data/embeddings neu trainieren und linear_model.npz ersetzen, wenn die Hold-out
+    Accuracy höchstens max_drop unter der des aktuellen Modells liegt (das das Hold-out evtl. schon
+    im Training hatte, der Vergleich ist also eher streng). Reichen die Daten nicht für ein
+    stratifiziertes Hold-out, wird ohne Vergleich veröffentlicht"""
+    import warnings
+    from sklearn.exceptions import ConvergenceWarning
+
+    from data.generate_embeddings import EMBEDDINGS_DIR
+    from model.linear_scorer import LinearScorer
+    from model.train_classifier import make_classifier, stratified_split
+
+    data_dir = Path(data_dir or EMBEDDINGS_DIR)
+    linear_path = Path(linear_path or config.PROJECT_ROOT / "model/artifacts/linear_model.npz")
+    params = params or {"solver": ONLINE_RETRAIN_SOLVER, "penalty": "l2", "C": ONLINE_RETRAIN_C}
+    max_drop = ONLINE_RETRAIN_MAX_DROP if max_drop is None else max_drop
+
+    X = np.load(data_dir / "embeddings.npy").astype("float32")
+    with open(data_dir / "labels.json") as f:
+        y = np.asarray(json.load(f))
+    n_classes = len(np.unique(y))
+
+    def fit(X_fit, y_fit):
+        clf = make_classifier(params, n_classes)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", ConvergenceWarning)
+            clf.fit(X_fit, y_fit)
+        return LinearScorer.from_sklearn(clf)
+
+    accuracy, current = None, None
+    try:
+        X_train, X_test, y_train, y_test = stratified_split(X, y, 0.2, seed)
+    except ValueError as e:
+        logger.warning("Retraining without hold-out gate: %s", e)
+    else:
+        accuracy = float(np.mean(fit(X_train, y_train).predict(X_test)[0] == y_test))
+        if linear_path.exists():
+            current = float(np.mean(LinearScorer.load(linear_path).predict(X_test)[0] == y_test))
+    result = {"examples": int(len(y)), "accuracy": accuracy, "current_accuracy": current, "published": False}
+    if current is not None and accuracy < current - max_drop:
+        logger.warning("Retrained classifier not published: hold-out accuracy %.3f vs. %.3f", accuracy, current)
+        return result
+
+    linear_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = linear_path.with_name("linear_model.tmp.npz")
+    fit(X, y).save(tmp)
+    os.replace(tmp, linear_path)
+    result["published"] = True
+    logger.info("✓ Retrained classifier on %d examples (hold-out accuracy %s)", len(y),
+                "n/a" if accuracy is None else f"{accuracy:.3f}")
+    return result
+
+
+@contextlib.contextmanager
+def learner_lock(lock_path=None, blocking=True):
+    """flock auf die Lock-Datei neben der Feedback-DB: serialisiert apply/retrain zwischen Workern und CLI.
+    Liefert False, wenn ein anderer Prozess ihn hält (nur bei blocking=False)"""
+    import fcntl
+    lock_path = Path(lock_path or Path(FEEDBACK_DB_PATH).with_suffix(".lock"))
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            acquired = False
+        else:
+            acquired = True
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class OnlineLearner(threading.Thread):
+    """Hintergrund-Thread pro Worker: Hot-Reload geänderter Artefakte. Wer in einer Runde den Datei-Lock
+    bekommt, wendet außerdem Feedback an und trainiert nach (höchstens ein Learner gleichzeitig pro Host)"""
+
+    def __init__(self, store=None, apply_seconds=None, reload_seconds=None, retrain_min_examples=None,
+                 lock_path=None):
+        super().__init__(daemon=True, name="online-learner")
+        self.store = store or get_feedback_store()
+        self.apply_seconds = ONLINE_APPLY_SECONDS if apply_seconds is None else apply_seconds
+        self.reload_seconds = ONLINE_RELOAD_SECONDS if reload_seconds is None else reload_seconds
+        self.retrain_min_examples = ONLINE_RETRAIN_MIN_EXAMPLES if retrain_min_examples is None \
+            else retrain_min_examples
+        self.lock_path = Path(lock_path or self.store.path.with_suffix(".lock"))
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def step(self) -> dict:
+        """Feedback anwenden und ggf. nachtrainieren"""
+        applied = apply_feedback(self.store)
+        result = {"applied": applied, "retrain": None}
+        if self.store.untrained_count() >= self.retrain_min_examples:
+            result["retrain"] = retrain()
+            # auch ein nicht veröffentlichtes Modell zählt: sonst würde jede Runde erneut trainiert
+            self.store.mark_trained()
+        return result
+
+    def run(self):
+        from model.predict_intent import reload_models_if_changed
+
+        next_apply = time.monotonic() + self.apply_seconds
+        while not self._stop_event.wait(self.reload_seconds):
+            try:
+                if time.monotonic() >= next_apply:
+                    next_apply = time.monotonic() + self.apply_seconds
+                    # nur für die Runde: sonst käme ein `apply` aus der CLI nie an den Lock
+                    with learner_lock(self.lock_path, blocking=False) as acquired:
+                        if acquired:
+                            self.step()
+                reload_models_if_changed()
+            except Exception as e:
+                logger.warning("Online learning step failed: %s: %s", type(e).__name__, e)
+
+
+def start_online_learning():
+    """Beim Startup der API: Learner-Thread starten (None ohne ONLINE_LEARNING)"""
+    if not ONLINE_LEARNING:
+        return None
+    learner = OnlineLearner()
+    learner.start()
+    logger.info("Online learning enabled (feedback: %s)", learner.store.path)
+    return learner
+
+
+def stop_online_learning(learner):
+    if learner is not None:
+        learner.stop()
+    flush_feedback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Review-Queue und Anwendung des LLM-Feedbacks")
+    parser.add_argument("--db", default=FEEDBACK_DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Einträge pro Status")
+    p = sub.add_parser("list", help="Einträge anzeigen (häufigste zuerst)")
+    p.add_argument("--status", choices=STATUSES, default="pending")
+    p.add_argument("--limit", type=int, default=50)
+    for name in ("accept", "reject"):
+        p = sub.add_parser(name, help=f"Einträge per ID {name}")
+        p.add_argument("ids", type=int, nargs="+")
+    p = sub.add_parser("apply", help="Akzeptierte Einträge an Index und data/embeddings anhängen")
+    p.add_argument("--retrain", action="store_true", help="danach den Classifier neu trainieren")
+    sub.add_parser("retrain", help="Classifier auf data/embeddings neu trainieren")
+    p = sub.add_parser("export", help="Angewendete Einträge als JSONL (text/label)")
+    p.add_argument("output")
+    args = parser.parse_args()
+
+    store = FeedbackStore(args.db)
+    if args.command == "status":
+        for status, c in store.counts().items():
+            print(f"{status:<9} {c['entries']:>6} entries {c['hits']:>7} fallbacks")
+    elif args.command == "list":
+        for r in store.list(args.status, args.limit):
+            print(f"{r['id']:>6} {r['intent']:<18} hits={r['hits']:<4} clf={r['clf_intent']} "
+                  f"({r['clf_confidence']:.2f}) knn={r['retrieval_intent']} ({r['retrieval_agreement']:.2f}) "
+                  f"{r['reason']}: {r['text'][:80]}")
+    elif args.command in ("accept", "reject"):
+        changed = store.set_status(args.ids, "accepted" if args.command == "accept" else "rejected")
+        print(f"✅ {changed} entries {args.command}ed")
+    elif args.command in ("apply", "retrain"):
+        # wartet, bis ein laufender Learner-Schritt der API fertig ist
+        with learner_lock(store.path.with_suffix(".lock")):
+            if args.command == "apply":
+                print(f"✅ {apply_feedback(store)} examples applied")
+            if args.command == "retrain" or args.retrain:
+                print(f"✅ {retrain()}")
+                store.mark_trained()
+    elif args.command == "export":
+        with open(args.output, "w") as f:
+            for r in store.list("applied", limit=None):
+                f.write(json.dumps({"text": r["text"], "label": r["intent"]}, ensure_ascii=False) + "\n")
+        print(f"✅ Exported to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
+import asyncio
+import json
+import logging
 import os
 import sys
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
 from dotenv import load_dotenv
-import faiss
-import joblib
 
 # Set up project path before importing config
 _project_root = Path(__file__).parent.parent.resolve()
@@ -11,83 +16,486 @@ if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
 import config
-from model.embedding_model import embed_query
-from model.chat_model import llm_fallback
+import numpy as np
 
+from model.embedding_model import embed_query, embed_query_async, embed_many
+from model.chat_model import llm_fallback, llm_fallback_async
+from model.concurrency import FallbackRejectedError
+from model.index_io import memory_usage_mb, read_index
+from model.knn import encode_labels, knn_vote
+from model.linear_scorer import LinearScorer
+from model.metrics import pipeline, record_prediction, stage
+from model.online_learning import record_fallback
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Globale Variablen für Lazy Loading
-clf = None # classifier
-le = None # label encoder
-index = None # FAISS index
+# FAISS Index memory-mapped laden: Worker teilen sich den Page Cache
+FAISS_MMAP = os.getenv("FAISS_MMAP", "false").lower() in ("1", "true", "yes")
+
+# Thresholds (confidence thresholds for classifier and retrieval). Env-Werte sind die Basis, beim Laden gilt:
+# ein von build_faiss kalibrierter RETRIEVAL_THRESHOLD in faiss.json ersetzt den Env-Wert,
+# model/artifacts/thresholds.json von calibrate_thresholds.py ersetzt beide (siehe resolve_thresholds)
+_ENV_THRESHOLDS = {
+    "CLF_THRESHOLD": float(os.getenv("CLF_THRESHOLD", 0.60)),
+    "RETRIEVAL_THRESHOLD": float(os.getenv("RETRIEVAL_THRESHOLD", 1.2)), # dependent on embedding dimension & distance metric
+    # min. Gewichtsanteil, ab dem kNN den Classifier bestätigt
+    "KNN_AGREEMENT_THRESHOLD": float(os.getenv("KNN_AGREEMENT_THRESHOLD", 0.6)),
+}
+
+# kNN Retrieval: Anzahl Nachbarn
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", 5))
+
+
+class ServingState(NamedTuple):
+    """Alles, was eine Vorhersage liest. Laden und Hot-Reload bauen einen neuen Zustand und ersetzen ihn
+    mit einer Zuweisung (_publish); ein Request liest _state einmal und sieht nie Index, IDs und Labels
+    aus verschiedenen Versionen"""
+    clf: object = None # classifier
+    le: object = None # label encoder
+    scorer: object = None # numpy LinearScorer (ersetzt clf/le im Serving-Pfad)
+    index: object = None # FAISS index
+    retrieval_classes: object = None # Intent-Namen für das kNN-Voting
+    retrieval_codes: object = None # Klassen-Code pro Beispiel (Position in labels.json bzw. im ID-Sidecar)
+    retrieval_ids: object = None # sortierte stabile FAISS-IDs aus dem Sidecar von update_faiss (sonst ID = Position)
+    index_meta: dict = {} # faiss.json von build_faiss: Metrik, Suchparameter, kalibrierter Threshold
+    CLF_THRESHOLD: float = _ENV_THRESHOLDS["CLF_THRESHOLD"]
+    RETRIEVAL_THRESHOLD: float = _ENV_THRESHOLDS["RETRIEVAL_THRESHOLD"]
+    KNN_AGREEMENT_THRESHOLD: float = _ENV_THRESHOLDS["KNN_AGREEMENT_THRESHOLD"]
+    intent_thresholds: dict = {} # clf_intent -> {clf_threshold, retrieval_threshold} aus thresholds.json
+
+
+def _publish(state):
+    """Neuen Zustand aktivieren; die gleichnamigen Modul-Globals (p.scorer, p.CLF_THRESHOLD, ...) spiegeln ihn"""
+    global _state
+    _state = state
+    globals().update(state._asdict())
+
+
+class _PredictModule(types.ModuleType):
+    """Zuweisungen an die Modul-Globals (Tests, Benchmarks) ersetzen den Zustand mit, die Globals bleiben patchbar"""
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in ServingState._fields:
+            super().__setattr__("_state", self._state._replace(**{name: value}))
+
+
+_state = None
+_publish(ServingState())
+sys.modules[__name__].__class__ = _PredictModule
+
+_load_lock = threading.Lock()
+_loaded_stamp = None # _artifact_stamp() beim letzten Laden
+
+def _models_loaded() -> bool:
+    return _state.scorer is not None and _state.index is not None
 
 def _load_models():
-    """Lade Modelle beim ersten Aufruf (Lazy Loading)"""
-    global clf, le, index
-    if clf is None or le is None or index is None:
+    """Lade Modelle einmalig und thread-safe (beim Startup-Warm-up oder ersten Aufruf)"""
+    if _models_loaded():
+        return
+    with _load_lock:
+        _load_models_locked()
+
+def _load_models_locked():
+    if not _models_loaded():
         try:
-            print(f"Loading models from: {config.PROJECT_ROOT}")
-            print(f"Checking if files exist...")
-            print(f"model.pkl exists: {(config.PROJECT_ROOT / 'model/artifacts/model.pkl').exists()}")
-            print(f"label_encoder.pkl exists: {(config.PROJECT_ROOT / 'model/artifacts/label_encoder.pkl').exists()}")
-            print(f"faiss.index exists: {(config.PROJECT_ROOT / 'data/vector_db/faiss.index').exists()}")
-            
-            clf = joblib.load(config.PROJECT_ROOT / "model/artifacts/model.pkl")
-            print("✓ model.pkl loaded")
-            
-            le = joblib.load(config.PROJECT_ROOT / "model/artifacts/label_encoder.pkl")
-            print("✓ label_encoder.pkl loaded")
-            
-            index = faiss.read_index(str(config.PROJECT_ROOT / "data/vector_db/faiss.index"))
-            print("✓ faiss.index loaded")
+            _load_artifacts()
         except Exception as e:
-            print(f"ERROR loading models: {e}")
-            print(f"Error type: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("ERROR loading models: %s: %s", type(e).__name__, e)
             raise
 
-# Thresholds (confidence thresholds for classifier and retrieval)
-CLF_THRESHOLD = float(os.getenv("CLF_THRESHOLD", 0.60))
-RETRIEVAL_THRESHOLD = float(os.getenv("RETRIEVAL_THRESHOLD", 1.2)) # dependent on embedding dimension & distance metric
+def _artifact_stamp() -> tuple:
+    """mtime der Dateien, deren Änderung einen Hot-Reload auslöst (update_faiss setzt den Zeiger in faiss.json)"""
+    paths = ("model/artifacts/linear_model.npz", "data/vector_db/faiss.json", "model/artifacts/thresholds.json")
+    return tuple((config.PROJECT_ROOT / p).stat().st_mtime_ns if (config.PROJECT_ROOT / p).exists() else None
+                 for p in paths)
 
+def _load_artifacts():
+    """Alle Artefakte in einen neuen ServingState laden und erst ganz am Ende veröffentlichen: schlägt ein
+    Schritt fehl, bleibt der bisherige Zustand (beim ersten Laden: nicht geladen) vollständig aktiv"""
+    global _loaded_stamp
+    stamp = _artifact_stamp()
+    linear_path = config.PROJECT_ROOT / "model/artifacts/linear_model.npz"
+    logger.info("Loading models from: %s", config.PROJECT_ROOT)
+    logger.info("Artifacts exist: linear_model.npz=%s model.pkl=%s label_encoder.pkl=%s faiss.index=%s",
+                linear_path.exists(),
+                (config.PROJECT_ROOT / "model/artifacts/model.pkl").exists(),
+                (config.PROJECT_ROOT / "model/artifacts/label_encoder.pkl").exists(),
+                (config.PROJECT_ROOT / "data/vector_db/faiss.index").exists())
 
-def predict_intent(text) -> dict:
-    # Load models on first call (Lazy Loading)
-    _load_models()
+    clf = le = None
+    if linear_path.exists():
+        # Gewichte reichen zum Scoren, sklearn-Pickles werden nicht gebraucht
+        scorer = LinearScorer.load(linear_path)
+        logger.info("✓ linear_model.npz loaded")
+    else:
+        import joblib  # zieht sklearn nach, nur für den Pickle-Fallback
+        clf = joblib.load(config.PROJECT_ROOT / "model/artifacts/model.pkl")
+        logger.info("✓ model.pkl loaded")
+
+        le = joblib.load(config.PROJECT_ROOT / "model/artifacts/label_encoder.pkl")
+        logger.info("✓ label_encoder.pkl loaded")
+
+        scorer = LinearScorer.from_sklearn(clf, le)
+
+    # faiss.json zuerst: update_faiss schreibt versionierte Indizes und setzt dort den Zeiger
+    vector_db = config.PROJECT_ROOT / "data/vector_db"
+    meta = _read_index_meta(vector_db / "faiss.json")
+    index_path = vector_db / meta.get("index_file", "faiss.index")
 
-    emb = embed_query(text)
+    rss_before = memory_usage_mb().get("VmRSS", 0.0)
+    index, mode, seconds = read_index(index_path, mmap=FAISS_MMAP)
+    rss_after = memory_usage_mb().get("VmRSS", 0.0)
+    logger.info("✓ %s loaded (%s, %.1f ms, RSS +%.1f MB)", index_path.name, mode, seconds * 1000,
+                rss_after - rss_before)
 
-    # Classical ML-Prediction
-    class_pred = clf.predict(emb)[0] # integer
-    clf_intent = le.inverse_transform([class_pred])[0] # string
-    # Confidence of the classifier prediction
-    class_conf = max(clf.predict_proba(emb)[0])
+    if meta.get("ids_file"):
+        classes, codes, ids = _load_retrieval_ids(vector_db / meta["ids_file"], index.ntotal)
+    else:
+        classes, codes, ids = _load_retrieval_labels(config.PROJECT_ROOT / "data/embeddings/labels.json",
+                                                     index.ntotal)
+    _apply_search_params(index, meta)
+
+    # nach faiss.json: die End-to-End Kalibrierung von calibrate_thresholds.py hat Vorrang
+    thresholds = resolve_thresholds(meta, _read_index_meta(config.PROJECT_ROOT / "model/artifacts/thresholds.json"))
+
+    _publish(ServingState(clf, le, scorer, index, classes, codes, ids, meta, **thresholds))
+    _loaded_stamp = stamp
+
+def reload_models_if_changed() -> bool:
+    """Hot-Reload: neue Artefakte (Retraining, update_faiss, thresholds.json) ohne Neustart übernehmen"""
+    if not _models_loaded() or _artifact_stamp() == _loaded_stamp:
+        return False
+    with _load_lock:
+        if _artifact_stamp() == _loaded_stamp:
+            return False
+        try:
+            _load_artifacts()
+        except Exception as e:
+            # z.B. halb geschriebene Dateien: alter Zustand bleibt aktiv, nächster Versuch beim nächsten Aufruf
+            logger.warning("Hot reload failed, keeping the loaded models: %s: %s", type(e).__name__, e)
+            return False
+    logger.info("✓ Models reloaded")
+    return True
+
+def _read_index_meta(path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _apply_search_params(index, meta):
+    """Suchparameter (nprobe/efSearch) aus faiss.json am neuen Index setzen"""
+    if meta.get("search_params"):
+        import faiss
+        faiss.ParameterSpace().set_index_parameters(index, meta["search_params"])
+    if meta:
+        logger.info("✓ faiss.json loaded (%s, %s, %s, version %s)", meta.get("spec"), meta.get("metric"),
+                    meta.get("search_params") or "default search params", meta.get("version", "-"))
+
+def resolve_thresholds(meta, calibration) -> dict:
+    """Thresholds wie beim Laden: Env-Werte, dann der kalibrierte RETRIEVAL_THRESHOLD aus faiss.json (meta), dann
+    thresholds.json (calibration, global und pro Intent). Distanzen hängen von der Metrik ab: ist calibration für
+    eine andere Metrik als der Index kalibriert, wird sie ignoriert"""
+    thresholds = {**_ENV_THRESHOLDS, "intent_thresholds": {}}
+    if meta.get("retrieval_threshold") is not None:
+        thresholds["RETRIEVAL_THRESHOLD"] = float(meta["retrieval_threshold"])
+    if not calibration:
+        return thresholds
+    metric = meta.get("metric", "l2")
+    if calibration.get("metric", "l2") != metric:
+        logger.warning("thresholds.json was calibrated for metric %s but the index uses %s, ignoring it",
+                       calibration.get("metric"), metric)
+        return thresholds
+    thresholds["CLF_THRESHOLD"] = float(calibration["clf_threshold"])
+    thresholds["RETRIEVAL_THRESHOLD"] = float(calibration["retrieval_threshold"])
+    if calibration.get("agreement_threshold") is not None:
+        thresholds["KNN_AGREEMENT_THRESHOLD"] = float(calibration["agreement_threshold"])
+    thresholds["intent_thresholds"] = calibration.get("per_intent") or {}
+    logger.info("✓ thresholds.json loaded (CLF_THRESHOLD=%s, RETRIEVAL_THRESHOLD=%s, %d per-intent overrides)",
+                thresholds["CLF_THRESHOLD"], thresholds["RETRIEVAL_THRESHOLD"], len(thresholds["intent_thresholds"]))
+    return thresholds
+
+def _load_retrieval_labels(path, ntotal):
+    """Labels der Index-Beispiele -> (classes, codes, None); ohne passende Labels (None, None, None):
+    kNN aus, retrieval_intent = clf_intent"""
+    if not path.exists():
+        logger.warning(f"{path} not found, kNN retrieval intent disabled")
+        return None, None, None
+    with open(path) as f:
+        labels = json.load(f)
+    if len(labels) != ntotal:
+        logger.warning(f"labels.json has {len(labels)} entries but the index {ntotal}, kNN retrieval intent disabled")
+        return None, None, None
+    logger.info("✓ labels.json loaded")
+    return (*encode_labels(labels), None)
+
+def _load_retrieval_ids(path, ntotal):
+    """ID-Sidecar von update_faiss: stabile FAISS-IDs (sortiert) -> (classes, codes, ids)"""
+    with open(path) as f:
+        sidecar = json.load(f)
+    if len(sidecar["ids"]) != ntotal:
+        logger.warning(f"{path.name} has {len(sidecar['ids'])} ids but the index {ntotal}, kNN retrieval intent disabled")
+        return None, None, None
+    logger.info("✓ %s loaded", path.name)
+    return (*encode_labels(sidecar["labels"]), np.asarray(sidecar["ids"], dtype="int64"))
+
+def _ids_to_positions(I, retrieval_ids):
+    """FAISS-IDs -> Position im Sidecar (searchsorted), unbekannte IDs -> -1"""
+    if retrieval_ids is None:
+        return I
+    if len(retrieval_ids) == 0:
+        return np.full_like(I, -1)
+    pos = np.minimum(np.searchsorted(retrieval_ids, I), len(retrieval_ids) - 1)
+    return np.where((I >= 0) & (retrieval_ids[pos] == I), pos, -1)
+
+# Parallele LLM-Fallbacks im Batch-Pfad
+BATCH_FALLBACK_WORKERS = int(os.getenv("BATCH_FALLBACK_WORKERS", 8))
+
+
+def _classify(emb, state=None) -> dict:
+    """CPU-Teil der Pipeline: Classifier + FAISS Retrieval für ein Embedding (state: Snapshot des Requests)"""
+    state = state or _state
+    with stage("classifier"):
+        if state.scorer is not None:
+            # ein Matrix-Vektor-Produkt statt predict + predict_proba + inverse_transform
+            labels, confs, _ = state.scorer.predict(emb)
+            clf_intent, class_conf = str(labels[0]), confs[0]
+        else:
+            # Classical ML-Prediction
+            class_pred = state.clf.predict(emb)[0] # integer
+            clf_intent = state.le.inverse_transform([class_pred])[0] # string
+            # Confidence of the classifier prediction
+            class_conf = max(state.clf.predict_proba(emb)[0])
 
     # Retrieval
-    D, _ = index.search(emb.astype("float32"), 1) # D: distance, _: index
-    retrieval_distance = float(D[0][0])
+    retrieval_intents, distances, agreements = _retrieve(emb, [clf_intent], state)
+
+    return {
+        "clf_intent": clf_intent,
+        "clf_confidence": float(class_conf),
+        "retrieval_intent": retrieval_intents[0],
+        "retrieval_distance": distances[0],
+        "retrieval_agreement": agreements[0],
+    }
 
-    # Decision Logic
-    fallback_used = False
-    final_intent = clf_intent
 
-    if class_conf < CLF_THRESHOLD or retrieval_distance > RETRIEVAL_THRESHOLD:
-        fallback_used = True
-        final_intent = llm_fallback(text)
+def _retrieve(embs, clf_intents, state=None):
+    """Top-k Nachbarn für alle Zeilen mit einem index.search, dann gewichtetes kNN-Voting.
+    Index, IDs und Labels kommen aus einem Snapshot, auch wenn parallel ein Hot-Reload läuft.
+    -> (retrieval_intents, top-1 Distanzen, agreements)"""
+    state = state or _state
+    queries = np.ascontiguousarray(embs, dtype="float32")
+    cosine = state.index_meta.get("metric") == "cosine"
+    if cosine:
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    with stage("faiss", len(queries)):
+        D, I = state.index.search(queries, RETRIEVAL_K) # D: distance, I: FAISS-ID
+    if cosine:
+        D = 2.0 - 2.0 * D # Similarity -> Distanz, gleiche Skala wie L2 auf normierten Vektoren
+    distances = [float(d) for d in D[:, 0]]
 
+    if state.retrieval_codes is None:
+        return [str(c) for c in clf_intents], distances, [0.0] * len(distances)
+
+    best, agreement = knn_vote(D, _ids_to_positions(I, state.retrieval_ids), state.retrieval_codes,
+                               len(state.retrieval_classes))
+    return [str(c) for c in state.retrieval_classes[best]], distances, [float(a) for a in agreement]
+
+
+def _classify_batch(embs, state=None) -> list:
+    """Vektorisierte Variante von _classify: ein predict_proba und ein index.search für alle Zeilen"""
+    state = state or _state
+    with stage("classifier", len(embs)):
+        if state.scorer is not None:
+            clf_intents, class_confs, _ = state.scorer.predict(embs)
+        else:
+            proba = state.clf.predict_proba(embs)
+            class_preds = state.clf.classes_[proba.argmax(axis=1)]
+            class_confs = proba.max(axis=1)
+            clf_intents = state.le.inverse_transform(class_preds)
+
+    retrieval_intents, distances, agreements = _retrieve(embs, clf_intents, state)
+
+    return [
+        {
+            "clf_intent": str(clf_intents[i]),
+            "clf_confidence": float(class_confs[i]),
+            "retrieval_intent": retrieval_intents[i],
+            "retrieval_distance": distances[i],
+            "retrieval_agreement": agreements[i],
+        }
+        for i in range(len(embs))
+    ]
+
+
+def _needs_fallback(scores, clf_threshold=None, retrieval_threshold=None, agreement_threshold=None,
+                    state=None) -> bool:
+    """Entscheidungslogik; Thresholds optional überschreibbar (Offline-Auswertung), sonst die Werte
+    pro Intent aus thresholds.json bzw. die globalen Werte des Zustands"""
+    state = state or _state
+    per_intent = state.intent_thresholds.get(scores["clf_intent"], {}) if state.intent_thresholds else {}
+    if clf_threshold is None:
+        clf_threshold = per_intent.get("clf_threshold", state.CLF_THRESHOLD)
+    if retrieval_threshold is None:
+        retrieval_threshold = per_intent.get("retrieval_threshold", state.RETRIEVAL_THRESHOLD)
+    if agreement_threshold is None:
+        agreement_threshold = state.KNN_AGREEMENT_THRESHOLD
+    if scores["retrieval_distance"] > retrieval_threshold:
+        return True
+    if scores["clf_confidence"] >= clf_threshold:
+        return False
+    # Classifier unsicher: bestätigt die kNN-Mehrheit seine Antwort, ist kein LLM nötig
+    return not (scores["retrieval_intent"] == scores["clf_intent"]
+                and scores["retrieval_agreement"] >= agreement_threshold)
+
+
+def _fallback(text, scores):
+    """LLM-Fallback -> (intent, fallback_used). Ist das Concurrency-Limit erreicht,
+    bleibt es bei der Classifier-Antwort statt den Request scheitern zu lassen"""
+    try:
+        return llm_fallback(text), True
+    except FallbackRejectedError as e:
+        logger.warning("LLM fallback rejected, keeping classifier intent: %s", e)
+        return scores["clf_intent"], False
+
+
+async def _fallback_async(text, scores):
+    try:
+        return await llm_fallback_async(text), True
+    except FallbackRejectedError as e:
+        logger.warning("LLM fallback rejected, keeping classifier intent: %s", e)
+        return scores["clf_intent"], False
+
+
+def _build_result(text, scores, final_intent, fallback_used, record=True) -> dict:
+    if record:
+        record_prediction(fallback_used)
     return {
         "text": text,
         "intent": final_intent,
-        "clf_intent": clf_intent,
-        "clf_confidence": float(class_conf),
-        "retrieval_intent": clf_intent,
-        "retrieval_distance": retrieval_distance,
+        "clf_intent": scores["clf_intent"],
+        "clf_confidence": scores["clf_confidence"],
+        "retrieval_intent": scores["retrieval_intent"],
+        "retrieval_distance": scores["retrieval_distance"],
+        "retrieval_agreement": scores["retrieval_agreement"],
         "fallback_used": fallback_used
     }
 
+
+def predict_intent(text, timings=None) -> dict:
+    """timings: optionaler StageTimer (embed / classify / classifier / faiss / fallback)"""
+    # Load models on first call (Lazy Loading)
+    _load_models()
+    state = _state
+
+    with pipeline("predict_intent", timings):
+        with stage("embed"):
+            emb = embed_query(text)
+        with stage("classify"):
+            scores = _classify(emb, state)
+
+        # Decision Logic
+        fallback_used = False
+        final_intent = scores["clf_intent"]
+
+        if _needs_fallback(scores, state=state):
+            with stage("fallback"):
+                final_intent, fallback_used = _fallback(text, scores)
+            if fallback_used:
+                record_fallback(text, emb, scores, final_intent)
+
+        return _build_result(text, scores, final_intent, fallback_used)
+
+
+def predict_intents(texts, timings=None) -> list:
+    """Batch-Klassifikation: Embeddings in Chunks, Classifier + FAISS als Matrix-Operationen,
+    LLM-Fallback nur für die unsicheren Texte (parallel).
+    timings: optionaler StageTimer, summiert embed / classify / fallback Zeiten"""
+    _load_models()
+
+    texts = list(texts)
+    if not texts:
+        return []
+
+    state = _state
+    with pipeline("predict_intents", timings):
+        with stage("embed", len(texts)):
+            embs = embed_many(texts)
+        with stage("classify", len(texts)):
+            all_scores = _classify_batch(embs, state)
+
+        decisions = [(scores["clf_intent"], False) for scores in all_scores]
+        fallback_idx = [i for i, scores in enumerate(all_scores) if _needs_fallback(scores, state=state)]
+        if fallback_idx:
+            workers = max(1, min(BATCH_FALLBACK_WORKERS, len(fallback_idx)))
+            with stage("fallback", len(fallback_idx)), ThreadPoolExecutor(workers) as pool:
+                answers = pool.map(_fallback, [texts[i] for i in fallback_idx],
+                                   [all_scores[i] for i in fallback_idx])
+                for i, decision in zip(fallback_idx, answers):
+                    decisions[i] = decision
+            for i in fallback_idx:
+                if decisions[i][1]:
+                    record_fallback(texts[i], embs[i], all_scores[i], decisions[i][0])
+
+    return [
+        _build_result(text, scores, *decisions[i])
+        for i, (text, scores) in enumerate(zip(texts, all_scores))
+    ]
+
+
+async def predict_intent_async(text, timings=None) -> dict:
+    """Async Variante von predict_intent: Netzwerk-Calls werden awaited,
+    Classifier und FAISS laufen im Threadpool, damit der Event Loop frei bleibt"""
+    with pipeline("predict_intent", timings):
+        if not _models_loaded():
+            with stage("load"):
+                await asyncio.to_thread(_load_models)
+
+        state = _state
+        with stage("embed"):
+            emb = await embed_query_async(text)
+        # to_thread kopiert den Context: classifier / faiss landen im selben Timer und Span
+        with stage("classify"):
+            scores = await asyncio.to_thread(_classify, emb, state)
+
+        fallback_used = False
+        final_intent = scores["clf_intent"]
+
+        if _needs_fallback(scores, state=state):
+            with stage("fallback"):
+                final_intent, fallback_used = await _fallback_async(text, scores)
+            if fallback_used:
+                record_fallback(text, emb, scores, final_intent)
+
+        return _build_result(text, scores, final_intent, fallback_used)
+
+# Synthetischer Request für das Warm-up beim Startup
+WARMUP_TEXT = os.getenv("WARMUP_TEXT", "Ich kann mich nicht einloggen")
+WARMUP_FALLBACK = os.getenv("WARMUP_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+
+async def warm_up_async() -> dict:
+    """Artefakte laden, Embedding- und Chat-Verbindung öffnen und eine Vorhersage durchrechnen,
+    bevor der Worker Traffic bekommt. Der synthetische Request zählt nicht in intent_predictions_total
+    und landet nicht als Feedback im Online Learning"""
+    await asyncio.to_thread(_load_models)
+    state = _state
+    emb = await embed_query_async(WARMUP_TEXT)
+    scores = await asyncio.to_thread(_classify, emb, state)
+    final_intent, fallback_used = scores["clf_intent"], False
+    if _needs_fallback(scores, state=state):
+        final_intent, fallback_used = await _fallback_async(WARMUP_TEXT, scores)
+    if WARMUP_FALLBACK and not fallback_used:
+        # TLS-Handshake zur Chat-Deployment vorziehen (Antwort landet im Fallback Cache)
+        await llm_fallback_async(WARMUP_TEXT)
+    return _build_result(WARMUP_TEXT, scores, final_intent, fallback_used, record=False)
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     #test = "Ich wurde doppelt abgebucht"
     test = "Mein Passwort funktioniert nicht und ich kann mich nicht einloggen."
     result = predict_intent(test)
@@ -97,4 +505,5 @@ if __name__ == "__main__":
     print(f"CLF Confidence: {result['clf_confidence']}")
     print(f"Retrieval Intent: {result['retrieval_intent']}")
     print(f"Retrieval Distance: {result['retrieval_distance']}")
+    print(f"Retrieval Agreement: {result['retrieval_agreement']}")
     print(f"Fallback Used: {result['fallback_used']}")
\ No newline at end of file
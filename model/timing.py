@@ -0,0 +1,47 @@
+"""
+Per-stage wall-clock accumulator for the prediction pipeline.
+
+    timer = StageTimer()
+    with timer.stage("embed"):
+        ...
+    timer.as_dict()  # {"embed": {"seconds": ..., "calls": ..., "items": ...}}
+
+Thread-safe, so parallel fallbacks or concurrent batches can share one timer.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Summiert Sekunden, Aufrufe und verarbeitete Items pro Stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    @contextmanager
+    def stage(self, name, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, items)
+
+    def add(self, name, seconds, items=1):
+        with self._lock:
+            s = self._stages.setdefault(name, {"seconds": 0.0, "calls": 0, "items": 0})
+            s["seconds"] += seconds
+            s["calls"] += 1
+            s["items"] += items
+
+    def merge(self, other):
+        for name, s in other.as_dict().items():
+            with self._lock:
+                mine = self._stages.setdefault(name, {"seconds": 0.0, "calls": 0, "items": 0})
+                for key in mine:
+                    mine[key] += s[key]
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {name: dict(s) for name, s in self._stages.items()}
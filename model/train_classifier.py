@@ -1,4 +1,8 @@
 import sys
+import argparse
+import itertools
+import time
+import warnings
 from pathlib import Path
 
 # Set up project path before importing config
@@ -9,25 +13,17 @@ if str(_project_root) not in sys.path:
 import numpy as np
 import json
 import joblib
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.exceptions import ConvergenceWarning
 from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
 from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-import mlflow
-import mlflow.sklearn
+from sklearn.model_selection import StratifiedKFold, train_test_split
 
 import config
+from model.linear_scorer import LinearScorer
 
-# Logging starten
-mlflow.set_experiment("intent_classification")
-
-# Daten laden
-embeddings = np.load(config.PROJECT_ROOT / "data/embeddings/embeddings.npy")
-with open(config.PROJECT_ROOT / "data/embeddings/labels.json") as f:
-    labels = json.load(f)
-
-# Labels encoden
-le = LabelEncoder()
-y = le.fit_transform(labels)
 """
 # Example-mapping (alphabetically sorted):
 "account_changes"     → 0
@@ -42,39 +38,217 @@ y = le.fit_transform(labels)
 "technical_error"     → 9
 """
 
-X_train, X_test, y_train, y_test = train_test_split(
-    embeddings, y, test_size=0.2, random_state=42
-)
-
-with mlflow.start_run():
-    
-    # Hyperparameters
-    C = 1.0
-    penalty = "l2" # Ridge Regression
-    
-    mlflow.log_param("C", C)
-    mlflow.log_param("penalty", penalty)
-
-    # Modell
-    # LR fast, stable, worked well for Embeddings, easy to serve
-    clf = LogisticRegression(
-        C=C,
-        penalty=penalty,
-        max_iter=2000,
-        solver="liblinear" # liblinear is a good choice for small datasets (saga=better for large datasets)
+# Welche Solver welche Penalty können (lbfgs: nur l2, multinomial)
+SOLVER_PENALTIES = {
+    "liblinear": ("l1", "l2"),
+    "saga": ("l1", "l2"),
+    "lbfgs": ("l2",),
+}
+
+# sklearn >= 1.8: penalty ist deprecated, l1 wird über l1_ratio=1 gewählt
+_SKLEARN_L1_RATIO = tuple(int(p) for p in sklearn.__version__.split(".")[:2]) >= (1, 8)
+
+
+def search_space(Cs, solvers, penalties) -> list:
+    """Alle gültigen (solver, penalty, C) Kombinationen"""
+    return [
+        {"solver": solver, "penalty": penalty, "C": float(C)}
+        for solver, penalty, C in itertools.product(solvers, penalties, Cs)
+        if penalty in SOLVER_PENALTIES[solver]
+    ]
+
+
+def make_classifier(params, n_classes, max_iter=2000):
+    """LogisticRegression für eine Trial-Konfiguration.
+    liblinear ist binär: für >2 Klassen one-vs-rest per OneVsRestClassifier (wie früher intern)"""
+    kwargs = {"C": params["C"], "solver": params["solver"], "max_iter": max_iter}
+    if params["penalty"] == "l1":
+        if _SKLEARN_L1_RATIO:
+            kwargs["l1_ratio"] = 1.0
+        else:
+            kwargs["penalty"] = "l1"
+    clf = LogisticRegression(**kwargs)
+    if params["solver"] == "liblinear" and n_classes > 2:
+        clf = OneVsRestClassifier(clf)
+    return clf
+
+
+def clamp_folds(y, folds) -> int:
+    """StratifiedKFold braucht pro Klasse mindestens so viele Beispiele wie Folds:
+    auf die kleinste Klasse begrenzen (mindestens 2)"""
+    smallest = int(np.unique(y, return_counts=True)[1].min())
+    if smallest < 2:
+        raise ValueError(f"Cross-validation needs at least 2 examples per class, smallest class has {smallest}")
+    if folds > smallest:
+        print(f"⚠️ Smallest class has {smallest} examples, using {smallest} folds instead of {folds}")
+    return min(folds, smallest)
+
+
+def stratified_split(X, y, test_size=0.2, seed=42):
+    """Stratifizierter Hold-out Split. Das Test-Set wird auf mindestens eine Zeile pro Klasse angehoben
+    (max(test_size, n_classes / n)); ValueError, wenn dann kein Beispiel pro Klasse fürs Training bleibt"""
+    _, counts = np.unique(y, return_counts=True)
+    n_classes, n = len(counts), len(y)
+    if counts.min() < 2:
+        raise ValueError(f"Stratified split needs at least 2 examples per class, smallest class has {counts.min()}")
+    n_test = max(int(np.ceil(test_size * n)), n_classes)
+    if n - n_test < n_classes:
+        raise ValueError(f"{n} examples are too few for a hold-out of {n_test} with {n_classes} classes")
+    return train_test_split(X, y, test_size=n_test, random_state=seed, stratify=y)
+
+
+def _fit_fold(params, X, y, train_idx, val_idx, n_classes, max_iter):
+    """Ein (Konfiguration, Fold) Paar – läuft in einem Worker-Prozess"""
+    clf = make_classifier(params, n_classes, max_iter)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        clf.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    scorer = LinearScorer.from_sklearn(clf)
+    acc = float(np.mean(scorer.predict(X[val_idx])[0] == y[val_idx]))
+    # Gewichte zurückgeben: die Latenz wird im Hauptprozess ohne parallele Last gemessen
+    return acc, fit_seconds, scorer
+
+
+def measure_latency(scorer, X, n=200, seed=0) -> dict:
+    """Serving-Latenz pro Request: ein predict pro Zeile wie im /predict Pfad"""
+    rng = np.random.default_rng(seed)
+    rows = X[rng.integers(0, len(X), size=n)]
+    scorer.predict(rows[:1])  # warm-up
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        scorer.predict(row.reshape(1, -1))
+        timings.append(time.perf_counter() - start)
+    ms = np.asarray(timings) * 1000
+    return {"latency_p50_ms": float(np.percentile(ms, 50)), "latency_p95_ms": float(np.percentile(ms, 95))}
+
+
+def cross_validate(space, X, y, folds=5, n_jobs=-1, max_iter=2000, seed=42) -> list:
+    """Alle (Konfiguration, Fold) Paare parallel fitten -> ein Ergebnis pro Konfiguration"""
+    n_classes = len(np.unique(y))
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, y))
+    jobs = [(i, params, train_idx, val_idx) for i, params in enumerate(space) for train_idx, val_idx in splits]
+
+    outputs = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(params, X, y, train_idx, val_idx, n_classes, max_iter)
+        for _, params, train_idx, val_idx in jobs
     )
-    clf.fit(X_train, y_train)
 
-    # Evaluation
-    acc = clf.score(X_test, y_test)
-    mlflow.log_metric("accuracy", acc)
+    results = []
+    for i, params in enumerate(space):
+        fold_out = [out for (j, *_), out in zip(jobs, outputs) if j == i]
+        accs = [acc for acc, _, _ in fold_out]
+        results.append({
+            **params,
+            "cv_accuracy_mean": float(np.mean(accs)),
+            "cv_accuracy_std": float(np.std(accs)),
+            "fit_seconds": float(np.mean([s for _, s, _ in fold_out])),
+            **measure_latency(fold_out[0][2], X),
+        })
+    return results
+
+
+def select_best(results, latency_budget_ms=None) -> dict:
+    """Höchste CV-Accuracy innerhalb des Latenzbudgets (p95); sonst die schnellste Konfiguration"""
+    for r in results:
+        r["within_budget"] = latency_budget_ms is None or r["latency_p95_ms"] <= latency_budget_ms
+    ok = [r for r in results if r["within_budget"]]
+    if not ok:
+        print(f"⚠️ No configuration meets the latency budget of {latency_budget_ms} ms, using the fastest")
+        return min(results, key=lambda r: r["latency_p95_ms"])
+    return max(ok, key=lambda r: (r["cv_accuracy_mean"], -r["cv_accuracy_std"], -r["latency_p95_ms"]))
+
+
+def log_trials(mlflow, results, best):
+    """Eine MLflow Nested Run pro Konfiguration"""
+    for r in results:
+        with mlflow.start_run(run_name=f"{r['solver']}-{r['penalty']}-C{r['C']:g}", nested=True):
+            mlflow.log_params({k: r[k] for k in ("solver", "penalty", "C")})
+            mlflow.log_metrics({k: float(r[k]) for k in (
+                "cv_accuracy_mean", "cv_accuracy_std", "fit_seconds", "latency_p50_ms", "latency_p95_ms")})
+            mlflow.set_tag("within_budget", r["within_budget"])
+            mlflow.set_tag("selected", r is best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent-Classifier trainieren: parallele Hyperparameter-Suche mit CV")
+    parser.add_argument("--C", type=float, nargs="+", default=[0.1, 1.0, 10.0])
+    parser.add_argument("--solvers", nargs="+", choices=sorted(SOLVER_PENALTIES), default=["liblinear", "saga", "lbfgs"])
+    parser.add_argument("--penalties", nargs="+", choices=["l1", "l2"], default=["l1", "l2"])
+    parser.add_argument("--folds", type=int, default=5, help="Stratified k-fold (max. kleinste Klasse)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Prozesse für die Suche (-1 = alle Kerne)")
+    parser.add_argument("--latency-budget-ms", type=float, default=1.0, help="max. p95 Latenz pro Vorhersage")
+    parser.add_argument("--max-iter", type=int, default=2000)
+    parser.add_argument("--test-size", type=float, default=0.2, help="mind. eine Zeile pro Klasse")
+    args = parser.parse_args()
+
+    import mlflow
+    import mlflow.sklearn
+
+    # Logging starten
+    mlflow.set_experiment("intent_classification")
+
+    # Daten laden
+    embeddings = np.load(config.PROJECT_ROOT / "data/embeddings/embeddings.npy").astype("float32")  # auch float16 Export
+    with open(config.PROJECT_ROOT / "data/embeddings/labels.json") as f:
+        labels = json.load(f)
+
+    # Labels encoden
+    le = LabelEncoder()
+    y = le.fit_transform(labels)
+
+    try:
+        X_train, X_test, y_train, y_test = stratified_split(embeddings, y, args.test_size)
+        folds = clamp_folds(y_train, args.folds)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    space = search_space(args.C, args.solvers, args.penalties)
+    print(f"Search: {len(space)} configurations x {folds} folds")
+
+    with mlflow.start_run():
+        mlflow.log_params({"folds": folds, "configurations": len(space),
+                           "latency_budget_ms": args.latency_budget_ms})
+
+        start = time.perf_counter()
+        results = cross_validate(space, X_train, y_train, folds, args.n_jobs, args.max_iter)
+        search_seconds = time.perf_counter() - start
+        best = select_best(results, args.latency_budget_ms)
+        log_trials(mlflow, results, best)
+
+        for r in sorted(results, key=lambda r: -r["cv_accuracy_mean"]):
+            print(f"  {r['solver']:<9} {r['penalty']} C={r['C']:<6g} acc={r['cv_accuracy_mean']:.3f}±{r['cv_accuracy_std']:.3f} "
+                  f"p95={r['latency_p95_ms']:.3f}ms fit={r['fit_seconds']:.2f}s{'' if r['within_budget'] else ' (over budget)'}")
+
+        # Gewählte Konfiguration auf dem ganzen Trainingsteil fitten
+        clf = make_classifier(best, len(le.classes_), args.max_iter)
+        clf.fit(X_train, y_train)
+        acc = clf.score(X_test, y_test)
+
+        mlflow.log_params({f"best_{k}": best[k] for k in ("solver", "penalty", "C")})
+        mlflow.log_metrics({"accuracy": acc, "cv_accuracy": best["cv_accuracy_mean"],
+                            "latency_p95_ms": best["latency_p95_ms"], "search_seconds": search_seconds})
+
+        print(f"✅ Best: {best['solver']} {best['penalty']} C={best['C']:g} "
+              f"(search {search_seconds:.1f}s), Test Accuracy: {acc:.3f}")
+
+        # Speichern
+        (config.PROJECT_ROOT / "model/artifacts").mkdir(parents=True, exist_ok=True)
+        joblib.dump(clf, config.PROJECT_ROOT / "model/artifacts/model.pkl")
+        joblib.dump(le, config.PROJECT_ROOT / "model/artifacts/label_encoder.pkl")
+
+        # Kompaktes Gewichts-Bundle (coef, intercept, Klassennamen) für den numpy Scorer im Serving
+        linear_path = config.PROJECT_ROOT / "model/artifacts/linear_model.npz"
+        LinearScorer.from_sklearn(clf, le).save(linear_path)
+        mlflow.log_artifact(str(linear_path))
 
-    print(f"✅ Test Accuracy: {acc:.3f}")
+        mlflow.sklearn.log_model(clf, name="sklearn-model")
 
-    # Speichern
-    joblib.dump(clf, config.PROJECT_ROOT / "model/artifacts/model.pkl")
-    joblib.dump(le, config.PROJECT_ROOT / "model/artifacts/label_encoder.pkl")
+    print("✅ Modell + LabelEncoder + linear_model.npz gespeichert")
 
-    mlflow.sklearn.log_model(clf, name="sklearn-model")
 
-print("✅ Modell + LabelEncoder gespeichert")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
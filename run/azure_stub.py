@@ -0,0 +1,131 @@
+"""
+Local stand-in for the Azure OpenAI embeddings and chat-completions APIs.
+
+Answers every POST .../embeddings and .../chat/completions (any deployment,
+any api-version) after a configurable latency + jitter and injects 429 / 5xx
+responses at configurable rates, so the serving path can be load-tested
+without quota and with reproducible network behaviour. Embeddings come from the
+deterministic local provider (model/embedding_providers.py), chat answers are
+a random intent name.
+
+    python run/azure_stub.py --port 8900 --emb-latency-ms 40 --chat-latency-ms 800 --rate-429 0.01
+
+Point the app at it with EMB_ENDPOINT_BASE=http://127.0.0.1:8900 and
+CHAT_ENDPOINT_URI=http://127.0.0.1:8900 (any key). GET /stats returns counters.
+"""
+import sys
+import argparse
+import asyncio
+import base64
+import random
+import time
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from model.embedding_providers import HashingEmbeddingProvider
+
+INTENTS = ("login_problems", "payment_issues", "account_changes", "technical_error", "subscription",
+           "delivery", "returns", "product_info", "security", "general_question")
+
+
+def _error(status, message, retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else None
+    body = {"error": {"code": str(status), "message": message}}
+    return JSONResponse(status_code=status, content=body, headers=headers)
+
+
+def create_app(emb_latency_ms=30.0, emb_jitter_ms=10.0, chat_latency_ms=500.0, chat_jitter_ms=150.0,
+               rate_429=0.0, rate_5xx=0.0, retry_after=1, seed=None) -> FastAPI:
+    """Stub-App; Latenzen normalverteilt (mean, jitter = Standardabweichung), nie negativ"""
+    rng = random.Random(seed)
+    stats = {stage: {"requests": 0, "inputs": 0, "429": 0, "5xx": 0} for stage in ("embeddings", "chat")}
+    providers = {}
+    app = FastAPI()
+    app.state.stats = stats
+
+    async def _delay_or_error(stage, latency_ms, jitter_ms):
+        stats[stage]["requests"] += 1
+        await asyncio.sleep(max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000)
+        roll = rng.random()
+        if roll < rate_429:
+            stats[stage]["429"] += 1
+            return _error(429, "Rate limit exceeded (stub)", retry_after)
+        if roll < rate_429 + rate_5xx:
+            stats[stage]["5xx"] += 1
+            return _error(rng.choice((500, 502, 503)), "Service unavailable (stub)")
+        return None
+
+    @app.post("/{path:path}/embeddings")
+    async def embeddings(path: str, request: Request):
+        body = await request.json()
+        error = await _delay_or_error("embeddings", emb_latency_ms, emb_jitter_ms)
+        if error is not None:
+            return error
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dim = int(body.get("dimensions") or 1536)
+        provider = providers.setdefault(dim, HashingEmbeddingProvider(dim))
+        stats["embeddings"]["inputs"] += len(texts)
+
+        base64_format = body.get("encoding_format") == "base64"
+        data = []
+        for i, v in enumerate(provider.embed_batch(texts)):
+            # Der openai Client fordert standardmäßig base64 (float32 little endian) an
+            embedding = base64.b64encode(v.astype("<f4").tobytes()).decode() if base64_format else v.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(t.split()) for t in texts)
+        return {"object": "list", "model": body.get("model") or "stub-embedding", "data": data,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.post("/{path:path}/chat/completions")
+    async def chat_completions(path: str, request: Request):
+        body = await request.json()
+        error = await _delay_or_error("chat", chat_latency_ms, chat_jitter_ms)
+        if error is not None:
+            return error
+        stats["chat"]["inputs"] += 1
+        return {
+            "id": f"chatcmpl-stub-{stats['chat']['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "stub-chat",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": rng.choice(INTENTS)}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 1, "total_tokens": 1},
+        }
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokaler Azure OpenAI Stub (Embeddings + Chat) für Load-Tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--emb-latency-ms", type=float, default=30.0)
+    parser.add_argument("--emb-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0)
+    parser.add_argument("--chat-jitter-ms", type=float, default=150.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Anteil Requests mit 429 (0..1)")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Anteil Requests mit 500/502/503 (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After Header der 429-Antworten (s)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(args.emb_latency_ms, args.emb_jitter_ms, args.chat_latency_ms, args.chat_jitter_ms,
+                     args.rate_429, args.rate_5xx, args.retry_after, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+EMB_DIM sweep: which embedding dimension can we afford?
+
+The dataset is embedded once at full dimension (through the incremental
+embedding store, so repeated runs are free). Smaller dimensions are derived by
+truncating and re-normalizing, which is what text-embedding-3 models return for
+`dimensions=d`. Per dimension the tool reports:
+
+- classifier accuracy (stratified CV) and p95 scoring latency
+- kNN accuracy and LLM fallback rate on a held-out split (RETRIEVAL_THRESHOLD
+  recalibrated per dimension, CLF_THRESHOLD / KNN_AGREEMENT_THRESHOLD from env)
+- FAISS single-query search latency and index size
+- embedding payload per request (base64 float32, as the openai client requests it)
+
+and recommends the smallest dimension within the given accuracy / fallback tolerance.
+
+    python run/bench_emb_dim.py --full-dim 1536 --dims 256 512 1024 1536
+    python run/bench_emb_dim.py --embeddings full_dim.npy --labels labels.json
+"""
+import sys
+import argparse
+import json
+import math
+import os
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import faiss
+import numpy as np
+
+import config
+from data.build_faiss import build_index, calibrate_retrieval_threshold, to_distance
+from model.knn import encode_labels, knn_vote
+from model.linear_scorer import LinearScorer
+from model.predict_intent import CLF_THRESHOLD, KNN_AGREEMENT_THRESHOLD, RETRIEVAL_K, _needs_fallback
+from model.train_classifier import clamp_folds, cross_validate, search_space
+from run.bench_quantization import search_latency_ms, split
+
+
+def truncate(X, dim):
+    """Erste dim Komponenten, wieder auf Länge 1 normiert"""
+    x = np.ascontiguousarray(X[:, :dim], dtype="float32")
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+def fallback_rate(X_train, y_train, X_test, percentile=95.0) -> dict:
+    """Pipeline-Entscheidung offline: Classifier + kNN auf dem Train-Split, Fallback-Quote auf dem Test-Split"""
+    from sklearn.linear_model import LogisticRegression
+
+    scorer = LinearScorer.from_sklearn(LogisticRegression(max_iter=2000).fit(X_train, y_train))
+    clf_intents, confs, _ = scorer.predict(X_test)
+
+    index = build_index(X_train, "Flat", "l2")
+    threshold = calibrate_retrieval_threshold(index, X_train, "l2", percentile)
+    D, I = index.search(X_test, min(RETRIEVAL_K, index.ntotal))
+    classes, codes = encode_labels(y_train)
+    best, agreement = knn_vote(to_distance(D, "l2"), I, codes, len(classes))
+
+    fallbacks = sum(
+        _needs_fallback({
+            "clf_intent": str(clf_intents[i]),
+            "clf_confidence": float(confs[i]),
+            "retrieval_intent": str(classes[best[i]]),
+            "retrieval_distance": float(D[i, 0]),
+            "retrieval_agreement": float(agreement[i]),
+        }, retrieval_threshold=threshold)
+        for i in range(len(X_test))
+    )
+    return {
+        "fallback_rate": fallbacks / len(X_test),
+        "retrieval_threshold": threshold,
+        "index": index,
+        "knn_intents": classes[best],
+    }
+
+
+def evaluate_dim(X_full, labels, dim, folds=5, n_jobs=-1) -> dict:
+    X = truncate(X_full, dim)
+    y = np.asarray(labels)
+    folds = clamp_folds(y, folds)
+    cv = cross_validate(search_space([1.0], ["lbfgs"], ["l2"]), X, y, folds=folds, n_jobs=n_jobs)[0]
+
+    X_train, y_train, X_test, y_test = split(X, y)
+    fb = fallback_rate(X_train, y_train, X_test)
+    return {
+        "dim": dim,
+        "cv_accuracy": cv["cv_accuracy_mean"],
+        "clf_latency_p95_ms": cv["latency_p95_ms"],
+        "knn_accuracy": float(np.mean(fb["knn_intents"] == y_test)),
+        "fallback_rate": fb["fallback_rate"],
+        "retrieval_threshold": fb["retrieval_threshold"],
+        "search_ms": search_latency_ms(fb["index"], X_test, RETRIEVAL_K),
+        "index_bytes": int(faiss.serialize_index(build_index(X, "Flat", "l2")).nbytes),
+        "payload_bytes": 4 * math.ceil(dim * 4 / 3),
+    }
+
+
+def recommend(rows, max_accuracy_drop=0.01, max_fallback_increase=0.02) -> dict:
+    """Kleinste Dimension, deren Accuracy und Fallback-Quote nah genug an der besten liegen"""
+    best_acc = max(r["cv_accuracy"] for r in rows)
+    best_fb = min(r["fallback_rate"] for r in rows)
+    ok = [r for r in rows
+          if r["cv_accuracy"] >= best_acc - max_accuracy_drop
+          and r["fallback_rate"] <= best_fb + max_fallback_increase]
+    return min(ok, key=lambda r: r["dim"])
+
+
+def embed_full_dim(texts, full_dim):
+    """Alle Texte einmal mit full_dim einbetten (Embedding-Store: nur neue Texte kosten einen Call)"""
+    from data.generate_embeddings import STORE_PATH, generate
+    from model.embedding_cache import SqliteVectorStore, make_key
+    from model.embedding_model import get_embedding_provider
+
+    # _embed_batch liest die Dimension aus EMB_DIM
+    os.environ["EMB_DIM"] = str(full_dim)
+    model = get_embedding_provider().model
+    store = SqliteVectorStore(STORE_PATH)
+    generate(texts, store, model, full_dim)
+    vectors = store.get_many({make_key(t, model, full_dim) for t in texts})
+    return np.vstack([vectors[make_key(t, model, full_dim)] for t in texts])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EMB_DIM Sweep: Accuracy, Fallback-Quote, Latenz und Größe pro Dimension")
+    parser.add_argument("--full-dim", type=int, default=1536)
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024, 1536])
+    parser.add_argument("--embeddings", default=None, help="vorhandene Full-Dim Embeddings (.npy) statt API")
+    parser.add_argument("--labels", default=str(config.PROJECT_ROOT / "data/embeddings/labels.json"))
+    parser.add_argument("--input", default=str(config.PROJECT_ROOT / "data/input/intents.json"))
+    parser.add_argument("--folds", type=int, default=5, help="max. kleinste Klasse")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    parser.add_argument("--max-fallback-increase", type=float, default=0.02)
+    parser.add_argument("--output", default=None, help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        X_full = np.load(args.embeddings).astype("float32")
+        with open(args.labels) as f:
+            labels = json.load(f)
+    else:
+        from data.generate_embeddings import load_dataset
+        texts, labels = load_dataset(args.input)
+        X_full = embed_full_dim(texts, args.full_dim)
+
+    try:
+        folds = clamp_folds(labels, args.folds)  # einmal vorab statt einer Warnung pro Dimension
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    dims = sorted(d for d in args.dims if d <= X_full.shape[1])
+    print(f"{len(X_full)} examples, full dim {X_full.shape[1]}, CLF_THRESHOLD={CLF_THRESHOLD}, "
+          f"KNN_AGREEMENT_THRESHOLD={KNN_AGREEMENT_THRESHOLD}\n")
+    print(f"{'dim':>6} {'cv acc':>7} {'kNN acc':>8} {'fallback':>9} {'clf p95':>8} {'search':>8} "
+          f"{'index MB':>9} {'payload KB':>11}")
+
+    rows = []
+    for dim in dims:
+        r = evaluate_dim(X_full, labels, dim, folds)
+        rows.append(r)
+        print(f"{dim:>6} {r['cv_accuracy']:>7.3f} {r['knn_accuracy']:>8.3f} {r['fallback_rate']:>9.1%} "
+              f"{r['clf_latency_p95_ms']:>6.3f}ms {r['search_ms']:>6.3f}ms "
+              f"{r['index_bytes'] / 2**20:>9.2f} {r['payload_bytes'] / 1024:>11.1f}")
+
+    best = recommend(rows, args.max_accuracy_drop, args.max_fallback_increase)
+    print(f"\n✅ Recommended EMB_DIM={best['dim']} (RETRIEVAL_THRESHOLD={best['retrieval_threshold']:.4f} for l2)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": rows, "recommended": best["dim"]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Startup time and memory per worker for in-memory vs memory-mapped FAISS loading.
+
+Starts --workers fresh processes per mode (like uvicorn workers), each loads the
+index, runs --queries random searches and reports load time and RSS. RssAnon is
+private to the worker; RssFile are page-cache pages that all workers share.
+
+    python run/bench_index_load.py --workers 4
+"""
+import sys
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import config
+
+
+def _worker(path, mmap, n_queries, results):
+    import time
+    import numpy as np
+    from model.index_io import memory_usage_mb, read_index
+
+    before = memory_usage_mb()
+    index, mode, load_seconds = read_index(path, mmap=mmap)
+    after_load = memory_usage_mb()
+
+    queries = np.random.default_rng(0).random((n_queries, index.d), dtype=np.float32)
+    start = time.perf_counter()
+    index.search(queries, 5)
+    search_ms = (time.perf_counter() - start) * 1000 / max(n_queries, 1)
+    after_search = memory_usage_mb()
+
+    results.put({
+        "mode": mode,
+        "load_ms": load_seconds * 1000,
+        "rss_load_mb": after_load.get("VmRSS", 0) - before.get("VmRSS", 0),
+        "rss_mb": after_search.get("VmRSS", 0) - before.get("VmRSS", 0),
+        "anon_mb": after_search.get("RssAnon", 0) - before.get("RssAnon", 0),
+        "file_mb": after_search.get("RssFile", 0) - before.get("RssFile", 0),
+        "search_ms": search_ms,
+    })
+
+
+def run_mode(path, mmap, workers, n_queries) -> list:
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(str(path), mmap, n_queries, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS Load-Zeit und RSS pro Worker: memory vs mmap")
+    parser.add_argument("--index", default=str(config.PROJECT_ROOT / "data/vector_db/faiss.index"))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    size_mb = Path(args.index).stat().st_size / 1024 / 1024
+    print(f"Index: {args.index} ({size_mb:.1f} MB), {args.workers} workers per mode\n")
+    print(f"{'mode':<8} {'load ms':>9} {'RSS load':>9} {'RSS':>8} {'private':>8} {'shared':>8} {'ms/query':>9}")
+
+    for mmap in (False, True):
+        rows = run_mode(args.index, mmap, args.workers, args.queries)
+        for r in rows:
+            print(f"{r['mode']:<8} {r['load_ms']:>9.1f} {r['rss_load_mb']:>8.1f}M {r['rss_mb']:>7.1f}M "
+                  f"{r['anon_mb']:>7.1f}M {r['file_mb']:>7.1f}M {r['search_ms']:>9.3f}")
+        private = sum(r["anon_mb"] for r in rows)
+        print(f"{'':<8} private memory over all workers: {private:.1f} MB\n")
+
+
+if __name__ == "__main__":
+    main()
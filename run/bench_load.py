@@ -0,0 +1,279 @@
+"""
+Load test and latency benchmark for POST /predict.
+
+Starts the Azure stand-in (run/azure_stub.py) and the app (uvicorn app.app:app)
+as separate processes, points the app at the stub and drives /predict at each
+--concurrency level with a closed loop of workers. Per level it reports
+requests/sec, end-to-end p50/p95/p99 and per-stage percentiles from the
+Server-Timing header (embed / classify / fallback, SERVER_TIMING=true is set
+for the app). Results are saved as JSON; with --baseline the run fails if
+requests/sec or p95 regress by more than --max-regression.
+
+    python run/bench_load.py --concurrency 1 8 32 --requests 500 --output load.json
+    python run/bench_load.py --emb-latency-ms 80 --rate-429 0.02 --workers 2 --baseline load.json
+    python run/bench_load.py --url http://127.0.0.1:8001 --concurrency 16   # existing app, no stub
+
+Needs the serving artifacts (model/artifacts, data/vector_db). Embedding and
+fallback caches are disabled in the app unless --keep-caches is given, so every
+request pays the (stubbed) network latency.
+"""
+import sys
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import httpx
+import numpy as np
+
+import config
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values_ms) -> dict:
+    if not len(values_ms):
+        return {}
+    values = np.asarray(values_ms, dtype="float64")
+    out = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    out.update({"mean": float(values.mean()), "max": float(values.max())})
+    return out
+
+
+def parse_server_timing(header) -> dict:
+    """'embed;dur=12.3, classify;dur=0.4' -> {"embed": 12.3, "classify": 0.4} (ms)"""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+def summarize(samples, elapsed, concurrency) -> dict:
+    """samples: [{"latency_ms", "status", "stages", "fallback_used"}] eines Levels"""
+    ok = [s for s in samples if s["status"] == 200]
+    status = {}
+    for s in samples:
+        status[str(s["status"])] = status.get(str(s["status"]), 0) + 1
+    stage_names = sorted({name for s in ok for name in s["stages"] if name != "total"})
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "seconds": elapsed,
+        "rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+        "errors": len(samples) - len(ok),
+        "status": status,
+        "fallback_rate": sum(bool(s["fallback_used"]) for s in ok) / len(ok) if ok else 0.0,
+        "latency_ms": percentiles([s["latency_ms"] for s in ok]),
+        # Fallback nur über die Requests, die ihn brauchten
+        "stages_ms": {name: percentiles([s["stages"][name] for s in ok if name in s["stages"]])
+                      for name in stage_names},
+    }
+
+
+async def _one_request(client, url, text) -> dict:
+    start = time.perf_counter()
+    try:
+        r = await client.post(url, json={"text": text})
+        latency_ms = (time.perf_counter() - start) * 1000
+        body = r.json() if r.status_code == 200 else {}
+        # /predict antwortet bei internen Fehlern mit 200 + "error"
+        status = 500 if "error" in body else r.status_code
+        return {"latency_ms": latency_ms, "status": status,
+                "stages": parse_server_timing(r.headers.get("server-timing")),
+                "fallback_used": body.get("fallback_used", False)}
+    except httpx.HTTPError as e:
+        return {"latency_ms": (time.perf_counter() - start) * 1000, "status": type(e).__name__,
+                "stages": {}, "fallback_used": False}
+
+
+async def run_level(client, url, texts, concurrency, n_requests, warmup=0) -> dict:
+    """Closed Loop: concurrency Worker schicken je einen Request nach dem anderen, bis n_requests erreicht sind"""
+    for i in range(warmup):
+        await _one_request(client, url, texts[i % len(texts)])
+
+    samples = []
+    counter = iter(range(n_requests))
+
+    async def worker():
+        for i in counter:
+            samples.append(await _one_request(client, url, texts[i % len(texts)]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - start, concurrency)
+
+
+def compare(baseline, current, max_regression=0.1) -> list:
+    """Regressionen gegen einen früheren Lauf (gleiche Concurrency-Level) als Textliste"""
+    failures = []
+    base_levels = {lvl["concurrency"]: lvl for lvl in baseline["levels"]}
+    for lvl in current["levels"]:
+        base = base_levels.get(lvl["concurrency"])
+        if base is None or not base["latency_ms"] or not lvl["latency_ms"]:
+            continue
+        c = lvl["concurrency"]
+        if lvl["rps"] < base["rps"] * (1 - max_regression):
+            failures.append(f"c={c}: {lvl['rps']:.1f} req/s < baseline {base['rps']:.1f} req/s")
+        if lvl["latency_ms"]["p95"] > base["latency_ms"]["p95"] * (1 + max_regression):
+            failures.append(f"c={c}: p95 {lvl['latency_ms']['p95']:.1f} ms > baseline "
+                            f"{base['latency_ms']['p95']:.1f} ms")
+    return failures
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until(url, timeout, expect=200):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == expect:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def start_stub(args):
+    port = _free_port()
+    cmd = [sys.executable, str(config.PROJECT_ROOT / "run/azure_stub.py"), "--port", str(port),
+           "--emb-latency-ms", str(args.emb_latency_ms), "--emb-jitter-ms", str(args.emb_jitter_ms),
+           "--chat-latency-ms", str(args.chat_latency_ms), "--chat-jitter-ms", str(args.chat_jitter_ms),
+           "--rate-429", str(args.rate_429), "--rate-5xx", str(args.rate_5xx), "--seed", str(args.seed)]
+    proc = subprocess.Popen(cmd, cwd=config.PROJECT_ROOT)
+    base = f"http://127.0.0.1:{port}"
+    _wait_until(f"{base}/stats", 30)
+    return proc, base
+
+
+def start_app(args, stub_url):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(config.PROJECT_ROOT),
+        "EMB_PROVIDER": "azure",
+        "EMB_ENDPOINT_BASE": stub_url,
+        "EMB_MODEL_DEPLOY_KEY": "stub",
+        "CHAT_ENDPOINT_URI": stub_url,
+        "CHAT_ENDPOINT_KEY": "stub",
+        "SERVER_TIMING": "true",
+        "APP_INSIGHTS_CONN_STR": "",
+    }
+    if not args.keep_caches:
+        env.update({"EMB_CACHE_SIZE": "0", "EMB_CACHE_PATH": "", "FALLBACK_CACHE_SIZE": "0"})
+    cmd = [sys.executable, "-m", "uvicorn", "app.app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(args.workers), "--log-level", "warning"]
+    # App loggt jedes Ergebnis auf stdout -> verwerfen, sonst misst der Benchmark die Terminal-Ausgabe
+    proc = subprocess.Popen(cmd, cwd=config.PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    _wait_until(f"{base}/ready", args.ready_timeout)
+    return proc, base
+
+
+def load_texts(path) -> list:
+    from data.generate_embeddings import load_dataset
+    texts, _ = load_dataset(path)
+    return texts
+
+
+async def run_benchmark(app_url, texts, levels, n_requests, warmup) -> list:
+    url = f"{app_url}/predict"
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        results = []
+        for concurrency in levels:
+            level = await run_level(client, url, texts, concurrency, n_requests, warmup)
+            results.append(level)
+            print_level(level)
+        return results
+
+
+def print_level(level):
+    lat = level["latency_ms"] or {"p50": 0, "p95": 0, "p99": 0}
+    stages = " ".join(f"{name} p95={p['p95']:.1f}" for name, p in level["stages_ms"].items())
+    print(f"c={level['concurrency']:<4} {level['rps']:>8.1f} req/s  p50={lat['p50']:.1f} p95={lat['p95']:.1f} "
+          f"p99={lat['p99']:.1f} ms  errors={level['errors']}  fallback={level['fallback_rate']:.0%}  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-Test für /predict gegen einen lokalen Azure Stub")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Requests pro Concurrency-Level")
+    parser.add_argument("--warmup", type=int, default=10, help="Requests vor jedem Level (nicht gezählt)")
+    parser.add_argument("--texts", default=str(config.PROJECT_ROOT / "data/input/intents.json"))
+    parser.add_argument("--url", default=None, help="laufende App testen (ohne Stub und eigenen Start)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn Worker der App")
+    parser.add_argument("--keep-caches", action="store_true", help="Embedding- und Fallback-Cache aktiv lassen")
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--emb-latency-ms", type=float, default=30.0)
+    parser.add_argument("--emb-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0)
+    parser.add_argument("--chat-jitter-ms", type=float, default=150.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Ergebnisse als JSON speichern")
+    parser.add_argument("--baseline", default=None, help="früheres JSON-Ergebnis zum Vergleich")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="erlaubte Verschlechterung (Anteil)")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    procs = []
+    stub_url = None
+    try:
+        if args.url:
+            app_url = args.url.rstrip("/")
+        else:
+            stub, stub_url = start_stub(args)
+            procs.append(stub)
+            app, app_url = start_app(args, stub_url)
+            procs.append(app)
+            print(f"Stub {stub_url}, app {app_url} ({args.workers} worker)")
+
+        levels = asyncio.run(run_benchmark(app_url, texts, args.concurrency, args.requests, args.warmup))
+        stub_stats = httpx.get(f"{stub_url}/stats").json() if stub_url else None
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "levels": levels,
+        "stub": stub_stats,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"✓ Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(json.load(f), result, args.max_regression)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"✅ No regression beyond {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Latency of /predict with synchronous vs queue-based logging at high QPS.
+
+Drives app.app in-process (httpx ASGITransport, closed loop as in bench_load.py)
+with a stubbed predict_intent_async, so logging is the only variable. stdout
+is replaced by a stream whose write() blocks for --write-latency-ms, like a
+congested container log pipe. Modes:
+
+- off:           no log output at all (ceiling)
+- sync:          StreamHandler on the root logger, written in the request (old setup)
+- queue:         setup_logging(): QueueHandler + listener thread, JSON records
+- queue-sampled: like queue, LOG_RESULT_SAMPLE_RATE=--sample-rate
+
+"drain" is how long the listener still needs after the run to write the backlog.
+
+    python run/bench_logging.py --concurrency 64 --requests 5000 --write-latency-ms 0.5
+"""
+import sys
+import argparse
+import asyncio
+import io
+import logging
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import httpx
+
+from app import logging_config
+from run.bench_load import run_level
+
+
+class SlowStream(io.TextIOBase):
+    """stdout-Ersatz: jedes write blockiert (GIL wird wie bei echtem I/O freigegeben)"""
+
+    def __init__(self, latency_s):
+        self.latency_s = latency_s
+        self.lines = 0
+
+    def write(self, s):
+        time.sleep(self.latency_s)
+        self.lines += s.count("\n")
+        return len(s)
+
+    def isatty(self):
+        return False
+
+
+def _fake_result(text):
+    return {"text": text, "intent": "delivery", "clf_intent": "delivery", "clf_confidence": 0.91,
+            "retrieval_intent": "delivery", "retrieval_distance": 0.42, "retrieval_agreement": 0.8,
+            "fallback_used": False}
+
+
+def run_mode(mode, args) -> dict:
+    from app.app import app
+
+    stream = SlowStream(args.write_latency_ms / 1000)
+    logging_config.shutdown_logging()
+    root = logging.getLogger()
+    sync_handler = None
+    if mode == "off":
+        root.setLevel(logging.WARNING)
+    elif mode == "sync":
+        sync_handler = logging.StreamHandler(stream)
+        sync_handler.setFormatter(logging_config.TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        root.addHandler(sync_handler)
+        root.setLevel(logging.INFO)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    else:
+        logging_config.setup_logging(level="INFO", fmt="json", stream=stream)
+    rate = args.sample_rate if mode == "queue-sampled" else 1.0
+
+    async def fake_predict(text, timings=None):
+        await asyncio.sleep(args.predict_ms / 1000)
+        return _fake_result(text)
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await run_level(client, "/predict", [f"Text {i}" for i in range(100)],
+                                   args.concurrency, args.requests, warmup=20)
+
+    try:
+        with patch("app.app.predict_intent_async", side_effect=fake_predict), \
+             patch.object(logging_config, "LOG_RESULT_SAMPLE_RATE", rate):
+            level = asyncio.run(drive())
+    finally:
+        start = time.perf_counter()
+        if sync_handler is not None:
+            root.removeHandler(sync_handler)
+        logging_config.shutdown_logging()
+        drain_s = time.perf_counter() - start
+
+    return {"mode": mode, "rps": level["rps"], "latency_ms": level["latency_ms"],
+            "log_lines": stream.lines, "drain_s": drain_s}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/predict Latenz mit synchronem vs. Queue-Logging")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--write-latency-ms", type=float, default=0.5, help="Blockierzeit pro stdout write")
+    parser.add_argument("--predict-ms", type=float, default=2.0, help="simulierte Vorhersage-Latenz")
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--modes", nargs="+", default=["off", "sync", "queue", "queue-sampled"],
+                        choices=["off", "sync", "queue", "queue-sampled"])
+    args = parser.parse_args()
+
+    rows = [run_mode(mode, args) for mode in args.modes]
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, write {args.write_latency_ms} ms\n")
+    print(f"{'mode':<14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'lines':>7} {'drain s':>8}")
+    for r in rows:
+        lat = r["latency_ms"]
+        print(f"{r['mode']:<14} {r['rps']:>8.0f} {lat['p50']:>8.2f} {lat['p99']:>8.2f} "
+              f"{r['log_lines']:>7} {r['drain_s']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Overhead of the stage instrumentation (model/metrics.py).
+
+Measures, per mode, the cost of one `stage()` block and of a full in-process
+predict_intent on synthetic models (local embedding provider, numpy scorer,
+Flat index, no network, no fallback), plus the time to render /metrics:
+
+- off:        METRICS_ENABLED=false (only the perf_counter pair)
+- histograms: histograms + bound StageTimer (the default)
+- spans:      histograms + OpenTelemetry spans (SDK TracerProvider without
+              exporter if installed, otherwise the no-op API tracer)
+
+    python run/bench_metrics.py --n 20000
+"""
+import sys
+import argparse
+import os
+import time
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import numpy as np
+
+from model import metrics
+from model.timing import StageTimer
+
+
+def stage_overhead_us(n) -> float:
+    """µs pro leerem stage() Block (inkl. gebundenem Timer)"""
+    with metrics.pipeline("bench", StageTimer()):
+        start = time.perf_counter()
+        for _ in range(n):
+            with metrics.stage("bench"):
+                pass
+        return (time.perf_counter() - start) * 1e6 / n
+
+
+def setup_synthetic_models(dim=512, n_classes=10, n_examples=5000, seed=0):
+    """predict_intent Globals mit zufälligen Gewichten und Index belegen, lokale Embeddings ohne Cache"""
+    import faiss
+    from model import predict_intent as p
+    from model.knn import encode_labels
+    from model.linear_scorer import LinearScorer
+
+    os.environ.update({"EMB_PROVIDER": "local", "EMB_DIM": str(dim), "EMB_CACHE_SIZE": "0", "EMB_CACHE_PATH": ""})
+    rng = np.random.default_rng(seed)
+    classes = np.array([f"intent_{i}" for i in range(n_classes)])
+    p.scorer = LinearScorer(rng.normal(size=(n_classes, dim)).astype("float32"),
+                            rng.normal(size=n_classes).astype("float32"), classes)
+    p.index = faiss.IndexFlatL2(dim)
+    p.index.add(rng.normal(size=(n_examples, dim)).astype("float32"))
+    p.retrieval_classes, p.retrieval_codes = encode_labels(list(classes[rng.integers(0, n_classes, n_examples)]))
+    # kein LLM-Fallback: nur der lokale Pfad wird gemessen
+    p.CLF_THRESHOLD, p.RETRIEVAL_THRESHOLD = 0.0, float("inf")
+    return p
+
+
+def predict_us(p, texts, n) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        p.predict_intent(texts[i % len(texts)], timings=StageTimer())
+    return (time.perf_counter() - start) * 1e6 / n
+
+
+def _set_mode(mode):
+    metrics.METRICS_ENABLED = mode != "off"
+    metrics.disable_tracing()
+    if mode == "spans":
+        try:
+            from opentelemetry.sdk.trace import TracerProvider
+            metrics.enable_tracing(TracerProvider())
+            return "sdk"
+        except ImportError:
+            metrics.enable_tracing()
+            return "api no-op"
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overhead der Stage-Instrumentierung messen")
+    parser.add_argument("--n", type=int, default=20000, help="stage() Blöcke pro Modus")
+    parser.add_argument("--predictions", type=int, default=2000, help="predict_intent Aufrufe pro Modus")
+    parser.add_argument("--dim", type=int, default=512)
+    args = parser.parse_args()
+
+    texts = [f"Ich habe ein Problem mit Bestellung {i}" for i in range(100)]
+    p = setup_synthetic_models(args.dim)
+    p.predict_intent(texts[0])  # warm-up
+
+    modes = ["off", "histograms"]
+    try:
+        import opentelemetry  # noqa: F401
+        modes.append("spans")
+    except ImportError:
+        print("opentelemetry not installed, skipping span mode")
+
+    print(f"{'mode':<12} {'stage µs':>9} {'predict µs':>11} {'overhead':>9}")
+    base = None
+    for mode in modes:
+        note = _set_mode(mode)
+        stage_us = stage_overhead_us(args.n)
+        pred_us = predict_us(p, texts, args.predictions)
+        base = base or pred_us
+        print(f"{mode:<12} {stage_us:>9.2f} {pred_us:>11.1f} {(pred_us - base) / base:>+9.1%}  {note}")
+
+    _set_mode("histograms")
+    metrics.render_prometheus()  # erster Aufruf importiert chat_model / http_client
+    start = time.perf_counter()
+    body = metrics.render_prometheus()
+    print(f"\nrender /metrics: {(time.perf_counter() - start) * 1000:.2f} ms, {len(body.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
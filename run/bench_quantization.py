@@ -0,0 +1,150 @@
+"""
+Memory / latency / quality report for compact embedding storage and quantized indexes.
+
+Compares float16 vs float32 training embeddings (classifier accuracy) and a
+list of FAISS index specs against the exact float32 Flat index: index size,
+ms per single-query search, recall@k and kNN-vote accuracy on a held-out split.
+
+    python run/bench_quantization.py
+    python run/bench_quantization.py --specs Flat SQfp16 SQ8 SQ4 PQ64 "IVF256,SQ8" --metric cosine --output report.json
+"""
+import sys
+import argparse
+import json
+import time
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import faiss
+import numpy as np
+
+import config
+from data.build_faiss import build_index, prepare_vectors, recall_at_k, to_distance
+from model.knn import encode_labels, knn_vote
+from model.linear_scorer import LinearScorer
+
+
+def split(X, labels, test_size=0.2, seed=42):
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(X))
+    n_test = max(1, int(len(X) * test_size))
+    test, train = order[:n_test], order[n_test:]
+    labels = np.asarray(labels)
+    return X[train], labels[train], X[test], labels[test]
+
+
+def classifier_accuracy(X_train, y_train, X_test, y_test) -> float:
+    from sklearn.linear_model import LogisticRegression
+    clf = LogisticRegression(max_iter=2000).fit(X_train.astype("float32"), y_train)
+    # Queries kommen im Serving immer als float32 von der API
+    return float(np.mean(LinearScorer.from_sklearn(clf).predict(X_test)[0] == y_test))
+
+
+def evaluate_storage(X_train, y_train, X_test, y_test) -> list:
+    """float32 vs float16 embeddings.npy: Größe und Accuracy des darauf trainierten Classifiers"""
+    rows = []
+    for dtype in ("float32", "float16"):
+        stored = X_train.astype(dtype)
+        rows.append({
+            "dtype": dtype,
+            "bytes": int(stored.nbytes),
+            "max_abs_error": float(np.abs(stored.astype("float32") - X_train).max()),
+            "accuracy": classifier_accuracy(stored, y_train, X_test, y_test),
+        })
+    return rows
+
+
+def search_latency_ms(index, queries, k, n=500) -> float:
+    """Einzel-Query Latenz wie im /predict Pfad"""
+    queries = queries[:n]
+    index.search(queries[:1], k)  # warm-up
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q.reshape(1, -1), k)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def evaluate_index(spec, X_train, y_train, X_test, y_test, metric="l2", k=5, truth=None) -> dict:
+    """Größe, Latenz, recall@k gegen Flat und kNN-Accuracy eines Index-Specs"""
+    index = build_index(X_train, spec, metric)
+    queries = prepare_vectors(X_test, metric)
+    k = min(k, index.ntotal)
+    D, I = index.search(queries, k)
+
+    classes, codes = encode_labels(y_train)
+    best, _ = knn_vote(to_distance(D, metric), I, codes, len(classes))
+    return {
+        "spec": spec,
+        "bytes": int(faiss.serialize_index(index).nbytes),
+        "latency_ms": search_latency_ms(index, queries, k),
+        "recall_at_k": recall_at_k(I, truth) if truth is not None else 1.0,
+        "knn_accuracy": float(np.mean(classes[best] == y_test)),
+    }
+
+
+def run_report(X, labels, specs, metric="l2", k=5) -> dict:
+    X_train, y_train, X_test, y_test = split(np.asarray(X, dtype="float32"), labels)
+    exact = build_index(X_train, "Flat", metric)
+    _, truth = exact.search(prepare_vectors(X_test, metric), min(k, exact.ntotal))
+
+    indexes = []
+    for spec in specs:
+        try:
+            indexes.append(evaluate_index(spec, X_train, y_train, X_test, y_test, metric, k, truth))
+        except RuntimeError as e:
+            # z.B. PQ mit zu wenigen Trainingsvektoren
+            print(f"  skipping {spec}: {str(e).splitlines()[0]}")
+    return {
+        "n_train": len(X_train),
+        "n_test": len(X_test),
+        "dim": int(X.shape[1]),
+        "metric": metric,
+        "storage": evaluate_storage(X_train, y_train, X_test, y_test),
+        "indexes": indexes,
+    }
+
+
+def print_report(report):
+    print(f"{report['n_train']} train / {report['n_test']} test vectors, dim {report['dim']}, {report['metric']}\n")
+    base = report["storage"][0]
+    print(f"{'embeddings':<12} {'MB':>8} {'accuracy':>9} {'Δ acc':>7} {'max err':>9}")
+    for r in report["storage"]:
+        print(f"{r['dtype']:<12} {r['bytes'] / 2**20:>8.2f} {r['accuracy']:>9.3f} "
+              f"{r['accuracy'] - base['accuracy']:>+7.3f} {r['max_abs_error']:>9.2e}")
+
+    if not report["indexes"]:
+        return
+    flat = next((r for r in report["indexes"] if r["spec"] == "Flat"), report["indexes"][0])
+    print(f"\n{'index':<14} {'MB':>8} {'x smaller':>9} {'ms/query':>9} {'recall@k':>9} {'kNN acc':>8} {'Δ acc':>7}")
+    for r in report["indexes"]:
+        print(f"{r['spec']:<14} {r['bytes'] / 2**20:>8.2f} {flat['bytes'] / r['bytes']:>9.1f} "
+              f"{r['latency_ms']:>9.4f} {r['recall_at_k']:>9.3f} {r['knn_accuracy']:>8.3f} "
+              f"{r['knn_accuracy'] - flat['knn_accuracy']:>+7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="float16 Embeddings und quantisierte Indizes gegen float32 Flat vergleichen")
+    parser.add_argument("--specs", nargs="+", default=["Flat", "SQfp16", "SQ8", "SQ4"],
+                        help='FAISS index_factory Specs, z.B. SQ8, PQ64, "IVF256,SQ8", "IVF256,PQ64"')
+    parser.add_argument("--metric", choices=["l2", "cosine"], default="l2")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Report zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    X = np.load(config.PROJECT_ROOT / "data/embeddings/embeddings.npy").astype("float32")
+    with open(config.PROJECT_ROOT / "data/embeddings/labels.json") as f:
+        labels = json.load(f)
+
+    report = run_report(X, labels, args.specs, args.metric, args.k)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cold-start benchmark: import time of app.app and time to the first prediction.
+
+Every measurement runs in a fresh interpreter, like a container scaled up from
+zero. The import phase uses `python -X importtime` and lists the most expensive
+modules; heavy modules that must stay out of the app import (faiss, sklearn,
+openai, ...) are reported as regressions. With --first-prediction the script also
+loads the models and runs one predict_intent (needs artifacts and Azure credentials).
+
+    python run/bench_startup.py --runs 5 --max-import-ms 1000
+    python run/bench_startup.py --first-prediction --max-first-prediction-ms 3000
+
+Exits with status 1 if a budget is exceeded or a heavy module is imported eagerly.
+"""
+import sys
+import argparse
+import json
+import os
+import statistics
+import subprocess
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import config
+
+# Dürfen beim Import von app.app nicht geladen werden (erst beim Laden der Modelle / ersten Call)
+HEAVY_MODULES = ("faiss", "sklearn", "joblib", "openai", "mlflow", "azure.monitor")
+
+_IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import app.app
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"import_s": elapsed, "heavy": heavy}}))
+"""
+
+_PREDICT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import app.app
+from model import predict_intent as p
+imported = time.perf_counter()
+p._load_models()
+loaded = time.perf_counter()
+p.predict_intent({text!r})
+done = time.perf_counter()
+print(json.dumps({{"import_s": imported - start, "load_s": loaded - imported,
+                   "predict_s": done - loaded, "total_s": done - start}}))
+"""
+
+
+def _run(code, importtime=False) -> tuple:
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", code]
+    proc = subprocess.run(cmd, cwd=config.PROJECT_ROOT, capture_output=True, text=True,
+                          env={**os.environ, "PYTHONPATH": str(config.PROJECT_ROOT)})
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark subprocess failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, proc.stderr
+
+
+def parse_importtime(stderr) -> list:
+    """-> [(cumulative_us, self_us, module)] aus der -X importtime Ausgabe"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.strip()))
+    return rows
+
+
+def top_level_modules(rows, n=15) -> list:
+    """Teuerste Pakete nach Gesamtzeit (Summe der Self-Zeit ihrer Module)"""
+    per_package = {}
+    for _, self_us, module in rows:
+        package = module.split(".")[0]
+        per_package[package] = per_package.get(package, 0) + self_us
+    return sorted(per_package.items(), key=lambda kv: -kv[1])[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-Start Benchmark für app.app")
+    parser.add_argument("--runs", type=int, default=3, help="frische Interpreter pro Messung (Median)")
+    parser.add_argument("--top", type=int, default=15, help="teuerste Pakete anzeigen")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Budget für import app.app")
+    parser.add_argument("--first-prediction", action="store_true",
+                        help="Modelle laden und eine Vorhersage machen (braucht Artefakte und Azure)")
+    parser.add_argument("--max-first-prediction-ms", type=float, default=None,
+                        help="Budget für Import + Laden + erste Vorhersage")
+    parser.add_argument("--text", default="Wie kann ich mein Passwort zurücksetzen?")
+    args = parser.parse_args()
+
+    failures = []
+
+    import_times = []
+    heavy = set()
+    for _ in range(args.runs):
+        result, _ = _run(_IMPORT_SNIPPET.format(heavy=HEAVY_MODULES))
+        import_times.append(result["import_s"] * 1000)
+        heavy.update(result["heavy"])
+    import_ms = statistics.median(import_times)
+    print(f"import app.app: {import_ms:.1f} ms (median of {args.runs}, min {min(import_times):.1f} ms)")
+
+    _, stderr = _run(_IMPORT_SNIPPET.format(heavy=HEAVY_MODULES), importtime=True)
+    print(f"\n{'package':<30} {'self ms':>9}")
+    for package, self_us in top_level_modules(parse_importtime(stderr), args.top):
+        print(f"{package:<30} {self_us / 1000:>9.1f}")
+    print()
+
+    if heavy:
+        failures.append(f"heavy modules imported by app.app: {', '.join(sorted(heavy))}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import {import_ms:.1f} ms > budget {args.max_import_ms:.1f} ms")
+
+    if args.first_prediction:
+        result, _ = _run(_PREDICT_SNIPPET.format(text=args.text))
+        total_ms = result["total_s"] * 1000
+        print(f"time to first prediction: {total_ms:.1f} ms "
+              f"(import {result['import_s'] * 1000:.1f}, load {result['load_s'] * 1000:.1f}, "
+              f"predict {result['predict_s'] * 1000:.1f})")
+        if args.max_first_prediction_ms is not None and total_ms > args.max_first_prediction_ms:
+            failures.append(f"first prediction {total_ms:.1f} ms > budget {args.max_first_prediction_ms:.1f} ms")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Cold start within budget")
+
+
+if __name__ == "__main__":
+    main()
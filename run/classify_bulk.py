@@ -0,0 +1,200 @@
+"""
+Offline bulk classification of JSONL/CSV files through the prediction pipeline.
+
+Rows are streamed from the input, classified in batches with predict_intents
+(batched embeddings, vectorized classifier + FAISS, parallel LLM fallback) and
+appended to a JSONL output as soon as a batch is done. Several batches run
+concurrently; at most --concurrency batches are held in memory, so a
+multi-million-row file runs with bounded memory.
+
+After every written batch a checkpoint (<output>.ckpt) records how many input
+rows are done and the output size. An interrupted run continues with --resume:
+the output is truncated to the last checkpoint and those rows are skipped.
+
+    python run/classify_bulk.py tickets.jsonl results.jsonl --text-field body --id-field request_id
+    python run/classify_bulk.py tickets.csv results.jsonl --batch-size 512 --concurrency 4 --resume
+"""
+import sys
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.timing import StageTimer
+
+
+def read_rows(path, fmt=None):
+    """Zeilen als dicts streamen, JSONL oder CSV (nach Endung, wenn fmt nicht gesetzt)"""
+    path = Path(path)
+    fmt = fmt or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(rows, size):
+    it = iter(rows)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+class Checkpoint:
+    """Fortschritt neben der Ausgabe, atomar per os.replace geschrieben"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+
+def _classify_batch(classify, batch, text_field, id_field, first_row, timer):
+    """-> Ausgabezeilen eines Batches; leere Texte werden nicht klassifiziert"""
+    texts = [(row.get(text_field) or "").strip() for row in batch]
+    todo = [i for i, t in enumerate(texts) if t]
+    results = dict(zip(todo, classify([texts[i] for i in todo], timings=timer))) if todo else {}
+
+    records = []
+    for i, row in enumerate(batch):
+        record = {"row": first_row + i}
+        if id_field:
+            record["id"] = row.get(id_field)
+        record.update(results.get(i, {"text": texts[i], "intent": None, "error": "empty text"}))
+        records.append(record)
+    return records
+
+
+def classify_file(input_path, output_path, text_field="text", id_field=None, fmt=None,
+                  batch_size=256, concurrency=2, resume=False, classify=None) -> dict:
+    """Klassifiziert input_path nach output_path und liefert die Zusammenfassung des Laufs"""
+    if classify is None:
+        from model.predict_intent import predict_intents as classify
+
+    output_path = Path(output_path)
+    checkpoint = Checkpoint(output_path.with_name(output_path.name + ".ckpt"))
+    state = checkpoint.load() if resume else {}
+    if state and state.get("input") != str(Path(input_path).resolve()):
+        raise ValueError(f"checkpoint {checkpoint.path} belongs to {state.get('input')}, not {input_path}")
+    state = {
+        "input": str(Path(input_path).resolve()),
+        "rows_done": state.get("rows_done", 0),
+        "output_bytes": state.get("output_bytes", 0),
+        "fallbacks": state.get("fallbacks", 0),
+        "empty": state.get("empty", 0),
+        "completed": False,
+    }
+    skipped = state["rows_done"]
+
+    timer = StageTimer()
+    rows_this_run = 0
+    start = time.perf_counter()
+
+    with open(output_path, "ab" if resume else "wb") as out, ThreadPoolExecutor(concurrency) as pool:
+        # Was nach dem letzten Checkpoint geschrieben wurde, wird neu berechnet
+        out.truncate(state["output_bytes"])
+        pending = deque()
+
+        def write(future):
+            nonlocal rows_this_run
+            records = future.result()
+            out.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+            rows_this_run += len(records)
+            state["rows_done"] += len(records)
+            state["output_bytes"] = out.tell()
+            state["fallbacks"] += sum(1 for r in records if r.get("fallback_used"))
+            state["empty"] += sum(1 for r in records if r.get("error"))
+            checkpoint.save(state)
+
+        try:
+            rows = itertools.islice(read_rows(input_path, fmt), skipped, None)
+            for n, batch in enumerate(batched(rows, batch_size)):
+                first_row = skipped + n * batch_size
+                pending.append(pool.submit(_classify_batch, classify, batch, text_field, id_field, first_row, timer))
+                while len(pending) >= concurrency:
+                    write(pending.popleft())
+            while pending:
+                write(pending.popleft())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    state["completed"] = True
+    checkpoint.save(state)
+
+    elapsed = time.perf_counter() - start
+    classified = state["rows_done"] - state["empty"]
+    return {
+        "rows": state["rows_done"],
+        "rows_this_run": rows_this_run,
+        "resumed_at": skipped,
+        "elapsed_s": elapsed,
+        "rows_per_s": rows_this_run / elapsed if elapsed else 0.0,
+        "fallbacks": state["fallbacks"],
+        "fallback_rate": state["fallbacks"] / classified if classified else 0.0,
+        "empty": state["empty"],
+        "stages": timer.as_dict(),
+    }
+
+
+def print_summary(summary):
+    print(f"\n✅ {summary['rows_this_run']} rows in {summary['elapsed_s']:.1f} s "
+          f"({summary['rows_per_s']:.1f} rows/s)"
+          + (f", resumed at row {summary['resumed_at']}" if summary["resumed_at"] else ""))
+    print(f"Total rows: {summary['rows']}, empty: {summary['empty']}, "
+          f"fallback rate: {summary['fallback_rate']:.1%} ({summary['fallbacks']})")
+    # Stage-Zeiten sind über parallele Batches summiert und können die Laufzeit übersteigen
+    print(f"\n{'stage':<10} {'total s':>9} {'items':>9} {'ms/item':>9}")
+    for name, s in summary["stages"].items():
+        per_item = s["seconds"] * 1000 / s["items"] if s["items"] else 0.0
+        print(f"{name:<10} {s['seconds']:>9.2f} {s['items']:>9} {per_item:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL/CSV Datei offline klassifizieren (streamend, mit Resume)")
+    parser.add_argument("input", help="JSONL oder CSV mit einem Textfeld pro Zeile")
+    parser.add_argument("output", help="Ergebnis als JSONL")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default=None, help="Feld, das als id in die Ausgabe übernommen wird")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Standard: nach Dateiendung")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=2, help="Batches gleichzeitig in Arbeit")
+    parser.add_argument("--resume", action="store_true", help="ab dem letzten Checkpoint weitermachen")
+    parser.add_argument("--report", default=None, help="Zusammenfassung zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    summary = classify_file(args.input, args.output, args.text_field, args.id_field, args.format,
+                            args.batch_size, args.concurrency, args.resume)
+    print_summary(summary)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,12 +11,8 @@ echo "Working directory: $(pwd)"
 echo "Python version: $(python --version)"
 echo "Python path: $(which python)"
 
-echo "Testing app import..."
-python -c "import sys; sys.path.insert(0, '/app'); from app.app import app; print('✓ App imported successfully')" || {
-    echo "ERROR: Failed to import app"
-    exit 1
-}
-
+# Kein separater Import-Test: uvicorn importiert app.app ohnehin und bricht bei Fehlern ab,
+# ein zweiter Import würde den Cold Start nur verlängern.
 echo "Starting uvicorn server..."
 exec python -m uvicorn app.app:app --host 0.0.0.0 --port 8001 --log-level info
 
@@ -10,3 +10,18 @@ _project_root = Path(__file__).parent.parent.resolve()
 if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _reset_caches():
+    """Verwirft In-Process Caches nach jedem Test, damit Mocks nicht aus dem Cache bedient werden."""
+    yield
+    embedding_model = sys.modules.get("model.embedding_model")
+    if embedding_model is not None:
+        embedding_model._embedding_cache = None
+        embedding_model._embedding_batcher = None
+    chat_model = sys.modules.get("model.chat_model")
+    if chat_model is not None:
+        chat_model._fallback_cache = None
+        chat_model._chat_limiter = None
@@ -0,0 +1,88 @@
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from data.build_faiss import build_index, calibrate_retrieval_threshold, prepare_vectors, tune
+
+
+def _clustered(n=2000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(0, 20, n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_tuner_picks_config_meeting_target_recall():
+    """Test that the IVF sweep returns a config that meets the recall target."""
+    x = _clustered()
+    index = build_index(x, "IVF16,Flat", "l2")
+
+    best = tune(index, x, "l2", k=5, target_recall=0.9, n_queries=200)
+
+    assert best["search_params"].startswith("nprobe=")
+    assert best["recall_at_k"] >= 0.9
+
+
+def test_cosine_index_distances_match_l2_scale():
+    """Test that cosine distances (2 - 2*cos) equal squared L2 of normalized vectors."""
+    x = _clustered(n=200)
+    index = build_index(x, "Flat", "cosine")
+    q = prepare_vectors(x[:5], "cosine")
+
+    D, I = index.search(q, 1)
+
+    np.testing.assert_array_equal(I[:, 0], np.arange(5))
+    np.testing.assert_allclose(2.0 - 2.0 * D[:, 0], 0.0, atol=1e-5)
+    threshold = calibrate_retrieval_threshold(index, prepare_vectors(x, "cosine"), "cosine")
+    assert 0.0 < threshold < 4.0
+
+
+def test_serving_applies_cosine_metric():
+    """Test that the serving path normalizes queries and converts similarities to distances."""
+    import model.predict_intent as predict_module
+
+    x = _clustered(n=200)
+    index = build_index(x, "Flat", "cosine")
+    query = x[:1] * 3.0  # unnormalisiert
+
+    with patch.object(predict_module, "index", index), \
+         patch.object(predict_module, "index_meta", {"metric": "cosine"}):
+        intents, distances, _ = predict_module._retrieve(query, ["login_problems"])
+
+    assert intents == ["login_problems"]
+    assert abs(distances[0]) < 1e-5
+
+
+def test_main_replaces_the_index_atomically(tmp_path):
+    """Test that the live index is never the write target: write to a tmp file, then rename."""
+    import faiss
+    import config
+    from data import build_faiss
+
+    (tmp_path / "data/embeddings").mkdir(parents=True)
+    np.save(tmp_path / "data/embeddings/embeddings.npy", _clustered(n=50, dim=8))
+    (tmp_path / "data/embeddings/labels.json").write_text(json.dumps(["a"] * 50))
+    index_path, meta_path = tmp_path / "data/vector_db/faiss.index", tmp_path / "data/vector_db/faiss.json"
+    targets = []
+
+    def write_index(index, path):
+        targets.append(path)
+        faiss_write(index, path)
+
+    faiss_write = faiss.write_index
+    with patch.object(config, "PROJECT_ROOT", tmp_path), \
+         patch.object(build_faiss, "INDEX_PATH", index_path), patch.object(build_faiss, "META_PATH", meta_path), \
+         patch.object(build_faiss.faiss, "write_index", side_effect=write_index), \
+         patch.object(sys, "argv", ["build_faiss.py"]):
+        build_faiss.main()
+
+    assert targets == [str(index_path.with_suffix(".tmp"))]
+    assert faiss.read_index(str(index_path)).ntotal == 50
+    assert json.loads(meta_path.read_text())["ntotal"] == 50
+    assert sorted(p.name for p in index_path.parent.iterdir()) == ["faiss.index", "faiss.json"]
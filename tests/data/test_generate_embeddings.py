@@ -0,0 +1,106 @@
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+import pytest
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from data.generate_embeddings import append, embed_with_retry, export, generate, make_chunks
+from model.embedding_cache import SqliteVectorStore
+
+
+def _fake_embed(calls):
+    def embed(texts):
+        calls.append(list(texts))
+        return [np.full(4, len(t), dtype=np.float32) for t in texts]
+    return embed
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_chunks_respect_count_and_size_limits():
+    """Test that batches stay below the input count and character limits."""
+    chunks = list(make_chunks(["a" * 10] * 7, batch_size=3, max_chars=25))
+
+    assert [len(c) for c in chunks] == [2, 2, 2, 1]
+
+
+def test_generate_only_embeds_new_texts(tmp_path):
+    """Test that a second run with a grown dataset only embeds the new examples."""
+    store = SqliteVectorStore(tmp_path / "emb.sqlite")
+    calls = []
+    with patch("data.generate_embeddings._embed_batch", side_effect=_fake_embed(calls)):
+        first = generate(["eins", "zwei", "drei"], store, "m", 4, batch_size=2, concurrency=2)
+        second = generate(["eins", "zwei", "drei", "vier"], store, "m", 4, batch_size=2)
+        other_dim = generate(["eins"], store, "m", 8)
+
+    assert first["embedded"] == 3 and first["batches"] == 2
+    assert second["embedded"] == 1 and second["cached"] == 3
+    assert calls[-2] == ["vier"]
+    assert other_dim["embedded"] == 1  # anderer EMB_DIM -> eigener Key
+
+
+def test_export_keeps_dataset_order(tmp_path):
+    """Test that the npy/json export follows the dataset order."""
+    store = SqliteVectorStore(tmp_path / "emb.sqlite")
+    texts, labels = ["a", "bbb", "cc"], ["x", "y", "x"]
+    with patch("data.generate_embeddings._embed_batch", side_effect=_fake_embed([])):
+        generate(texts, store, "m", 4)
+
+    embeddings = export(texts, labels, store, "m", 4, out_dir=tmp_path)
+
+    assert embeddings[:, 0].tolist() == [1.0, 3.0, 2.0]
+    assert np.load(tmp_path / "embeddings.npy").shape == (3, 4)
+    assert json.loads((tmp_path / "labels.json").read_text()) == labels
+    assert json.loads((tmp_path / "texts.json").read_text()) == texts
+
+
+def test_failed_append_keeps_previous_exports(tmp_path):
+    """Test that a failure while writing texts.json leaves all three exports of the last run in place."""
+    store = SqliteVectorStore(tmp_path / "emb.sqlite")
+    with patch("data.generate_embeddings._embed_batch", side_effect=_fake_embed([])):
+        generate(["a", "bb"], store, "m", 4)
+    export(["a", "bb"], ["x", "y"], store, "m", 4, out_dir=tmp_path)
+
+    real_dump = json.dump
+    def dump(obj, f, **kwargs):
+        if Path(f.name).name == "texts.json.tmp":
+            raise OSError("disk full")
+        real_dump(obj, f, **kwargs)
+
+    with patch("data.generate_embeddings.json.dump", side_effect=dump), pytest.raises(OSError):
+        append(["ccc"], ["x"], np.ones((1, 4), dtype=np.float32), tmp_path)
+
+    assert np.load(tmp_path / "embeddings.npy").shape == (2, 4)
+    assert json.loads((tmp_path / "labels.json").read_text()) == ["x", "y"]
+    assert json.loads((tmp_path / "texts.json").read_text()) == ["a", "bb"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_retries_rate_limits_then_succeeds():
+    """Test backoff on 429 and no retry for other errors."""
+    attempts = []
+
+    def flaky(texts):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited("429")
+        return [np.zeros(4, dtype=np.float32)]
+
+    with patch("data.generate_embeddings._embed_batch", side_effect=flaky), \
+         patch("data.generate_embeddings.time.sleep") as mock_sleep:
+        result = embed_with_retry(["x"], max_retries=5)
+
+    assert len(result) == 1 and len(attempts) == 3
+    assert mock_sleep.call_count == 2
+
+    with patch("data.generate_embeddings._embed_batch", side_effect=ValueError("bad input")), \
+         pytest.raises(ValueError):
+        embed_with_retry(["x"])
@@ -0,0 +1,143 @@
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import faiss
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from data.update_faiss import add_examples, empty_sidecar, load_state, remove_examples, with_ids, write_version
+import model.predict_intent as predict_module
+
+
+def _examples(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(n, dim)).astype(np.float32)
+    labels = ["billing" if i % 2 else "login" for i in range(n)]
+    return x, labels, [f"text {i}" for i in range(n)]
+
+
+def _new_index(spec, dim=8):
+    return with_ids(faiss.index_factory(dim, spec, faiss.METRIC_L2))
+
+
+def test_add_and_remove_write_new_versions(tmp_path):
+    """Test stable IDs across add/remove and the atomic faiss.json pointer."""
+    meta_path = tmp_path / "faiss.json"
+    x, labels, texts = _examples(10)
+    index, sidecar = _new_index("Flat"), empty_sidecar()
+    add_examples(index, sidecar, x[:6], labels[:6], texts[:6], "l2")
+    meta = write_version(index, sidecar, {"spec": "Flat", "metric": "l2"}, meta_path)
+    assert meta["version"] == 1 and meta["ntotal"] == 6
+
+    meta, index, sidecar = load_state(meta_path)
+    ids = add_examples(index, sidecar, x[6:], labels[6:], texts[6:], "l2")
+    index, removed = remove_examples(index, sidecar, [1, 2], meta)
+    meta = write_version(index, sidecar, meta, meta_path)
+
+    assert ids == [6, 7, 8, 9] and removed == 2
+    on_disk = json.loads(meta_path.read_text())
+    assert on_disk["version"] == 2 and on_disk["index_file"] == "faiss.v0002.index"
+    _, index, sidecar = load_state(meta_path)
+    assert index.ntotal == 8
+    assert sidecar["ids"] == [0, 3, 4, 5, 6, 7, 8, 9] and sidecar["next_id"] == 10
+    assert sidecar["texts"][1] == "text 3"
+    # Vektor mit ID 7 findet sich selbst
+    _, I = index.search(x[7:8], 1)
+    assert I[0, 0] == 7
+
+
+def test_remove_rebuilds_index_types_without_remove_ids(tmp_path):
+    """Test that HNSW (no remove_ids) is rebuilt from the remaining vectors."""
+    x, labels, texts = _examples(20)
+    index, sidecar = _new_index("HNSW8"), empty_sidecar()
+    add_examples(index, sidecar, x, labels, texts, "l2")
+
+    index, removed = remove_examples(index, sidecar, [0, 5], {"spec": "HNSW8"})
+
+    assert removed == 2 and index.ntotal == 18
+    _, I = index.search(x[5:7], 1)
+    assert I[0, 0] != 5 and I[1, 0] == 6
+
+
+def test_rebuild_trains_index_types_with_codebooks():
+    """Test that a rebuilt HNSW,SQ8 index is trained again before the remaining vectors are added."""
+    x, labels, texts = _examples(50)
+    index, sidecar = _new_index("HNSW8,SQ8"), empty_sidecar()
+    index.train(x)
+    add_examples(index, sidecar, x, labels, texts, "l2")
+
+    index, removed = remove_examples(index, sidecar, [3], {"spec": "HNSW8,SQ8"})
+
+    assert removed == 1 and index.is_trained and index.ntotal == 49
+    _, I = index.search(x[4:5], 1)
+    assert I[0, 0] == 4
+
+
+def test_old_versions_are_pruned(tmp_path):
+    """Test that only the newest `keep` versions stay on disk."""
+    meta_path = tmp_path / "faiss.json"
+    x, labels, texts = _examples(4)
+    index, sidecar, meta = _new_index("Flat"), empty_sidecar(), {"spec": "Flat", "metric": "l2"}
+    for i in range(4):
+        add_examples(index, sidecar, x[i:i + 1], labels[i:i + 1], texts[i:i + 1], "l2")
+        meta = write_version(index, sidecar, meta, meta_path, keep=2)
+
+    assert sorted(p.name for p in tmp_path.glob("faiss.v*")) == [
+        "faiss.v0003.ids.json", "faiss.v0003.index", "faiss.v0004.ids.json", "faiss.v0004.index"]
+
+
+def test_serving_maps_stable_ids_to_labels(tmp_path):
+    """Test that retrieval resolves non-contiguous FAISS IDs via the sidecar."""
+    meta_path = tmp_path / "faiss.json"
+    x, labels, texts = _examples(10)
+    index, sidecar = _new_index("Flat"), empty_sidecar()
+    add_examples(index, sidecar, x, labels, texts, "l2")
+    index, _ = remove_examples(index, sidecar, [0, 1, 2, 3], {"spec": "Flat"})
+    meta = write_version(index, sidecar, {"spec": "Flat", "metric": "l2"}, meta_path)
+
+    classes, codes, ids = predict_module._load_retrieval_ids(tmp_path / meta["ids_file"], index.ntotal)
+    state = predict_module.ServingState(index=index, retrieval_classes=classes, retrieval_codes=codes,
+                                        retrieval_ids=ids, index_meta=meta)
+    with patch.object(predict_module, "RETRIEVAL_K", 1):
+        intents, distances, _ = predict_module._retrieve(x[[7, 8]], ["x", "x"], state)
+
+    assert intents == ["billing", "login"]
+    assert distances[0] < 1e-5
+
+
+def test_init_after_tuned_ivf_build_drops_stale_tuning(tmp_path):
+    """Test that init with another index type and metric does not keep nprobe and the l2 threshold."""
+    import argparse
+    import config
+    from data import build_faiss, update_faiss
+
+    x, labels, texts = _examples(400, dim=16)
+    (tmp_path / "data/embeddings").mkdir(parents=True)
+    np.save(tmp_path / "data/embeddings/embeddings.npy", x)
+    (tmp_path / "data/embeddings/labels.json").write_text(json.dumps(labels))
+    meta_path = tmp_path / "data/vector_db/faiss.json"
+
+    with patch.object(config, "PROJECT_ROOT", tmp_path), \
+         patch.object(build_faiss, "INDEX_PATH", meta_path.with_name("faiss.index")), \
+         patch.object(build_faiss, "META_PATH", meta_path), patch.object(update_faiss, "META_PATH", meta_path), \
+         patch.object(sys, "argv", ["build_faiss.py", "--index", "IVF16,Flat", "--tune"]):
+        build_faiss.main()
+        tuned = json.loads(meta_path.read_text())
+        assert tuned["search_params"].startswith("nprobe=") and tuned["retrieval_threshold"] > 2
+
+        update_faiss.cmd_init(argparse.Namespace(index="HNSW16", metric="cosine", keep=3))
+        meta = json.loads(meta_path.read_text())
+        assert meta["spec"] == "HNSW16" and meta["metric"] == "cosine"
+        assert not {"search_params", "retrieval_threshold", "recall_at_k", "latency_ms", "k"} & set(meta)
+        faiss.ParameterSpace().set_index_parameters(load_state(meta_path)[1], meta.get("search_params", ""))
+
+        meta_path.write_text(json.dumps(tuned))
+        update_faiss.cmd_init(argparse.Namespace(index=None, metric=None, keep=3))
+        meta = json.loads(meta_path.read_text())
+        assert meta["search_params"] == tuned["search_params"]
+        assert meta["retrieval_threshold"] == tuned["retrieval_threshold"]
@@ -30,7 +30,7 @@ def test_predict_endpoint_success():
     """Test the predict endpoint with a valid query."""
     client = TestClient(app)
     
-    # Mock the predict_intent function
+    # Mock the predict_intent_async function
     mock_result = {
         "text": "Ich kann mich nicht einloggen",
         "intent": "login_problems",
@@ -41,7 +41,7 @@ def test_predict_endpoint_success():
         "fallback_used": False
     }
     
-    with patch("app.app.predict_intent", return_value=mock_result):
+    with patch("app.app.predict_intent_async", return_value=mock_result):
         response = client.post(
             "/predict",
             json={"text": "Ich kann mich nicht einloggen"}
@@ -69,7 +69,7 @@ def test_predict_endpoint_with_fallback():
         "fallback_used": True
     }
     
-    with patch("app.app.predict_intent", return_value=mock_result):
+    with patch("app.app.predict_intent_async", return_value=mock_result):
         response = client.post(
             "/predict",
             json={"text": "Was kostet die Erde?"}
@@ -121,10 +121,10 @@ def test_predict_endpoint_missing_text():
 
 
 def test_predict_endpoint_error_handling():
-    """Test error handling when predict_intent raises an exception."""
+    """Test error handling when predict_intent_async raises an exception."""
     client = TestClient(app)
     
-    with patch("app.app.predict_intent", side_effect=Exception("Model error")):
+    with patch("app.app.predict_intent_async", side_effect=Exception("Model error")):
         response = client.post(
             "/predict",
             json={"text": "Test query"}
@@ -157,7 +157,7 @@ def test_predict_endpoint_multiple_queries():
             "fallback_used": False
         }
         
-        with patch("app.app.predict_intent", return_value=mock_result):
+        with patch("app.app.predict_intent_async", return_value=mock_result):
             response = client.post(
                 "/predict",
                 json={"text": query}
@@ -167,3 +167,106 @@ def test_predict_endpoint_multiple_queries():
             data = response.json()
             assert data["text"] == query
 
+
+
+def test_predict_batch_endpoint():
+    """Test the batch endpoint returns one result per text."""
+    client = TestClient(app)
+    texts = ["Ich kann mich nicht einloggen", "Wo ist mein Paket?"]
+    mock_results = [
+        {"text": t, "intent": "login_problems", "fallback_used": False} for t in texts
+    ]
+
+    with patch("app.app.predict_intents", return_value=mock_results) as mock_predict:
+        response = client.post("/predict/batch", json={"texts": texts})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["text"] for r in data["results"]] == texts
+        mock_predict.assert_called_once_with(texts)
+
+
+def test_predict_batch_endpoint_streams_ndjson():
+    """Test NDJSON streaming of batch results in chunks."""
+    import json
+    client = TestClient(app)
+    texts = [f"Ticket {i}" for i in range(5)]
+
+    def fake_predict_intents(chunk):
+        return [{"text": t, "intent": "general_question"} for t in chunk]
+
+    with patch("app.app.predict_intents", side_effect=fake_predict_intents) as mock_predict, \
+         patch("app.app.BATCH_STREAM_CHUNK", 2):
+        response = client.post("/predict/batch?stream=true", json={"texts": texts})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["text"] for r in lines] == texts
+        assert mock_predict.call_count == 3
+
+
+def test_ready_endpoint_after_warm_up():
+    """Test that /ready only reports OK once the startup warm-up has finished."""
+    import app.app as app_module
+    from unittest.mock import AsyncMock
+
+    app_module.readiness.update({"ready": False, "error": None, "warmup_seconds": None})
+    client = TestClient(app)
+    assert client.get("/ready").status_code == 503
+
+    warm_up = AsyncMock(return_value={"intent": "login_problems"})
+    with patch("app.app.warm_up_async", warm_up), \
+         patch("app.app.WARMUP_ENABLED", True):
+        with TestClient(app) as client:
+            for _ in range(100):
+                response = client.get("/ready")
+                if response.status_code == 200:
+                    break
+                import time
+                time.sleep(0.01)
+
+            assert response.status_code == 200
+            assert response.json()["status"] == "ready"
+            warm_up.assert_awaited_once()
+
+
+def test_ready_endpoint_reports_failed_warm_up():
+    """Test that a failing warm-up keeps the worker out of rotation but "/" stays up."""
+    import app.app as app_module
+    from unittest.mock import AsyncMock
+
+    app_module.readiness.update({"ready": False, "error": None, "warmup_seconds": None})
+    warm_up = AsyncMock(side_effect=FileNotFoundError("faiss.index"))
+    with patch("app.app.warm_up_async", warm_up), \
+         patch("app.app.WARMUP_ENABLED", True), \
+         patch("app.app.WARMUP_RETRY_SECONDS", 60):
+        with TestClient(app) as client:
+            import time
+            for _ in range(100):
+                if app_module.readiness["error"]:
+                    break
+                time.sleep(0.01)
+            response = client.get("/ready")
+
+            assert response.status_code == 503
+            assert "faiss.index" in response.json()["error"]
+            assert client.get("/").status_code == 200
+
+
+def test_metrics_endpoint_counts_requests_per_route():
+    """Test that /metrics exposes request counts by route template and the in-flight gauge."""
+    from model.metrics import REQUESTS_TOTAL
+
+    client = TestClient(app)
+    before = REQUESTS_TOTAL.value("/predict", "200")
+    with patch("app.app.predict_intent_async", return_value={"intent": "delivery", "fallback_used": False}):
+        client.post("/predict", json={"text": "Wo ist mein Paket?"})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert REQUESTS_TOTAL.value("/predict", "200") == before + 1
+    assert f'intent_http_requests_total{{path="/predict",status="200"}} {before + 1}' in response.text
+    assert "intent_http_requests_in_flight 1" in response.text  # der /metrics Request selbst
@@ -0,0 +1,80 @@
+"""
+Tests for the queue-based logging setup of the API.
+"""
+import sys
+import io
+import json
+import logging
+import queue
+from pathlib import Path
+from unittest.mock import patch
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import pytest
+
+from app import logging_config
+
+
+@pytest.fixture
+def json_logs():
+    """Frisches Logging-Setup mit JSON nach StringIO, danach wieder abgebaut"""
+    logging_config.shutdown_logging()
+    stream = io.StringIO()
+    logging_config.setup_logging(level="INFO", fmt="json", stream=stream)
+    yield stream
+    logging_config.shutdown_logging()
+
+
+def test_queue_handler_does_not_format_in_the_calling_thread():
+    """Test that args stay unrendered until the listener formats the record."""
+    class Expensive:
+        calls = 0
+
+        def __str__(self):
+            Expensive.calls += 1
+            return "expensive"
+
+    q = queue.SimpleQueue()
+    logger = logging.getLogger("test.lazy")
+    handler = logging_config.LazyQueueHandler(q)
+    logger.addHandler(handler)
+    logger.propagate = False  # nur dieser Handler, nicht die von pytest
+    try:
+        logger.warning("value: %s", Expensive())
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+
+    record = q.get_nowait()
+    assert Expensive.calls == 0
+    assert record.getMessage() == "value: expensive"
+
+
+def test_setup_logging_writes_json_records_with_extras(json_logs):
+    logger = logging.getLogger("test.json")
+    logger.info("Predict result", extra={"result": {"intent": "delivery", "fallback_used": False}})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Error in predict: %s", "boom")
+    assert logging_config.setup_logging() is logging_config._listener  # idempotent
+
+    logging_config.shutdown_logging()  # leert die Queue
+    lines = [json.loads(line) for line in json_logs.getvalue().splitlines()]
+
+    assert lines[0]["message"] == "Predict result"
+    assert lines[0]["result"] == {"intent": "delivery", "fallback_used": False}
+    assert lines[0]["level"] == "INFO" and lines[0]["logger"] == "test.json"
+    assert lines[1]["level"] == "ERROR"
+    assert "ValueError: boom" in lines[1]["exception"]
+
+
+def test_result_sampling():
+    with patch.object(logging_config, "LOG_RESULT_SAMPLE_RATE", 0.0):
+        assert not any(logging_config.sample_result() for _ in range(100))
+    with patch.object(logging_config, "LOG_RESULT_SAMPLE_RATE", 1.0):
+        assert all(logging_config.sample_result() for _ in range(100))
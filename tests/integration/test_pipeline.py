@@ -2,9 +2,10 @@
 End-to-end pipeline integration tests.
 Tests the complete prediction pipeline with mocked external services.
 """
+import asyncio
 import sys
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import numpy as np
 
 # Ensure project root is in Python path
@@ -12,7 +13,8 @@ _project_root = Path(__file__).parent.parent.parent.resolve()
 if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
-from model.predict_intent import predict_intent
+from model.predict_intent import predict_intent, predict_intent_async
+from model.timing import StageTimer
 
 
 class MockEmbeddingResponse:
@@ -170,3 +172,112 @@ def test_pipeline_returns_all_expected_fields():
         assert isinstance(result["retrieval_distance"], float)
         assert isinstance(result["fallback_used"], bool)
 
+
+
+def test_async_pipeline_matches_sync_pipeline():
+    """Test that the async pipeline awaits the async clients and uses the same decision logic."""
+    mock_embedding = np.random.rand(1536).astype(np.float32)
+
+    mock_clf = MagicMock()
+    mock_clf.predict.return_value = np.array([0])
+    mock_clf.predict_proba.return_value = np.array([[0.45, 0.55]])  # Low confidence
+
+    mock_le = MagicMock()
+    mock_le.inverse_transform.return_value = np.array(["general_question"])
+
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[0.5]]), np.array([[0]]))
+
+    embed_mock = AsyncMock(return_value=mock_embedding.reshape(1, -1))
+    fallback_mock = AsyncMock(return_value="subscription")
+
+    with patch("model.predict_intent.embed_query_async", embed_mock), \
+         patch("model.predict_intent.llm_fallback_async", fallback_mock), \
+         patch("model.predict_intent._load_models"):
+        import model.predict_intent as predict_module
+        predict_module.clf = mock_clf
+        predict_module.le = mock_le
+        predict_module.index = mock_index
+
+        result = asyncio.run(predict_intent_async("Wie kündige ich?"))
+
+        embed_mock.assert_awaited_once_with("Wie kündige ich?")
+        fallback_mock.assert_awaited_once_with("Wie kündige ich?")
+        assert result["fallback_used"] is True
+        assert result["intent"] == "subscription"
+        assert result["clf_intent"] == "general_question"
+        assert result["retrieval_distance"] == 0.5
+
+
+def test_batch_pipeline_only_falls_back_for_uncertain_texts():
+    """Test that predict_intents scores the whole batch at once and only sends low-confidence texts to the LLM."""
+    from model.predict_intent import predict_intents
+
+    texts = ["Ich kann mich nicht einloggen", "Was kostet die Erde?", "Wo ist mein Paket?"]
+    mock_embeddings = np.random.rand(3, 512).astype(np.float32)
+
+    mock_clf = MagicMock()
+    mock_clf.classes_ = np.array([0, 1, 2])
+    mock_clf.predict_proba.return_value = np.array([
+        [0.9, 0.05, 0.05],
+        [0.4, 0.3, 0.3],   # Low confidence
+        [0.1, 0.1, 0.8],
+    ])
+
+    mock_le = MagicMock()
+    names = np.array(["login_problems", "general_question", "delivery"])
+    mock_le.inverse_transform.side_effect = lambda codes: names[np.asarray(codes)]
+
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[0.3], [0.4], [0.5]]), np.array([[0], [1], [2]]))
+
+    with patch("model.predict_intent.embed_many", return_value=mock_embeddings) as mock_embed, \
+         patch("model.predict_intent.llm_fallback", return_value="general_question") as mock_fallback, \
+         patch("model.predict_intent._load_models"):
+        import model.predict_intent as predict_module
+        predict_module.clf = mock_clf
+        predict_module.le = mock_le
+        predict_module.index = mock_index
+
+        timer = StageTimer()
+        results = predict_intents(texts, timings=timer)
+
+        mock_embed.assert_called_once_with(texts)
+        mock_clf.predict_proba.assert_called_once()
+        mock_index.search.assert_called_once()
+        mock_fallback.assert_called_once_with("Was kostet die Erde?")
+        assert [r["intent"] for r in results] == ["login_problems", "general_question", "delivery"]
+        assert [r["fallback_used"] for r in results] == [False, True, False]
+        assert results[2]["clf_confidence"] == 0.8
+        stages = timer.as_dict()
+        assert stages["embed"]["items"] == 3 and stages["classify"]["items"] == 3
+        assert stages["classifier"]["items"] == 3 and stages["faiss"]["items"] == 3
+        assert stages["fallback"]["items"] == 1
+
+
+def test_pipeline_keeps_classifier_intent_when_fallback_rejected():
+    """Test that a saturated fallback limiter degrades to the classifier answer."""
+    from model.concurrency import FallbackRejectedError
+
+    mock_clf = MagicMock()
+    mock_clf.predict.return_value = np.array([0])
+    mock_clf.predict_proba.return_value = np.array([[0.4, 0.6]])
+
+    mock_le = MagicMock()
+    mock_le.inverse_transform.return_value = np.array(["payment_issues"])
+
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[1.5]]), np.array([[0]]))
+
+    with patch("model.predict_intent.embed_query", return_value=np.random.rand(1, 512).astype(np.float32)), \
+         patch("model.predict_intent.llm_fallback", side_effect=FallbackRejectedError("Fallback queue is full")), \
+         patch("model.predict_intent._load_models"):
+        import model.predict_intent as predict_module
+        predict_module.clf = mock_clf
+        predict_module.le = mock_le
+        predict_module.index = mock_index
+
+        result = predict_intent("Zahlung hängt")
+
+        assert result["intent"] == "payment_issues"
+        assert result["fallback_used"] is False
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Set up project path before importing config
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+
+def _fresh_import(code):
+    """In einem frischen Interpreter ausführen, sys.modules des Testlaufs ist schon belegt"""
+    env = {**os.environ, "PYTHONPATH": str(_project_root)}
+    env.pop("EMB_MODEL_DEPLOY_KEY", None)
+    env.pop("CHAT_ENDPOINT_KEY", None)
+    return subprocess.run([sys.executable, "-c", code], cwd=_project_root,
+                          capture_output=True, text=True, env=env)
+
+
+def test_app_import_skips_heavy_modules():
+    """Cold Start: faiss, sklearn und openai werden erst beim Laden der Modelle / ersten Call importiert"""
+    proc = _fresh_import(
+        "import sys, app.app\n"
+        "print('heavy:' + ','.join(m for m in ('faiss', 'sklearn', 'joblib', 'openai') if m in sys.modules))"
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert "heavy:\n" in proc.stdout
+
+
+def test_missing_key_raises_on_first_use():
+    """Ohne API-Key klappt der Import, der Fehler kommt beim ersten Client-Zugriff"""
+    proc = _fresh_import(
+        "from model import embedding_model\n"
+        "try:\n"
+        "    embedding_model.get_embed_client()\n"
+        "except ValueError as e:\n"
+        "    print(e)\n"
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert "EMB_MODEL_DEPLOY_KEY" in proc.stdout
@@ -0,0 +1,130 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model import predict_intent as p
+from model.calibrate_thresholds import (calibrate, evaluate, fallback_mask, replay_kfold, select, to_arrays)
+
+
+def _random_scores(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    intents = np.array(["delivery", "returns", "payment_issues"])
+    labels = intents[rng.integers(0, 3, n)]
+    scores = [{
+        "clf_intent": str(labels[i] if rng.random() < 0.8 else intents[rng.integers(0, 3)]),
+        "clf_confidence": float(rng.random()),
+        "retrieval_intent": str(intents[rng.integers(0, 3)]),
+        "retrieval_distance": float(rng.random() * 2),
+        "retrieval_agreement": float(rng.random()),
+    } for i in range(n)]
+    return scores, labels
+
+
+def test_fallback_mask_matches_needs_fallback():
+    """Test that the vectorized sweep decides exactly like the serving path."""
+    scores, labels = _random_scores()
+    a = to_arrays(scores, labels)
+
+    mask = fallback_mask(a, 0.55, 1.1, 0.6)
+
+    assert list(mask) == [p._needs_fallback(s, 0.55, 1.1, 0.6) for s in scores]
+
+
+def test_select_lowest_fallback_rate_above_target():
+    rows = [
+        {"clf_threshold": 0.3, "retrieval_threshold": 2.0, "fallback_rate": 0.05, "accuracy": 0.90},
+        {"clf_threshold": 0.5, "retrieval_threshold": 1.5, "fallback_rate": 0.10, "accuracy": 0.95},
+        {"clf_threshold": 0.7, "retrieval_threshold": 1.0, "fallback_rate": 0.30, "accuracy": 0.97},
+    ]
+
+    assert select(rows, 0.94)["clf_threshold"] == 0.5
+    assert select(rows, 0.99) is None
+
+
+def test_calibrate_keeps_accuracy_and_lowers_fallbacks():
+    """Test global and per-intent calibration on out-of-fold scores of separable synthetic data."""
+    rng = np.random.default_rng(0)
+    y = np.arange(300) % 3
+    X = rng.normal(size=(300, 32)).astype(np.float32)
+    X[:, :3] += 2.5 * np.eye(3)[y]
+    labels = [f"intent_{c}" for c in y]
+
+    serving_scorer = p.scorer
+    a = to_arrays(replay_kfold(X, labels, folds=3), labels)
+    assert p.scorer is serving_scorer  # Serving-Zustand unberührt
+    current = {**p._ENV_THRESHOLDS, "CLF_THRESHOLD": 0.95, "RETRIEVAL_THRESHOLD": 0.0, "intent_thresholds": {}}
+    result = calibrate(a, target_accuracy=0.97, per_intent=True, min_support=50, current=current)
+
+    assert result["baseline"]["fallback_rate"] == 1.0
+    assert result["expected"]["accuracy"] >= 0.97
+    assert result["expected"]["fallback_rate"] < 0.5
+    overall = evaluate(a, result["clf_threshold"], result["retrieval_threshold"], result["agreement_threshold"])
+    assert result["expected"]["fallback_rate"] <= overall["fallback_rate"]
+
+
+def test_kfold_baseline_uses_served_thresholds(tmp_path):
+    """Test that the k-fold baseline resolves thresholds like the server: faiss.json, then thresholds.json."""
+    import json
+    from model import calibrate_thresholds
+
+    rng = np.random.default_rng(0)
+    y = np.arange(60) % 3
+    X = rng.normal(size=(60, 16)).astype(np.float32)
+    X[:, :3] += 4 * np.eye(3)[y]
+    (tmp_path / "data/vector_db").mkdir(parents=True)
+    (tmp_path / "data/vector_db/faiss.json").write_text(json.dumps({"metric": "l2", "retrieval_threshold": 0.7}))
+    np.save(tmp_path / "embeddings.npy", X)
+    (tmp_path / "labels.json").write_text(json.dumps([f"intent_{c}" for c in y]))
+    served = tmp_path / "thresholds.json"
+    served.write_text(json.dumps({"metric": "l2", "clf_threshold": 0.3, "retrieval_threshold": 0.8,
+                                  "per_intent": {"intent_0": {"clf_threshold": 0.9, "retrieval_threshold": 0.1}}}))
+    argv = ["calibrate_thresholds.py", "--embeddings", str(tmp_path / "embeddings.npy"), "--folds", "3",
+            "--labels", str(tmp_path / "labels.json"), "--output", str(tmp_path / "out.json")]
+
+    with patch.object(calibrate_thresholds.config, "PROJECT_ROOT", tmp_path), \
+         patch.object(calibrate_thresholds, "THRESHOLDS_PATH", served), patch.object(sys, "argv", argv):
+        calibrate_thresholds.main()
+        baseline = json.loads((tmp_path / "out.json").read_text())["baseline"]
+        assert (baseline["clf_threshold"], baseline["retrieval_threshold"]) == (0.3, 0.8)
+
+        served.write_text(json.dumps({"metric": "cosine", "clf_threshold": 0.3, "retrieval_threshold": 0.8}))
+        calibrate_thresholds.main()
+        baseline = json.loads((tmp_path / "out.json").read_text())["baseline"]
+        assert baseline["clf_threshold"] == p._ENV_THRESHOLDS["CLF_THRESHOLD"]
+        assert baseline["retrieval_threshold"] == 0.7
+
+
+def test_replay_kfold_clamps_folds_to_smallest_class():
+    """Test that the default of 5 folds works with 3 examples per intent like data/input/intents.json."""
+    rng = np.random.default_rng(0)
+    y = np.arange(30) % 10
+    X = rng.normal(size=(30, 16)).astype(np.float32)
+    labels = [f"intent_{c}" for c in y]
+
+    scores = replay_kfold(X, labels)
+
+    assert len(scores) == 30 and all(s is not None for s in scores)
+
+
+def test_resolve_thresholds_sets_global_and_per_intent_values():
+    calibration = {"clf_threshold": 0.4, "retrieval_threshold": 0.9, "agreement_threshold": 0.5, "metric": "l2",
+                   "per_intent": {"delivery": {"clf_threshold": 0.2, "retrieval_threshold": 1.5}}}
+    scores = {"clf_intent": "delivery", "clf_confidence": 0.3, "retrieval_intent": "returns",
+              "retrieval_distance": 1.2, "retrieval_agreement": 0.0}
+
+    thresholds = p.resolve_thresholds({"metric": "l2"}, calibration)
+    state = p.ServingState(**thresholds)
+
+    assert (state.CLF_THRESHOLD, state.RETRIEVAL_THRESHOLD, state.KNN_AGREEMENT_THRESHOLD) == (0.4, 0.9, 0.5)
+    assert p._needs_fallback(scores, state=state) is False  # Werte von "delivery"
+    assert p._needs_fallback({**scores, "clf_intent": "returns"}, state=state) is True  # globale Werte
+
+    thresholds = p.resolve_thresholds({"metric": "l2"}, {**calibration, "metric": "cosine", "clf_threshold": 0.1})
+    assert thresholds["CLF_THRESHOLD"] == p._ENV_THRESHOLDS["CLF_THRESHOLD"]  # andere Metrik: ignoriert
+    assert thresholds["intent_thresholds"] == {}
@@ -0,0 +1,204 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.cache import LRUCache
+
+
+def _chat_response(content):
+    response = MagicMock()
+    response.choices = [MagicMock(message=MagicMock(content=content))]
+    return response
+
+
+def test_lru_cache_entries_expire_after_ttl():
+    """Test that entries are dropped once their TTL is over."""
+    cache = LRUCache(maxsize=4, ttl=10)
+    with patch("model.cache.time.monotonic", return_value=100.0):
+        cache.put("a", 1)
+    with patch("model.cache.time.monotonic", return_value=105.0):
+        assert cache.get("a") == 1
+    with patch("model.cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_llm_fallback_is_cached():
+    """Test that repeated fallbacks for the same phrasing only call the LLM once."""
+    from model.chat_model import llm_fallback, fallback_stats
+
+    calls_before = fallback_stats()["llm_calls"]
+    with patch("model.chat_model.chat_client") as mock_client:
+        mock_client.chat.completions.create.return_value = _chat_response("general_question")
+
+        assert llm_fallback("Was kostet die Erde?") == "general_question"
+        assert llm_fallback("Was kostet  die Erde? ") == "general_question"
+
+        mock_client.chat.completions.create.assert_called_once()
+
+    stats = fallback_stats()
+    assert stats["cache_hits"] == 1
+    assert stats["llm_calls"] == calls_before + 1
+
+
+def test_llm_fallback_cache_invalidated_by_prompt_and_model():
+    """Test that a new prompt or chat model does not reuse old answers."""
+    from model.chat_model import llm_fallback
+
+    with patch("model.chat_model.chat_client") as mock_client:
+        mock_client.chat.completions.create.return_value = _chat_response("general_question")
+        llm_fallback("Was kostet die Erde?")
+
+        with patch("model.chat_model.INTENT_DESCRIPTIONS", "New prompt"):
+            llm_fallback("Was kostet die Erde?")
+
+        with patch.dict("os.environ", {"CHAT_MODEL": "gpt-4o"}):
+            llm_fallback("Was kostet die Erde?")
+
+        assert mock_client.chat.completions.create.call_count == 3
+
+
+def test_concurrent_identical_fallbacks_share_one_call():
+    """Test single-flight: concurrent fallbacks for the same text trigger one LLM call."""
+    import threading
+    import time
+    from model.chat_model import llm_fallback
+
+    def slow_create(**kwargs):
+        time.sleep(0.2)
+        return _chat_response("delivery")
+
+    results = []
+    with patch("model.chat_model.chat_client") as mock_client:
+        mock_client.chat.completions.create.side_effect = slow_create
+        threads = [
+            threading.Thread(target=lambda: results.append(llm_fallback("Paket fehlt")))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == ["delivery"] * 5
+        mock_client.chat.completions.create.assert_called_once()
+
+
+def test_concurrency_limiter_rejects_when_queue_is_full():
+    """Test that callers beyond max_concurrent + max_queue are rejected immediately."""
+    import threading
+    from model.concurrency import ConcurrencyLimiter, FallbackRejectedError
+
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, timeout=5)
+    release = threading.Event()
+    entered = threading.Event()
+
+    def hold_slot():
+        with limiter.slot():
+            entered.set()
+            release.wait(5)
+
+    def wait_for_slot():
+        with limiter.slot():
+            pass
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    entered.wait(5)
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    while limiter.waiting == 0:
+        pass
+
+    try:
+        with limiter.slot():
+            assert False, "Should have been rejected"
+    except FallbackRejectedError:
+        pass
+
+    release.set()
+    holder.join()
+    waiter.join()
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["active"] == 0
+
+
+def test_async_limiter_times_out():
+    """Test that the async limiter rejects callers that wait longer than the timeout."""
+    import asyncio
+    from model.concurrency import ConcurrencyLimiter, FallbackRejectedError
+
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=4, timeout=0.05)
+
+    async def scenario():
+        async with limiter.async_slot():
+            try:
+                async with limiter.async_slot():
+                    return False
+            except FallbackRejectedError:
+                return True
+
+    assert asyncio.run(scenario()) is True
+    assert limiter.stats()["rejected"] == 1
+
+
+async def _enter(limiter):
+    async with limiter.async_slot():
+        return limiter.stats()["active"]
+
+
+def test_sync_and_async_callers_share_one_budget():
+    """Test that a thread holding the only slot makes a coroutine wait, and the freed slot is handed over."""
+    import asyncio
+    import threading
+    from model.concurrency import ConcurrencyLimiter
+
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=4, timeout=5)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold_slot():
+        with limiter.slot():
+            entered.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    entered.wait(5)
+
+    async def scenario():
+        waiter = asyncio.create_task(_enter(limiter))
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and limiter.stats()["waiting"] == 1
+        release.set()
+        return await asyncio.wait_for(waiter, 5)
+
+    assert asyncio.run(scenario()) == 1
+    holder.join()
+    assert limiter.stats() == {"max_concurrent": 1, "active": 0, "waiting": 0, "rejected": 0}
+
+
+def test_cancelled_single_flight_leader_does_not_cancel_followers():
+    """Test that a follower still gets the result when the first caller of a shared call is cancelled."""
+    import asyncio
+    from model.concurrency import AsyncSingleFlight
+
+    flight = AsyncSingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "delivery"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do("k", call))
+        follower = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(scenario()) == ("delivery", True)
+    assert flight.shared == 1
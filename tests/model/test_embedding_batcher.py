@@ -0,0 +1,128 @@
+import sys
+import threading
+from pathlib import Path
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.embedding_batcher import EmbeddingBatcher
+
+
+def _run_concurrently(batcher, texts):
+    results = [None] * len(texts)
+    barrier = threading.Barrier(len(texts))
+
+    def worker(i):
+        barrier.wait()
+        results[i] = batcher.embed(texts[i], timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_calls_are_coalesced_and_deduplicated():
+    """Test that concurrent requests end up in one batch without duplicates."""
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        return [np.full(4, len(t), dtype=np.float32) for t in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=200, max_batch_size=64)
+    texts = ["Wo ist mein Paket?", "Passwort vergessen", "Wo ist mein Paket?", "Error 500"]
+    results = _run_concurrently(batcher, texts)
+
+    assert len(calls) == 1
+    assert sorted(calls[0]) == sorted(set(texts))
+    for text, result in zip(texts, results):
+        assert result[0] == len(text)
+    assert batcher.stats()["deduplicated"] == 1
+
+
+def test_batch_is_flushed_at_max_size():
+    """Test that a full batch is sent without waiting for the window."""
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        return [np.zeros(4, dtype=np.float32) for _ in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=10_000, max_batch_size=2)
+    _run_concurrently(batcher, ["a", "b"])
+
+    assert calls and len(calls[0]) == 2
+
+
+def test_batch_error_is_propagated_to_all_callers():
+    """Test that an API error reaches every waiting caller."""
+    def embed_batch(texts):
+        raise RuntimeError("429 Too Many Requests")
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=1)
+    try:
+        batcher.embed("Test", timeout=5)
+        assert False, "Should have raised an exception"
+    except RuntimeError as e:
+        assert "429" in str(e)
+
+
+def test_cancelled_waiter_does_not_block_the_batch():
+    """Test that a cancelled future is skipped and the other callers still get their vectors."""
+    release = threading.Event()
+
+    def embed_batch(texts):
+        release.wait(5)
+        return [np.full(4, len(t), dtype=np.float32) for t in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=50, max_batch_size=64)
+    a, b = batcher.submit("a"), batcher.submit("bb")
+    assert a.cancel()
+    release.set()
+
+    assert b.result(timeout=5)[0] == 2
+
+
+def test_short_result_fails_all_waiters():
+    batcher = EmbeddingBatcher(lambda texts: [np.zeros(4, dtype=np.float32)], max_wait_ms=50, max_batch_size=64)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), ValueError)
+
+
+def test_cancelled_async_caller_does_not_cancel_deduplicated_waiter():
+    """Test that a disconnecting client does not cancel the shared batcher future of another caller."""
+    import asyncio
+    from unittest.mock import patch
+    from model import embedding_model
+
+    release = threading.Event()
+
+    def embed_batch(texts):
+        release.wait(5)
+        return [np.full(4, 7, dtype=np.float32) for _ in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=10, max_batch_size=64)
+
+    async def run():
+        first = asyncio.create_task(embedding_model.embed_query_async("Wo ist mein Paket?"))
+        second = asyncio.create_task(embedding_model.embed_query_async("Wo ist mein Paket?"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)  # Abbruch bis zum geteilten Future durchlaufen lassen
+        release.set()
+        return await asyncio.wait_for(second, 5)
+
+    with patch.dict("os.environ", {"EMB_PROVIDER": "local", "EMB_CACHE_SIZE": "0"}), \
+         patch.object(embedding_model, "get_embedding_batcher", return_value=batcher):
+        result = asyncio.run(run())
+
+    assert result[0, 0] == 7
+    assert batcher.stats()["deduplicated"] == 1
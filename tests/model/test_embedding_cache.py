@@ -0,0 +1,107 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.cache import LRUCache, normalize_text
+from model.embedding_cache import EmbeddingCache, make_key
+
+
+def test_normalize_text_collapses_whitespace():
+    """Test that keys ignore surrounding and repeated whitespace."""
+    assert normalize_text("  Wo ist   mein\nPaket? ") == "Wo ist mein Paket?"
+    assert make_key("Wo ist mein Paket?", "m", 512) == make_key(" Wo ist  mein Paket?", "m", 512)
+    assert make_key("Wo ist mein Paket?", "m", 512) != make_key("Wo ist mein Paket?", "m", 256)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test LRU order and eviction counter."""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_new_cache_instance(tmp_path):
+    """Test that a second cache (e.g. another worker or a restart) reads the SQLite tier."""
+    vec = np.random.rand(8).astype(np.float32)
+    first = EmbeddingCache(maxsize=16, path=tmp_path / "emb.sqlite")
+    first.put("Wo ist mein Paket?", "text-embedding-3-small", 8, vec)
+
+    second = EmbeddingCache(maxsize=16, path=tmp_path / "emb.sqlite")
+    result = second.get("Wo ist mein Paket?", "text-embedding-3-small", 8)
+
+    np.testing.assert_array_equal(result, vec)
+    assert second.stats()["disk_hits"] == 1
+    assert second.get("Wo ist mein Paket?", "text-embedding-3-small", 512) is None
+    assert second.stats()["misses"] == 1
+
+
+def test_disk_tier_prunes_oldest_rows(tmp_path):
+    """Test that the capped SQLite tier keeps only the newest rows and counts what it pruned."""
+    cache = EmbeddingCache(maxsize=0, path=tmp_path / "emb.sqlite", disk_max_rows=3)
+    for i in range(5):
+        cache.put(f"text {i}", "text-embedding-3-small", 8, np.full(8, i, dtype=np.float32))
+
+    assert len(cache.disk) == 3
+    assert cache.get("text 0", "text-embedding-3-small", 8) is None
+    assert cache.get("text 4", "text-embedding-3-small", 8)[0] == 4
+    assert cache.stats()["disk_evictions"] == 2
+
+
+def test_embed_query_uses_cache():
+    """Test that repeated embed_query calls only hit the API once."""
+    from model.embedding_model import embed_query, embedding_cache_stats
+
+    mock_embedding = np.random.rand(512).astype(np.float32)
+    mock_response = MagicMock()
+    mock_response.data = [MagicMock(embedding=mock_embedding.tolist())]
+
+    with patch("model.embedding_model.embed_client") as mock_client:
+        mock_client.embeddings.create.return_value = mock_response
+
+        first = embed_query("Passwort vergessen")
+        second = embed_query("Passwort  vergessen ")
+
+        mock_client.embeddings.create.assert_called_once()
+        np.testing.assert_array_equal(first, second)
+        assert second.shape == (1, 512)
+
+    stats = embedding_cache_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_embed_many_only_embeds_uncached_texts():
+    """Test that embed_many reuses cached vectors and chunks the rest."""
+    from model.embedding_model import embed_many, get_embedding_cache
+
+    cached = np.ones(512, dtype=np.float32)
+    get_embedding_cache().put("Wo ist mein Paket?", "text-embedding-3-small", 512, cached)
+
+    def fake_create(model, input, dimensions):
+        response = MagicMock()
+        response.data = [MagicMock(embedding=[float(len(t))] * dimensions) for t in input]
+        return response
+
+    with patch("model.embedding_model.embed_client") as mock_client, \
+         patch.dict("os.environ", {"EMB_BATCH_SIZE": "2"}):
+        mock_client.embeddings.create.side_effect = fake_create
+
+        result = embed_many(["a", "Wo ist mein Paket?", "bb", "a", "ccc"])
+
+        assert result.shape == (5, 512)
+        assert mock_client.embeddings.create.call_count == 2  # ["a", "bb"], ["ccc"]
+        np.testing.assert_array_equal(result[1], cached)
+        np.testing.assert_array_equal(result[0], result[3])
+        assert result[4][0] == 3.0
@@ -0,0 +1,76 @@
+import sys
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+import pytest
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.embedding_providers import HashingEmbeddingProvider
+
+
+def test_hashing_provider_is_deterministic_and_normalized():
+    provider = HashingEmbeddingProvider(256)
+    a = provider.embed("Ich habe mein Passwort vergessen")
+    b = HashingEmbeddingProvider(256).embed("ich habe  mein Passwort vergessen ")
+
+    assert a.shape == (256,)
+    assert a.dtype == np.float32
+    np.testing.assert_array_equal(a, b)
+    assert np.linalg.norm(a) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_hashing_provider_similar_texts_are_closer():
+    provider = HashingEmbeddingProvider(512)
+    q, near, far = provider.embed_batch([
+        "Wo ist mein Paket?",
+        "Wo bleibt mein Paket?",
+        "Kündigung des Abonnements",
+    ])
+    assert float(q @ near) > float(q @ far)
+
+
+def test_hashing_provider_batch_and_async_match_single():
+    provider = HashingEmbeddingProvider(64)
+    texts = ["a", "Rechnung doppelt abgebucht", ""]
+    batch = provider.embed_batch(texts)
+    async_batch = asyncio.run(provider.embed_batch_async(texts))
+
+    for t, v, w in zip(texts, batch, async_batch):
+        np.testing.assert_array_equal(v, provider.embed(t))
+        np.testing.assert_array_equal(v, w)
+    assert not batch[2].any()  # leerer Text -> Nullvektor statt NaN
+
+
+def test_local_provider_serves_embed_functions_without_client(monkeypatch):
+    """EMB_PROVIDER=local: kein Key, kein Client, eigener Cache-Schlüssel"""
+    from model import embedding_model
+
+    monkeypatch.setenv("EMB_PROVIDER", "local")
+    monkeypatch.setenv("EMB_DIM", "128")
+    monkeypatch.delenv("EMB_MODEL_DEPLOY_KEY", raising=False)
+
+    with patch.object(embedding_model, "get_embed_client", side_effect=AssertionError("no client")), \
+         patch.object(embedding_model, "get_async_embed_client", side_effect=AssertionError("no client")):
+        single = embedding_model.embed_query("Lieferung verspätet")
+        async_single = asyncio.run(embedding_model.embed_query_async("Lieferung verspätet"))
+        many = embedding_model.embed_many(["Lieferung verspätet", "Konto löschen"])
+
+    assert single.shape == (1, 128)
+    np.testing.assert_array_equal(single, async_single)
+    np.testing.assert_array_equal(many[0], single[0])
+    provider = embedding_model.get_embedding_provider()
+    assert provider.model.startswith("local-hash")
+    assert embedding_model.get_embedding_cache().get("Konto löschen", provider.model, 128) is not None
+
+
+def test_unknown_provider_raises(monkeypatch):
+    from model.embedding_model import get_embedding_provider
+
+    monkeypatch.setenv("EMB_PROVIDER", "bogus")
+    with pytest.raises(ValueError, match="EMB_PROVIDER"):
+        get_embedding_provider()
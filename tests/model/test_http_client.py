@@ -0,0 +1,123 @@
+import sys
+from pathlib import Path
+import httpx
+import pytest
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model import http_client
+
+
+@pytest.fixture
+def shared_transport(monkeypatch):
+    """MockTransport als geteilter Pool, frische Clients und Zähler pro Test"""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if request.url.path.endswith("/boom"):
+            raise httpx.ConnectError("connection refused", request=request)
+        status = 500 if request.url.path.endswith("/fail") else 200
+        if "embeddings" in request.url.path:
+            return httpx.Response(status, json={
+                "object": "list",
+                "model": "test-emb",
+                "data": [{"object": "embedding", "index": 0, "embedding": [0.1, 0.2, 0.3]}],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            })
+        return httpx.Response(status, json={})
+
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(http_client, "_transport", transport)
+    monkeypatch.setattr(http_client, "_clients", {})
+    monkeypatch.setattr(http_client, "_request_stats", {})
+    transport.seen = seen
+    return transport
+
+
+def test_stage_timeouts_from_env(monkeypatch):
+    """Test per-stage connect/read timeouts."""
+    monkeypatch.setenv("EMB_CONNECT_TIMEOUT", "1.5")
+    monkeypatch.setenv("EMB_READ_TIMEOUT", "4")
+    monkeypatch.delenv("CHAT_READ_TIMEOUT", raising=False)
+
+    emb = http_client.stage_timeout("EMB")
+    chat = http_client.stage_timeout("CHAT")
+
+    assert emb.connect == 1.5 and emb.read == 4.0
+    assert chat.read == 30.0
+
+
+def test_stages_share_transport_and_count_requests(shared_transport):
+    """Test that EMB and CHAT clients use one pool and track requests, errors and in-flight."""
+    emb = http_client.get_http_client("EMB")
+    chat = http_client.get_http_client("CHAT")
+    assert emb is http_client.get_http_client("EMB")
+    assert emb._transport.transport is chat._transport.transport is shared_transport
+
+    emb.get("https://example.test/ok")
+    emb.get("https://example.test/fail")
+    chat.get("https://example.test/ok")
+    with pytest.raises(httpx.ConnectError):
+        chat.get("https://example.test/boom")
+
+    stats = http_client.pool_stats()["requests"]
+    assert stats["EMB"] == {"requests": 2, "in_flight": 0, "peak_in_flight": 1, "errors": 1}
+    assert stats["CHAT"]["requests"] == 2 and stats["CHAT"]["errors"] == 1
+    assert stats["CHAT"]["in_flight"] == 0
+
+
+def test_closing_stage_client_keeps_shared_pool(shared_transport):
+    """Test that closing one client does not close the shared transport."""
+    http_client.get_http_client("EMB").close()
+
+    r = http_client.get_http_client("CHAT").get("https://example.test/ok")
+
+    assert r.status_code == 200
+
+
+def test_embed_client_uses_shared_transport(shared_transport, monkeypatch):
+    """Test that the lazily created Azure client sends through the pooled transport."""
+    from model import embedding_model
+    monkeypatch.setattr(embedding_model, "embed_client", None)
+    monkeypatch.setenv("EMB_MODEL_DEPLOY_KEY", "test-key")
+    monkeypatch.setenv("EMB_ENDPOINT_BASE", "https://example.test")
+    monkeypatch.setenv("EMB_DIM", "3")
+
+    embs = embedding_model._embed_batch(["hallo"])
+
+    assert embs[0].shape == (3,)
+    assert "embeddings" in shared_transport.seen[0].url.path
+    assert http_client.pool_stats()["requests"]["EMB"]["requests"] == 1
+
+
+def test_async_transport_per_event_loop(monkeypatch):
+    """Test that a cached async client opens connections in the loop it is used in, not the first one."""
+    import asyncio
+    import weakref
+
+    created = []
+
+    def make_transport(**kwargs):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        created.append(transport)
+        return transport
+
+    monkeypatch.setattr(http_client.httpx, "AsyncHTTPTransport", make_transport)
+    monkeypatch.setattr(http_client, "_async_transports", weakref.WeakKeyDictionary())
+    monkeypatch.setattr(http_client, "_async_clients", {})
+    monkeypatch.setattr(http_client, "_request_stats", {})
+    client = http_client.get_async_http_client("CHAT")
+
+    async def call():
+        await client.get("https://example.test/a")
+        await client.get("https://example.test/b")
+        return http_client._get_async_transport()
+
+    first, second = asyncio.run(call()), asyncio.run(call())
+
+    assert len(created) == 2 and first is not second
+    assert http_client.pool_stats()["requests"]["CHAT"]["requests"] == 4
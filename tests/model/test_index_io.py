@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+import faiss
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.index_io import read_index
+
+
+def test_mmap_and_memory_loading_return_same_results(tmp_path):
+    """Test that a memory-mapped index searches exactly like the in-memory one."""
+    x = np.random.default_rng(0).random((500, 16), dtype=np.float32)
+    for spec in ("Flat", "IVF8,Flat", "HNSW16"):
+        index = faiss.index_factory(16, spec)
+        if not index.is_trained:
+            index.train(x)
+        index.add(x)
+        path = tmp_path / f"{spec.replace(',', '_')}.index"
+        faiss.write_index(index, str(path))
+
+        in_memory, mode_memory, _ = read_index(path, mmap=False)
+        mapped, mode_mmap, _ = read_index(path, mmap=True)
+
+        assert mode_memory == "memory"
+        assert mode_mmap == "mmap"
+        np.testing.assert_array_equal(in_memory.search(x[:10], 3)[1], mapped.search(x[:10], 3)[1])
@@ -0,0 +1,73 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.knn import encode_labels, knn_vote
+
+LABELS = ["login_problems", "login_problems", "delivery", "delivery", "security"]
+
+
+def test_knn_vote_is_distance_weighted():
+    """Test that closer neighbours outweigh a plain majority."""
+    classes, codes = encode_labels(LABELS)
+    # Zeile 0: ein sehr naher delivery-Nachbar gegen zwei ferne login-Nachbarn
+    # Zeile 1: alle Nachbarn login_problems
+    D = np.array([[0.01, 1.0, 1.0], [0.2, 0.3, 0.4]])
+    I = np.array([[2, 0, 1], [0, 1, 0]])
+
+    best, agreement = knn_vote(D, I, codes, len(classes))
+
+    assert list(classes[best]) == ["delivery", "login_problems"]
+    assert 0.9 < agreement[0] < 1.0
+    assert agreement[1] == 1.0
+
+
+def test_knn_vote_ignores_missing_neighbours():
+    """Test that FAISS padding ids (-1) do not vote."""
+    classes, codes = encode_labels(LABELS)
+    D = np.array([[0.5, np.inf]])
+    I = np.array([[4, -1]])
+
+    best, agreement = knn_vote(D, I, codes, len(classes))
+
+    assert classes[best[0]] == "security"
+    assert agreement[0] == 1.0
+
+
+def test_knn_agreement_skips_llm_fallback():
+    """Test that a low-confidence classifier answer confirmed by kNN does not call the LLM."""
+    import model.predict_intent as predict_module
+    classes, codes = encode_labels(LABELS)
+
+    mock_clf = MagicMock()
+    mock_clf.predict.return_value = np.array([0])
+    mock_clf.predict_proba.return_value = np.array([[0.5, 0.3, 0.2]])  # Below CLF_THRESHOLD
+
+    mock_le = MagicMock()
+    mock_le.inverse_transform.return_value = np.array(["login_problems"])
+
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[0.3, 0.4, 0.9]]), np.array([[0, 1, 2]]))
+
+    with patch.object(predict_module, "clf", mock_clf), \
+         patch.object(predict_module, "le", mock_le), \
+         patch.object(predict_module, "index", mock_index), \
+         patch.object(predict_module, "retrieval_classes", classes), \
+         patch.object(predict_module, "retrieval_codes", codes), \
+         patch("model.predict_intent.embed_query", return_value=np.random.rand(1, 512).astype(np.float32)), \
+         patch("model.predict_intent.llm_fallback", return_value="delivery") as mock_fallback, \
+         patch("model.predict_intent._load_models"):
+        result = predict_module.predict_intent("Login geht nicht")
+
+        mock_fallback.assert_not_called()
+        assert result["intent"] == "login_problems"
+        assert result["retrieval_intent"] == "login_problems"
+        assert result["retrieval_agreement"] >= predict_module.KNN_AGREEMENT_THRESHOLD
+        assert result["fallback_used"] is False
+        assert mock_index.search.call_args[0][1] == predict_module.RETRIEVAL_K
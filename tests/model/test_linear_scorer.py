@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.linear_scorer import LinearScorer
+
+INTENTS = ["login_problems", "payment_issues", "delivery", "returns"]
+
+
+def _training_data(n_classes=4, dim=32, per_class=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_classes, dim))
+    X = np.vstack([c + 0.8 * rng.normal(size=(per_class, dim)) for c in centers]).astype(np.float32)
+    labels = np.repeat(INTENTS[:n_classes], per_class)
+    le = LabelEncoder()
+    y = le.fit_transform(labels)
+    return X, y, le
+
+
+def _assert_parity(clf, le, X):
+    scorer = LinearScorer.from_sklearn(clf, le)
+    labels, confs, proba = scorer.predict(X)
+
+    np.testing.assert_allclose(proba, clf.predict_proba(X), atol=1e-5)
+    np.testing.assert_array_equal(labels, le.inverse_transform(clf.predict(X)))
+    np.testing.assert_allclose(confs, clf.predict_proba(X).max(axis=1), atol=1e-5)
+
+
+def test_parity_with_multinomial_logistic_regression():
+    """Test softmax semantics against sklearn (lbfgs)."""
+    X, y, le = _training_data()
+    clf = LogisticRegression(max_iter=2000).fit(X, y)
+    _assert_parity(clf, le, X)
+
+
+def test_parity_with_liblinear_one_vs_rest():
+    """Test normalized one-vs-rest sigmoid semantics against liblinear."""
+    X, y, le = _training_data()
+    clf = OneVsRestClassifier(LogisticRegression(solver="liblinear", max_iter=2000)).fit(X, y)
+    _assert_parity(clf, le, X)
+
+
+def test_parity_with_binary_classifier():
+    """Test the binary case (single decision value)."""
+    X, y, le = _training_data(n_classes=2)
+    clf = LogisticRegression(solver="liblinear").fit(X, y)
+    _assert_parity(clf, le, X)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    """Test that the exported bundle scores like the original."""
+    X, y, le = _training_data()
+    clf = LogisticRegression(max_iter=2000).fit(X, y)
+    scorer = LinearScorer.from_sklearn(clf, le)
+    scorer.save(tmp_path / "linear_model.npz")
+
+    loaded = LinearScorer.load(tmp_path / "linear_model.npz")
+
+    assert loaded.multi_class == "multinomial"
+    np.testing.assert_allclose(loaded.predict_proba(X), scorer.predict_proba(X))
+    top = loaded.top_k(X[:1], k=2)[0]
+    assert len(top) == 2 and top[0][1] >= top[1][1]
+    assert top[0][0] == le.inverse_transform(clf.predict(X[:1]))[0]
+
+
+def test_predict_intent_uses_scorer():
+    """Test that the serving path scores with the numpy scorer when it is loaded."""
+    from unittest.mock import MagicMock
+    import model.predict_intent as predict_module
+
+    X, y, le = _training_data(dim=512)
+    clf = LogisticRegression(max_iter=2000).fit(X, y)
+    scorer = LinearScorer.from_sklearn(clf, le)
+
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[0.2]]), np.array([[0]]))
+
+    with patch.object(predict_module, "scorer", scorer), \
+         patch.object(predict_module, "index", mock_index), \
+         patch("model.predict_intent.embed_query", return_value=X[:1]), \
+         patch("model.predict_intent.llm_fallback", return_value="general_question"), \
+         patch("model.predict_intent._load_models"):
+        result = predict_module.predict_intent("Ich kann mich nicht einloggen")
+
+    assert result["clf_intent"] == le.inverse_transform(clf.predict(X[:1]))[0]
+    assert abs(result["clf_confidence"] - clf.predict_proba(X[:1]).max()) < 1e-5
@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model import metrics
+from model.metrics import Histogram, pipeline, stage
+from model.timing import StageTimer
+
+
+def test_histogram_samples_are_cumulative():
+    h = Histogram("t_seconds", "test", ("stage",), buckets=(0.01, 0.1, 1.0))
+    for v in (0.005, 0.05, 0.05, 5.0):
+        h.observe(v, "embed")
+
+    samples = {(name, labels): value for name, labels, value in h.samples()}
+
+    assert samples[("t_seconds_bucket", ("embed", "0.01"))] == 1
+    assert samples[("t_seconds_bucket", ("embed", "0.1"))] == 3
+    assert samples[("t_seconds_bucket", ("embed", "1.0"))] == 3
+    assert samples[("t_seconds_bucket", ("embed", "+Inf"))] == 4
+    assert samples[("t_seconds_count", ("embed",))] == 4
+    assert abs(samples[("t_seconds_sum", ("embed",))] - 5.105) < 1e-9
+
+
+def test_stage_fills_histogram_and_bound_timer():
+    """Test that nested stages reach the timer bound by pipeline() and the global histogram."""
+    before = metrics.STAGE_SECONDS.count("test_stage")
+    timer = StageTimer()
+
+    with pipeline("test", timer):
+        with stage("test_stage", items=3):
+            pass
+    with stage("test_stage"):  # ohne gebundenen Timer
+        pass
+
+    assert metrics.STAGE_SECONDS.count("test_stage") == before + 2
+    assert timer.as_dict()["test_stage"]["items"] == 3
+    assert timer.as_dict()["test_stage"]["calls"] == 1
+
+
+def test_disabled_metrics_keep_the_timer():
+    before = metrics.STAGE_SECONDS.count("test_disabled")
+    timer = StageTimer()
+
+    with patch.object(metrics, "METRICS_ENABLED", False), pipeline("test", timer), stage("test_disabled"):
+        pass
+
+    assert metrics.STAGE_SECONDS.count("test_disabled") == before
+    assert "test_disabled" in timer.as_dict()
+
+
+def test_render_prometheus_includes_rates_and_stages():
+    with stage("test_render"):
+        pass
+    metrics.record_prediction(True)
+
+    body = metrics.render_prometheus()
+
+    assert "# TYPE intent_stage_seconds histogram" in body
+    assert 'intent_stage_seconds_bucket{stage="test_render",le="+Inf"} 1' in body
+    assert 'intent_cache_hit_rate{cache="embedding"}' in body
+    assert "intent_fallback_rate " in body
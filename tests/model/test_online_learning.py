@@ -0,0 +1,235 @@
+import sys
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import faiss
+import numpy as np
+import pytest
+
+import config
+from data.update_faiss import add_examples, empty_sidecar, load_state, with_ids, write_version
+from model import online_learning
+from model import predict_intent as p
+from model.embedding_model import get_embedding_provider
+from model.linear_scorer import LinearScorer
+from model.online_learning import FeedbackStore, apply_feedback, learner_lock, retrain, review_status
+
+SCORES = {"clf_intent": "delivery", "clf_confidence": 0.4, "retrieval_intent": "returns",
+          "retrieval_distance": 1.3, "retrieval_agreement": 0.7}
+
+
+def test_review_status_guard():
+    known = {"delivery", "returns", "security"}
+
+    assert review_status("weather", SCORES, known) == ("rejected", "unknown intent")
+    assert review_status("delivery", SCORES, known)[0] == "accepted"
+    assert review_status("returns", SCORES, known)[0] == "accepted"
+    assert review_status("returns", {**SCORES, "retrieval_agreement": 0.3}, known)[0] == "pending"
+    assert review_status("security", SCORES, known)[0] == "pending"
+    with patch.object(online_learning, "FEEDBACK_AUTO_ACCEPT", False):
+        assert review_status("delivery", SCORES, known)[0] == "pending"
+
+
+def test_feedback_store_dedupes_and_flags_conflicts(tmp_path):
+    store = FeedbackStore(tmp_path / "feedback.sqlite")
+    emb = np.arange(4, dtype="float32")
+
+    store.record("Wo ist mein Paket?", "delivery", SCORES, emb, "m", 4, "accepted", "confirms classifier")
+    store.record("Wo ist  mein Paket? ", "delivery", SCORES, emb, "m", 4, "accepted", "confirms classifier")
+    store.record("Karte gesperrt", "payment_issues", SCORES, emb, "m", 4, "accepted", "confirms kNN")
+    store.record("Karte gesperrt", "security", SCORES, emb, "m", 4, "accepted", "confirms kNN")
+
+    accepted = store.accepted()
+    assert [r["text"] for r in accepted] == ["Wo ist mein Paket?"]
+    assert np.array_equal(accepted[0]["embedding"], emb)
+    assert store.list("accepted")[0]["hits"] == 2
+    assert store.list("pending")[0]["reason"] == "conflicting LLM answers"
+    assert store.set_status([store.list("pending")[0]["id"]], "rejected") == 1
+    assert store.counts()["rejected"]["entries"] == 1
+
+
+def test_record_fallback_runs_guard_in_writer_thread(tmp_path):
+    store = FeedbackStore(tmp_path / "feedback.sqlite")
+    scorer = LinearScorer(np.zeros((2, 4)), np.zeros(2), np.array(["delivery", "returns"]))
+
+    with patch.object(online_learning, "ONLINE_LEARNING", True), \
+         patch.object(online_learning, "_feedback_store", store), patch.object(p, "scorer", scorer):
+        online_learning.record_fallback("Wo ist mein Paket?", np.ones((1, 4)), SCORES, "delivery")
+        online_learning.record_fallback("Wie wird das Wetter?", np.ones((1, 4)), SCORES, "weather")
+        online_learning.flush_feedback()
+
+    assert store.counts()["accepted"]["entries"] == 1
+    assert store.counts()["rejected"]["entries"] == 1
+
+
+def test_predict_intent_records_llm_answers():
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[1.5]]), np.array([[0]]))
+    scorer = LinearScorer(np.zeros((2, 8)), np.zeros(2), np.array(["delivery", "returns"]))
+
+    with patch("model.predict_intent.embed_query", return_value=np.ones((1, 8), dtype="float32")), \
+         patch("model.predict_intent.llm_fallback", return_value="returns"), \
+         patch("model.predict_intent._load_models"), \
+         patch("model.predict_intent.record_fallback") as record, \
+         patch.object(p, "scorer", scorer), patch.object(p, "index", mock_index), \
+         patch.object(p, "retrieval_codes", None), patch.object(p, "index_meta", {}):
+        result = p.predict_intent("Ich will das zurückschicken")
+
+    assert result["fallback_used"] is True
+    record.assert_called_once()
+    assert record.call_args.args[0] == "Ich will das zurückschicken"
+    assert record.call_args.args[3] == "returns"
+
+
+def _setup_project(root, n=60, dim=16):
+    """Mini-Projekt unter root: data/embeddings, versionierter Index, linear_model.npz"""
+    rng = np.random.default_rng(0)
+    y = np.arange(n) % 3
+    X = rng.normal(size=(n, dim)).astype("float32")
+    X[:, :3] += 4 * np.eye(3)[y]
+    labels = [f"intent_{c}" for c in y]
+    texts = [f"text {i}" for i in range(n)]
+
+    data_dir = root / "data/embeddings"
+    data_dir.mkdir(parents=True)
+    np.save(data_dir / "embeddings.npy", X)
+    (data_dir / "labels.json").write_text(json.dumps(labels))
+    (data_dir / "texts.json").write_text(json.dumps(texts))
+
+    (root / "data/vector_db").mkdir(parents=True)
+    index, sidecar = with_ids(faiss.index_factory(dim, "Flat")), empty_sidecar()
+    add_examples(index, sidecar, X, labels, texts, "l2")
+    write_version(index, sidecar, {"spec": "Flat", "metric": "l2"}, root / "data/vector_db/faiss.json")
+
+    assert retrain(data_dir, root / "model/artifacts/linear_model.npz")["published"]
+    return X, data_dir
+
+
+def test_apply_retrain_and_hot_reload(tmp_path):
+    """Test the full loop: accepted feedback -> new index version + data -> retrain -> hot reload."""
+    X, data_dir = _setup_project(tmp_path)
+    meta_path = tmp_path / "data/vector_db/faiss.json"
+    store = FeedbackStore(tmp_path / "feedback.sqlite")
+    model = get_embedding_provider().model
+    new = X[0] + 0.1
+    store.record("ganz neuer Text", "intent_0", SCORES, new, model, 16, "accepted", "confirms classifier")
+
+    with patch.object(config, "PROJECT_ROOT", tmp_path), \
+         patch.multiple(p, clf=None, le=None, scorer=None, index=None, retrieval_ids=None, retrieval_classes=None,
+                        retrieval_codes=None, index_meta={}, intent_thresholds={}, _loaded_stamp=None,
+                        RETRIEVAL_THRESHOLD=p.RETRIEVAL_THRESHOLD, CLF_THRESHOLD=p.CLF_THRESHOLD):
+        p._load_models()
+        assert p.index.ntotal == 60
+        assert p.reload_models_if_changed() is False
+
+        assert apply_feedback(store, meta_path, data_dir, tmp_path / "store.sqlite") == 1
+        assert p.reload_models_if_changed() is True
+        assert p.index.ntotal == 61
+        intents, distances, _ = p._retrieve(new.reshape(1, -1), ["intent_0"])
+        assert intents == ["intent_0"] and distances[0] < 1e-6
+
+        old_scorer = p.scorer
+        assert retrain(data_dir, tmp_path / "model/artifacts/linear_model.npz")["examples"] == 61
+        assert p.reload_models_if_changed() is True
+        assert p.scorer is not old_scorer
+
+    assert store.accepted() == [] and store.list("applied")[0]["faiss_id"] == 60
+    assert len(json.loads((data_dir / "labels.json").read_text())) == 61
+    assert load_state(meta_path)[2]["texts"][-1] == "ganz neuer Text"
+
+
+def test_failed_load_keeps_previous_state_and_retries(tmp_path):
+    """Test that a load failing after the index is read publishes nothing and is retried on the next call."""
+    _setup_project(tmp_path)
+    thresholds_path = tmp_path / "model/artifacts/thresholds.json"
+    thresholds_path.write_text("{kaputt")
+
+    with patch.object(config, "PROJECT_ROOT", tmp_path), \
+         patch.multiple(p, clf=None, le=None, scorer=None, index=None, retrieval_ids=None, retrieval_classes=None,
+                        retrieval_codes=None, index_meta={}, intent_thresholds={}, _loaded_stamp=None,
+                        RETRIEVAL_THRESHOLD=p.RETRIEVAL_THRESHOLD, CLF_THRESHOLD=p.CLF_THRESHOLD):
+        with pytest.raises(json.JSONDecodeError):
+            p._load_models()
+        assert p._models_loaded() is False and p.scorer is None and p._state.index is None
+
+        thresholds_path.unlink()
+        p._load_models()
+        loaded = p._state
+        assert p._models_loaded() and loaded.retrieval_ids is not None
+
+        thresholds_path.write_text("{kaputt")
+        assert p.reload_models_if_changed() is False
+        assert p._state is loaded and p.index is loaded.index
+
+
+def test_label_count_mismatch_disables_knn(tmp_path):
+    """Test that labels.json not matching the index yields no codes instead of keeping stale ones."""
+    labels_path = tmp_path / "labels.json"
+    labels_path.write_text(json.dumps(["a", "b", "a"]))
+
+    assert p._load_retrieval_labels(labels_path, 4) == (None, None, None)
+    classes, codes, ids = p._load_retrieval_labels(labels_path, 3)
+    assert list(classes[codes]) == ["a", "b", "a"] and ids is None
+
+
+def test_apply_initializes_versioned_index_once(tmp_path):
+    """Test that feedback on an index from build_faiss.py alone creates version 1 instead of failing every round."""
+    X, data_dir = _setup_project(tmp_path)
+    meta_path = tmp_path / "data/vector_db/faiss.json"
+    for path in meta_path.parent.glob("faiss.v*"):
+        path.unlink()
+    meta_path.write_text(json.dumps({"spec": "Flat", "metric": "l2", "retrieval_threshold": 0.8}))
+    store = FeedbackStore(tmp_path / "feedback.sqlite")
+    store.record("ganz neuer Text", "intent_0", SCORES, X[0] + 0.1, get_embedding_provider().model, 16,
+                 "accepted", "confirms classifier")
+
+    assert apply_feedback(store, meta_path, data_dir, tmp_path / "store.sqlite") == 1
+
+    meta, index, sidecar = load_state(meta_path)
+    assert meta["version"] == 2 and meta["retrieval_threshold"] == 0.8
+    assert index.ntotal == 61 and sidecar["texts"][-1] == "ganz neuer Text"
+
+
+def test_apply_marks_entries_before_appending_data(tmp_path):
+    """Test that a failure after the new index version is published does not apply the entries twice."""
+    X, data_dir = _setup_project(tmp_path)
+    meta_path = tmp_path / "data/vector_db/faiss.json"
+    store = FeedbackStore(tmp_path / "feedback.sqlite")
+    store.record("ganz neuer Text", "intent_0", SCORES, X[0] + 0.1, get_embedding_provider().model, 16,
+                 "accepted", "confirms classifier")
+
+    with patch("data.generate_embeddings.append", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            apply_feedback(store, meta_path, data_dir, tmp_path / "store.sqlite")
+
+    assert store.accepted() == [] and load_state(meta_path)[1].ntotal == 61
+    assert apply_feedback(store, meta_path, data_dir, tmp_path / "store.sqlite") == 0
+
+
+def test_retrain_without_gate_on_tiny_data(tmp_path):
+    """Test that a class with a single example skips the hold-out gate instead of failing in the split."""
+    data_dir = tmp_path / "data/embeddings"
+    data_dir.mkdir(parents=True)
+    X = np.random.default_rng(0).normal(size=(5, 8)).astype("float32")
+    np.save(data_dir / "embeddings.npy", X)
+    (data_dir / "labels.json").write_text(json.dumps(["a", "a", "b", "b", "c"]))
+
+    result = retrain(data_dir, tmp_path / "linear_model.npz")
+
+    assert result["published"] and result["accuracy"] is None
+
+
+def test_learner_lock_is_exclusive(tmp_path):
+    """Test that the learner step skips while the CLI holds the lock, and gets it afterwards."""
+    lock_path = tmp_path / "feedback.lock"
+    with learner_lock(lock_path):
+        with learner_lock(lock_path, blocking=False) as acquired:
+            assert acquired is False
+    with learner_lock(lock_path, blocking=False) as acquired:
+        assert acquired is True
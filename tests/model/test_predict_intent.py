@@ -77,4 +77,33 @@ def test_fallback_trigger():
         result = predict_intent("Was kostet die Erde?")
         
         assert result["fallback_used"] is True
-        assert result["intent"] == "general_question"
\ No newline at end of file
+        assert result["intent"] == "general_question"
+
+def test_warm_up_records_no_prediction_or_feedback():
+    """Test that the startup warm-up neither counts as a prediction nor feeds online learning."""
+    import asyncio
+    import model.predict_intent as p
+    from model.linear_scorer import LinearScorer
+
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[1.5]]), np.array([[0]]))
+    scorer = LinearScorer(np.zeros((2, 8)), np.zeros(2), np.array(["delivery", "returns"]))
+
+    async def fallback(text):
+        return "returns"
+
+    async def embed(text):
+        return np.ones((1, 8), dtype="float32")
+
+    with patch("model.predict_intent.embed_query_async", side_effect=embed), \
+         patch("model.predict_intent.llm_fallback_async", side_effect=fallback), \
+         patch("model.predict_intent._load_models"), \
+         patch("model.predict_intent.record_fallback") as record_fallback, \
+         patch("model.predict_intent.record_prediction") as record_prediction, \
+         patch.object(p, "scorer", scorer), patch.object(p, "index", mock_index), \
+         patch.object(p, "retrieval_codes", None), patch.object(p, "index_meta", {}):
+        result = asyncio.run(p.warm_up_async())
+
+    assert result["fallback_used"] is True and result["intent"] == "returns"
+    record_fallback.assert_not_called()
+    record_prediction.assert_not_called()
@@ -0,0 +1,99 @@
+import sys
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pytest
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+import config
+from model import train_classifier
+from model.train_classifier import (clamp_folds, cross_validate, make_classifier, search_space, select_best,
+                                    stratified_split)
+from model.linear_scorer import LinearScorer
+
+
+def _blobs(n=150, dim=8, classes=3, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=3, size=(classes, dim))
+    y = np.arange(n) % classes
+    return (centers[y] + rng.normal(size=(n, dim))).astype(np.float32), y
+
+
+def test_search_space_skips_invalid_solver_penalty_pairs():
+    """Test that lbfgs is only combined with l2."""
+    space = search_space([0.1, 1.0], ["liblinear", "lbfgs"], ["l1", "l2"])
+
+    assert len(space) == 6
+    assert {"solver": "lbfgs", "penalty": "l1", "C": 0.1} not in space
+
+
+def test_liblinear_multiclass_matches_scorer():
+    """Test that liblinear runs one-vs-rest for >2 classes and the numpy scorer agrees."""
+    X, y = _blobs()
+    clf = make_classifier({"solver": "liblinear", "penalty": "l1", "C": 1.0}, n_classes=3).fit(X, y)
+
+    np.testing.assert_allclose(LinearScorer.from_sklearn(clf).predict_proba(X), clf.predict_proba(X), atol=1e-5)
+
+
+def test_cross_validate_in_parallel_and_select_within_budget():
+    """Test that every configuration gets CV accuracy and latency, and selection honours the budget."""
+    X, y = _blobs()
+    space = search_space([0.01, 1.0], ["lbfgs", "saga"], ["l2"])
+
+    results = cross_validate(space, X, y, folds=3, n_jobs=2, max_iter=500)
+
+    assert len(results) == 4
+    for r in results:
+        assert 0.0 <= r["cv_accuracy_mean"] <= 1.0
+        assert r["latency_p95_ms"] > 0
+    best = select_best(results, latency_budget_ms=1000.0)
+    assert best["cv_accuracy_mean"] == max(r["cv_accuracy_mean"] for r in results)
+
+    results[0]["latency_p95_ms"] = 1e-6
+    fastest = select_best(results, latency_budget_ms=1e-5)
+    assert fastest is results[0]
+    assert [r["within_budget"] for r in results] == [True, False, False, False]
+
+
+def test_split_and_folds_fit_the_smallest_class():
+    """Test that the hold-out gets one row per class and folds are clamped to the smallest class."""
+    X, y = _blobs(n=30, classes=10)
+
+    X_train, X_test, y_train, y_test = stratified_split(X, y, test_size=0.2)
+
+    assert sorted(y_test) == list(range(10))
+    assert len(y_train) == 20
+    assert clamp_folds(y_train, 5) == 2
+    with pytest.raises(ValueError, match="too few"):
+        stratified_split(X, y, test_size=0.8)
+    with pytest.raises(ValueError, match="at least 2 examples"):
+        clamp_folds(y[:15], 5)
+
+
+def test_main_runs_with_defaults_on_shipped_intents(tmp_path):
+    """Test that training with the default flags works on data/input/intents.json (3 examples per intent)."""
+    with open(_project_root / "data/input/intents.json") as f:
+        intents = json.load(f)
+    labels = [intent for intent, examples in intents.items() for _ in examples]
+    names = sorted(intents)
+    rng = np.random.default_rng(0)
+    centers = rng.normal(scale=3, size=(len(names), 16))
+    embeddings = centers[[names.index(label) for label in labels]] + rng.normal(size=(len(labels), 16))
+    (tmp_path / "data/embeddings").mkdir(parents=True)
+    np.save(tmp_path / "data/embeddings/embeddings.npy", embeddings.astype(np.float32))
+    with open(tmp_path / "data/embeddings/labels.json", "w") as f:
+        json.dump(labels, f)
+
+    mlflow = MagicMock()
+    with patch.object(config, "PROJECT_ROOT", tmp_path), \
+         patch.dict(sys.modules, {"mlflow": mlflow, "mlflow.sklearn": mlflow.sklearn}), \
+         patch.object(sys, "argv", ["train_classifier.py"]):
+        train_classifier.main()
+
+    assert (tmp_path / "model/artifacts/linear_model.npz").exists()
+    assert mlflow.log_params.call_args_list[0].args[0]["folds"] == 2
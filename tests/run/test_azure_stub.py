@@ -0,0 +1,56 @@
+import sys
+import asyncio
+from pathlib import Path
+import httpx
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from model.embedding_providers import HashingEmbeddingProvider
+from run.azure_stub import INTENTS, create_app
+
+
+def _clients(app):
+    from openai import AsyncAzureOpenAI
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub")
+    kwargs = {"azure_endpoint": "http://stub", "api_key": "stub", "api_version": "2025-01-01-preview",
+              "http_client": http, "max_retries": 0}
+    return AsyncAzureOpenAI(azure_deployment="emb", **kwargs), AsyncAzureOpenAI(**kwargs)
+
+
+def test_stub_answers_the_openai_client():
+    """Test that the real openai client gets local-provider embeddings and an intent from the stub."""
+    app = create_app(emb_latency_ms=0, emb_jitter_ms=0, chat_latency_ms=0, chat_jitter_ms=0, seed=0)
+    emb_client, chat_client = _clients(app)
+
+    async def scenario():
+        r = await emb_client.embeddings.create(model="m", input=["Paket fehlt", "Passwort"], dimensions=64)
+        c = await chat_client.chat.completions.create(model="chat", messages=[{"role": "user", "content": "x"}])
+        return r, c
+
+    r, c = asyncio.run(scenario())
+
+    expected = HashingEmbeddingProvider(64).embed("Paket fehlt")
+    np.testing.assert_allclose(np.asarray(r.data[0].embedding, dtype="float32"), expected, rtol=1e-6)
+    assert len(r.data) == 2
+    assert c.choices[0].message.content in INTENTS
+    assert app.state.stats["embeddings"]["inputs"] == 2
+    assert app.state.stats["chat"]["requests"] == 1
+
+
+def test_stub_injects_rate_limits():
+    """Test that rate_429=1 turns every request into a 429 with Retry-After."""
+    app = create_app(emb_latency_ms=0, emb_jitter_ms=0, rate_429=1.0, retry_after=3)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub") as client:
+            return await client.post("/openai/deployments/emb/embeddings", json={"input": "x", "dimensions": 8})
+
+    r = asyncio.run(scenario())
+
+    assert r.status_code == 429
+    assert r.headers["retry-after"] == "3"
+    assert app.state.stats["embeddings"]["429"] == 1
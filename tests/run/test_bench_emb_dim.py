@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from run.bench_emb_dim import evaluate_dim, recommend, truncate
+
+
+def test_truncate_renormalizes():
+    """Test that truncated vectors have unit length again."""
+    X = np.random.default_rng(0).normal(size=(5, 32)).astype(np.float32)
+
+    assert np.allclose(np.linalg.norm(truncate(X, 8), axis=1), 1.0, atol=1e-6)
+
+
+def test_recommend_smallest_dim_within_tolerance():
+    """Test that the recommendation trades a small accuracy loss for a smaller dimension."""
+    rows = [
+        {"dim": 256, "cv_accuracy": 0.90, "fallback_rate": 0.10},
+        {"dim": 512, "cv_accuracy": 0.945, "fallback_rate": 0.05},
+        {"dim": 1536, "cv_accuracy": 0.95, "fallback_rate": 0.04},
+    ]
+
+    assert recommend(rows, max_accuracy_drop=0.01, max_fallback_increase=0.02)["dim"] == 512
+    assert recommend(rows, max_accuracy_drop=0.0, max_fallback_increase=0.0)["dim"] == 1536
+
+
+def test_evaluate_dim_reports_all_metrics():
+    """Test a sweep point on data whose class signal sits in the leading components."""
+    rng = np.random.default_rng(0)
+    y = np.arange(120) % 3
+    X = rng.normal(size=(120, 64)).astype(np.float32)
+    X[:, :8] += 4 * np.eye(3, 8)[y]
+    labels = [f"intent_{c}" for c in y]
+
+    r = evaluate_dim(X, labels, 16, folds=3, n_jobs=1)
+
+    assert r["dim"] == 16 and r["cv_accuracy"] > 0.9
+    assert 0.0 <= r["fallback_rate"] <= 1.0
+    assert r["index_bytes"] > 120 * 16 * 4
+    assert r["payload_bytes"] == 88
+
+
+def test_evaluate_dim_with_three_examples_per_intent():
+    """Test that the default of 5 folds is clamped for a data set like data/input/intents.json."""
+    rng = np.random.default_rng(0)
+    y = np.arange(30) % 10
+    X = rng.normal(size=(30, 32)).astype(np.float32)
+    labels = [f"intent_{c}" for c in y]
+
+    r = evaluate_dim(X, labels, 16, n_jobs=1)
+
+    assert 0.0 <= r["cv_accuracy"] <= 1.0
@@ -0,0 +1,59 @@
+import sys
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+import httpx
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from run.bench_load import compare, parse_server_timing, run_level
+
+
+def test_parse_server_timing():
+    header = "embed;dur=12.50, classify;dur=0.40, fallback;desc=llm;dur=300, total;dur=313.2"
+    assert parse_server_timing(header) == {"embed": 12.5, "classify": 0.4, "fallback": 300.0, "total": 313.2}
+    assert parse_server_timing(None) == {}
+
+
+def test_run_level_reports_stage_percentiles_from_the_app():
+    """Test a closed-loop level against app.app in-process with Server-Timing enabled."""
+    from app.app import app
+
+    async def fake_predict(text, timings=None):
+        timings.add("embed", 0.010)
+        timings.add("classify", 0.001)
+        fallback = text == "unsicher"
+        if fallback:
+            timings.add("fallback", 0.200)
+        return {"text": text, "intent": "delivery", "fallback_used": fallback}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await run_level(client, "/predict", ["Paket?", "unsicher"], concurrency=4, n_requests=20)
+
+    with patch("app.app.SERVER_TIMING", True), \
+         patch("app.app.predict_intent_async", side_effect=fake_predict):
+        level = asyncio.run(scenario())
+
+    assert level["requests"] == 20 and level["errors"] == 0
+    assert level["rps"] > 0
+    assert level["fallback_rate"] == 0.5
+    assert level["stages_ms"]["embed"]["p50"] == 10.0
+    assert level["stages_ms"]["fallback"]["p95"] == 200.0
+    assert set(level["latency_ms"]) == {"p50", "p95", "p99", "mean", "max"}
+
+
+def test_compare_flags_throughput_and_p95_regressions():
+    baseline = {"levels": [{"concurrency": 8, "rps": 100.0, "latency_ms": {"p95": 50.0}}]}
+    same = {"levels": [{"concurrency": 8, "rps": 95.0, "latency_ms": {"p95": 54.0}}]}
+    worse = {"levels": [{"concurrency": 8, "rps": 80.0, "latency_ms": {"p95": 70.0}},
+                        {"concurrency": 64, "rps": 10.0, "latency_ms": {"p95": 900.0}}]}
+
+    assert compare(baseline, same, 0.1) == []
+    failures = compare(baseline, worse, 0.1)
+    assert len(failures) == 2
+    assert all(f.startswith("c=8") for f in failures)
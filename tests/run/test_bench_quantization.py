@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+import numpy as np
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from run.bench_quantization import run_report
+
+
+def test_report_compares_quantized_indexes_with_flat():
+    """Test that SQ8 is ~4x smaller than Flat with near-perfect recall on clustered data."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(scale=4, size=(5, 32))
+    y = np.arange(600) % 5
+    X = (centers[y] + rng.normal(size=(600, 32))).astype(np.float32)
+    labels = [f"intent_{c}" for c in y]
+
+    report = run_report(X, labels, ["Flat", "SQ8", "PQ8x4"])
+
+    flat, sq8, pq = report["indexes"]
+    assert flat["recall_at_k"] == 1.0
+    assert sq8["bytes"] < flat["bytes"] / 3
+    assert sq8["recall_at_k"] > 0.9
+    assert abs(sq8["knn_accuracy"] - flat["knn_accuracy"]) < 0.05
+    assert pq["bytes"] < sq8["bytes"]
+    float32, float16 = report["storage"]
+    assert float16["bytes"] * 2 == float32["bytes"]
+    assert abs(float16["accuracy"] - float32["accuracy"]) < 0.02
@@ -0,0 +1,92 @@
+import csv
+import json
+import sys
+from pathlib import Path
+import pytest
+
+# Ensure project root is in Python path
+_project_root = Path(__file__).parent.parent.parent.resolve()
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from run.classify_bulk import Checkpoint, classify_file
+
+
+def _fake_classify(calls=None, fail_on=None):
+    """predict_intents Ersatz: Fragen (?) gehen in den Fallback"""
+    def classify(texts, timings=None):
+        if calls is not None:
+            calls.append(list(texts))
+        if fail_on is not None and fail_on in texts:
+            raise RuntimeError("Azure down")
+        with timings.stage("embed", len(texts)):
+            pass
+        return [{"text": t, "intent": "faq" if "?" in t else "other", "fallback_used": "?" in t} for t in texts]
+    return classify
+
+
+def _write_jsonl(path, rows):
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def _read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_classifies_in_order_with_ids_and_summary(tmp_path):
+    """Test streaming output order, id passthrough, empty rows and the run summary."""
+    src = tmp_path / "in.jsonl"
+    _write_jsonl(src, [{"request_id": f"r{i}", "body": "Wo ist mein Paket?" if i % 2 else f"Text {i}"} for i in range(9)]
+                 + [{"request_id": "r9", "body": "  "}])
+    out = tmp_path / "out.jsonl"
+
+    summary = classify_file(src, out, text_field="body", id_field="request_id", batch_size=3,
+                            concurrency=3, classify=_fake_classify())
+
+    records = _read_jsonl(out)
+    assert [r["row"] for r in records] == list(range(10))
+    assert [r["id"] for r in records] == [f"r{i}" for i in range(10)]
+    assert records[9]["error"] == "empty text" and records[9]["intent"] is None
+    assert summary["rows"] == 10 and summary["empty"] == 1
+    assert summary["fallbacks"] == 4
+    assert summary["fallback_rate"] == pytest.approx(4 / 9)
+    assert summary["stages"]["embed"]["items"] == 9
+    assert Checkpoint(tmp_path / "out.jsonl.ckpt").load()["completed"] is True
+
+
+def test_resume_continues_after_last_checkpoint(tmp_path):
+    """Test that an interrupted run resumes without duplicated or missing rows."""
+    src = tmp_path / "in.jsonl"
+    _write_jsonl(src, [{"text": f"Text {i}"} for i in range(10)])
+    out = tmp_path / "out.jsonl"
+
+    with pytest.raises(RuntimeError):
+        classify_file(src, out, batch_size=4, concurrency=1, classify=_fake_classify(fail_on="Text 5"))
+    assert Checkpoint(tmp_path / "out.jsonl.ckpt").load()["rows_done"] == 4
+    # halb geschriebene Zeile nach dem Checkpoint, wie nach einem harten Abbruch
+    with open(out, "a") as f:
+        f.write('{"row": 4, "te')
+
+    calls = []
+    summary = classify_file(src, out, batch_size=4, concurrency=1, resume=True, classify=_fake_classify(calls))
+
+    assert calls[0][0] == "Text 4"
+    assert [r["row"] for r in _read_jsonl(out)] == list(range(10))
+    assert summary["resumed_at"] == 4 and summary["rows_this_run"] == 6
+
+
+def test_reads_csv_input(tmp_path):
+    """Test CSV input selected by file extension."""
+    src = tmp_path / "in.csv"
+    with open(src, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "text"])
+        writer.writeheader()
+        writer.writerows([{"id": "a", "text": "Hallo"}, {"id": "b", "text": "Kündigen?"}])
+    out = tmp_path / "out.jsonl"
+
+    classify_file(src, out, id_field="id", classify=_fake_classify())
+
+    assert [(r["id"], r["intent"]) for r in _read_jsonl(out)] == [("a", "other"), ("b", "faq")]